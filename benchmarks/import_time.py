@@ -0,0 +1,82 @@
+"""
+Reports what importing a Lang2Logic module costs, in the style of
+`python -X importtime`, and fails when it exceeds the budget.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module Lang2Logic.generator --budget-ms 150 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                       "src")
+
+# Dependencies that must only be imported when a Generator is first used
+HEAVY_MODULES = ("langchain", "langchain_core", "langchain_community",
+                 "openai", "pydantic", "jsonschema")
+
+
+def measure_import(module):
+    """
+    Imports module in a fresh interpreter with -X importtime.
+
+    Returns (rows, loaded) where rows are (self_us, cumulative_us, name)
+    tuples for every imported module and loaded lists the heavy
+    dependencies that ended up in sys.modules.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [SRC_DIR] + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else []))
+    code = (f"import sys, {module}; "
+            f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))")
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            capture_output=True,
+                            text=True,
+                            env=env,
+                            check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.rstrip()))
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return rows, loaded
+
+
+def module_cost_ms(rows, module):
+    """ Cumulative import time of module in milliseconds. """
+    for _, cumulative_us, name in rows:
+        if name.strip() == module:
+            return cumulative_us / 1000
+    raise ValueError(f"{module} was not imported")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--module", default="Lang2Logic.generator")
+    parser.add_argument("--budget-ms", type=float, default=150.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    rows, loaded = measure_import(args.module)
+    cost = module_cost_ms(rows, args.module)
+
+    print(f"{'self [ms]':>10} | {'cumulative [ms]':>15} | module")
+    for self_us, cumulative_us, name in sorted(rows,
+                                               key=lambda row: row[1],
+                                               reverse=True)[:args.top]:
+        print(f"{self_us / 1000:>10.1f} | {cumulative_us / 1000:>15.1f} | {name}")
+    print(f"\n{args.module}: {cost:.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if loaded:
+        print(f"Heavy dependencies imported eagerly: {', '.join(loaded)}")
+
+    if cost > args.budget_ms or loaded:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
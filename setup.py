@@ -1,18 +1,4 @@
 from setuptools import setup, find_packages
-from setuptools.command.install import install
-import subprocess
-
-
-class CustomInstall(install):
-
-    def run(self):
-        # Call the parent method
-        install.run(self)
-        # Custom post-install code to install improved-datamodel-codegen with no dependencies
-        subprocess.call([
-            'pip', 'install', 'improved-datamodel-codegen==1.2.1', '--no-deps'
-        ])
-
 
 # Read dependencies from requirements.txt
 with open('requirements.txt') as f:
@@ -47,12 +33,12 @@ setup(
     },
     python_requires='>=3.7, <4',
     install_requires=required,
+    entry_points={
+        'console_scripts': ['lang2logic=Lang2Logic.cli:main'],
+    },
     extras_require={
         'dev': ['check-manifest'],
         'test': ['coverage'],
     },
     project_urls={},
-    cmdclass={
-        'install': CustomInstall,
-    },
 )
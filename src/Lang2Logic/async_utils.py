@@ -0,0 +1,80 @@
+import contextvars
+import functools
+from typing import Any, Awaitable, Callable, Generator, Optional, Tuple
+
+
+async def run_blocking(func: Callable[..., Any], *args: Any,
+                       **kwargs: Any) -> Any:
+    """
+    Runs a CPU-bound or blocking call in the default executor so it does not
+    stall the event loop. Context variables are carried into the worker thread.
+    """
+    # Imported here so the sync API never pays for loading asyncio
+    import asyncio
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    call = functools.partial(context.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
+
+
+class StepCall:
+    """
+    A model call a step generator needs made: func(*args, **kwargs) when the
+    steps are run synchronously, await afunc(*args, **kwargs) when they are
+    run on an event loop.
+    """
+
+    def __init__(self, func: Callable[..., Any],
+                 afunc: Callable[..., Awaitable[Any]], *args: Any,
+                 **kwargs: Any):
+        self.func = func
+        self.afunc = afunc
+        self.args = args
+        self.kwargs = kwargs
+
+
+def _advance(steps: Generator, value: Any,
+             error: Optional[BaseException]) -> Tuple[bool, Any]:
+    """ Resumes steps with value or error; (done, return value or StepCall). """
+    try:
+        if error is not None:
+            return False, steps.throw(error)
+        return False, steps.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+def run_steps(steps: Generator) -> Any:
+    """
+    Runs a generator that yields a StepCall wherever it needs the model. The
+    call's result is sent back into it, or its error thrown into it, and the
+    generator's return value is returned. Keeping the decisions in one
+    generator leaves only the model calls with sync and async variants.
+    """
+    value, error = None, None
+    while True:
+        done, result = _advance(steps, value, error)
+        if done:
+            return result
+        try:
+            value, error = result.func(*result.args, **result.kwargs), None
+        except Exception as e:
+            value, error = None, e
+
+
+async def arun_steps(steps: Generator) -> Any:
+    """
+    Coroutine version of run_steps. The model calls are awaited, the steps
+    between them run through run_blocking to keep parsing and model
+    compilation off the event loop.
+    """
+    value, error = None, None
+    while True:
+        done, result = await run_blocking(_advance, steps, value, error)
+        if done:
+            return result
+        try:
+            value, error = await result.afunc(*result.args,
+                                              **result.kwargs), None
+        except Exception as e:
+            value, error = None, e
@@ -0,0 +1,30 @@
+from typing import Any, Optional
+
+
+class BatchResult:
+    """Outcome of one prompt in a batch: either a value or the error it raised."""
+
+    def __init__(self,
+                 index: int,
+                 prompt: str,
+                 value: Any = None,
+                 error: Optional[BaseException] = None):
+        self.index = index
+        self.prompt = prompt
+        self.value = value
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def unwrap(self) -> Any:
+        """ Returns the value, re-raising the error if the prompt failed. """
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def __repr__(self) -> str:
+        if self.ok:
+            return f"BatchResult(index={self.index}, value={self.value!r})"
+        return f"BatchResult(index={self.index}, error={self.error!r})"
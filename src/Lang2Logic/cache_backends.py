@@ -0,0 +1,257 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, time as datetime_time
+from typing import Any, Dict, Optional
+
+# Marks the JSON objects that stand for the non-JSON values results can hold
+TYPE_TAG = "__lang2logic_type__"
+
+
+def _encode_special(value: Any) -> Dict[str, Any]:
+    """ json.dumps default for the dates, times and patterns in results. """
+    if isinstance(value, datetime):
+        return {TYPE_TAG: "datetime", "value": value.isoformat()}
+    if isinstance(value, date):
+        return {TYPE_TAG: "date", "value": value.isoformat()}
+    if isinstance(value, datetime_time):
+        return {TYPE_TAG: "time", "value": value.isoformat()}
+    if isinstance(value, re.Pattern):
+        return {TYPE_TAG: "pattern", "value": value.pattern}
+    raise TypeError(f"Cannot cache a value of type {type(value).__name__}")
+
+
+def _decode_special(obj: Dict[str, Any]) -> Any:
+    if len(obj) != 2 or TYPE_TAG not in obj or "value" not in obj:
+        return obj
+    decoders = {
+        "datetime": datetime.fromisoformat,
+        "date": date.fromisoformat,
+        "time": datetime_time.fromisoformat,
+        "pattern": re.compile,
+    }
+    decode = decoders.get(obj[TYPE_TAG])
+    return obj if decode is None else decode(obj["value"])
+
+
+def dump_value(value: Any) -> str:
+    return json.dumps(value, default=_encode_special, ensure_ascii=False)
+
+
+def load_value(text: Any) -> Any:
+    """ Decodes a stored value; raises ValueError for anything but JSON. """
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    return json.loads(text, object_hook=_decode_special)
+
+
+class CacheBackend:
+    """
+    Key/value store used by the schema and response caches.
+
+    Entries may expire after a TTL (in seconds) and are evicted least recently
+    used first once max_entries is exceeded. Pinned entries never expire and
+    are never evicted; they are only removed by delete() or clear().
+    """
+
+    def __init__(self,
+                 max_entries: Optional[int] = 1024,
+                 default_ttl: Optional[float] = None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+
+    def get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def set(self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            pinned: bool = False) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def _expires_at(self, ttl: Optional[float], pinned: bool) -> Optional[float]:
+        ttl = self.default_ttl if ttl is None else ttl
+        if pinned or ttl is None:
+            return None
+        return time.time() + ttl
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU backend."""
+
+    def __init__(self,
+                 max_entries: Optional[int] = 1024,
+                 default_ttl: Optional[float] = None):
+        super().__init__(max_entries=max_entries, default_ttl=default_ttl)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at, pinned = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            pinned: bool = False) -> None:
+        with self._lock:
+            self._entries[key] = (value, self._expires_at(ttl, pinned), pinned)
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _evict(self) -> None:
+        if self.max_entries is None:
+            return
+        now = time.time()
+        for key, (_, expires_at, _) in list(self._entries.items()):
+            if expires_at is not None and expires_at <= now:
+                del self._entries[key]
+        unpinned = [key for key, entry in self._entries.items() if not entry[2]]
+        while len(self._entries) > self.max_entries and unpinned:
+            del self._entries[unpinned.pop(0)]
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Backend stored in a local SQLite file that several worker processes can
+    share. Values are stored as JSON; dates, times and compiled patterns in
+    results are tagged so they load back as the same types.
+    """
+
+    def __init__(self,
+                 path: str,
+                 max_entries: Optional[int] = 10000,
+                 default_ttl: Optional[float] = None,
+                 table: str = "cache"):
+        super().__init__(max_entries=max_entries, default_ttl=default_ttl)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table}")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                               "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                               "expires_at REAL, pinned INTEGER NOT NULL, "
+                               "accessed_at REAL NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ?",
+                (key, )).fetchone()
+            if row is None:
+                return None
+            try:
+                value = None if row[1] is not None and row[1] <= now else (
+                    load_value(row[0]))
+            except ValueError:
+                # Not JSON, e.g. written by an older pickling version
+                value = None
+            if value is None:
+                connection.execute(f"DELETE FROM {self.table} WHERE key = ?",
+                                   (key, ))
+                return None
+            connection.execute(
+                f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                (now, key))
+        return value
+
+    def set(self,
+            key: str,
+            value: Any,
+            ttl: Optional[float] = None,
+            pinned: bool = False) -> None:
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, expires_at, pinned, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, dump_value(value), self._expires_at(ttl, pinned),
+                 int(pinned), now))
+            self._evict(connection, now)
+
+    def delete(self, key: str) -> bool:
+        with self._connect() as connection:
+            cursor = connection.execute(
+                f"DELETE FROM {self.table} WHERE key = ?", (key, ))
+        return cursor.rowcount > 0
+
+    def clear(self) -> None:
+        with self._connect() as connection:
+            connection.execute(f"DELETE FROM {self.table}")
+
+    def __len__(self) -> int:
+        with self._connect() as connection:
+            return connection.execute(
+                f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def close(self) -> None:
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _evict(self, connection: sqlite3.Connection, now: float) -> None:
+        connection.execute(
+            f"DELETE FROM {self.table} WHERE expires_at IS NOT NULL "
+            "AND expires_at <= ?", (now, ))
+        if self.max_entries is None:
+            return
+        count = connection.execute(
+            f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        if count > self.max_entries:
+            connection.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} WHERE pinned = 0 "
+                "ORDER BY accessed_at ASC LIMIT ?)",
+                (count - self.max_entries, ))
@@ -0,0 +1,104 @@
+import hashlib
+import json
+from typing import Any
+
+DRAFT_7_URIS = {
+    "http://json-schema.org/draft-07/schema",
+    "http://json-schema.org/draft-07/schema#",
+    "https://json-schema.org/draft-07/schema",
+    "https://json-schema.org/draft-07/schema#",
+}
+
+# Annotations that neither validation nor the compiled model use. Titles
+# and descriptions stay, they name the models and end up in the prompt.
+IGNORED_KEYWORDS = {"$comment", "examples", "default", "readOnly", "writeOnly"}
+
+# Keywords whose value is a subschema, a list of them, or a map of them
+SCHEMA_KEYWORDS = {
+    "additionalItems", "additionalProperties", "contains", "propertyNames",
+    "if", "then", "else", "not"
+}
+SCHEMA_LIST_KEYWORDS = {"allOf", "anyOf", "oneOf"}
+SCHEMA_MAP_KEYWORDS = {
+    "properties", "patternProperties", "definitions", "$defs"
+}
+
+
+def canonical_json(schema: Any) -> str:
+    """ Serializes a schema with sorted keys and no insignificant whitespace. """
+    return json.dumps(schema,
+                      sort_keys=True,
+                      separators=(",", ":"),
+                      ensure_ascii=False)
+
+
+def normalize_schema(schema: Any) -> Any:
+    """
+    Returns the normal form of a Draft-7 schema: keywords that cannot change
+    what validates or what is compiled are dropped (see IGNORED_KEYWORDS,
+    the Draft-7 `$schema`, `additionalProperties: true` and empty
+    `required`, `properties` and `definitions`), single-item type lists
+    become a plain type, and type and required lists are sorted. Key order
+    is left to canonical_json. Values the schema does not describe as
+    subschemas (enum, const, ...) are copied unchanged.
+    """
+    if not isinstance(schema, dict):
+        return schema
+    normal = {}
+    for key, value in schema.items():
+        if key in IGNORED_KEYWORDS:
+            continue
+        if key == "$schema" and value in DRAFT_7_URIS:
+            continue
+        if key in SCHEMA_KEYWORDS:
+            value = normalize_schema(value)
+        elif key in SCHEMA_LIST_KEYWORDS and isinstance(value, list):
+            value = [normalize_schema(option) for option in value]
+        elif key in SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+            value = {
+                name: normalize_schema(subschema)
+                for name, subschema in value.items()
+            }
+        elif key == "items":
+            value = ([normalize_schema(item) for item in value]
+                     if isinstance(value, list) else normalize_schema(value))
+        elif key == "dependencies" and isinstance(value, dict):
+            value = {
+                name: normalize_schema(dependency)
+                for name, dependency in value.items()
+            }
+        elif key == "type":
+            value = normalize_type(value)
+        elif key == "required" and isinstance(value, list):
+            value = normalize_names(value)
+        normal[key] = value
+
+    if normal.get("additionalProperties") is True:
+        del normal["additionalProperties"]
+    for key in ("required", "properties", "definitions", "$defs"):
+        if key in normal and normal[key] in ([], {}):
+            del normal[key]
+    return normal
+
+
+def normalize_type(value: Any) -> Any:
+    if not isinstance(value, list) or not all(
+            isinstance(item, str) for item in value):
+        return value
+    types = sorted(set(value))
+    return types[0] if len(types) == 1 else types
+
+
+def normalize_names(value: Any) -> Any:
+    if not all(isinstance(item, str) for item in value):
+        return value
+    return sorted(set(value))
+
+
+def normal_fingerprint(schema: Any) -> str:
+    """
+    SHA-256 digest of the schema's normal form, equal for schemas that only
+    differ in key order, ignored annotations or equivalent spellings.
+    """
+    return hashlib.sha256(
+        canonical_json(normalize_schema(schema)).encode("utf-8")).hexdigest()
@@ -0,0 +1,278 @@
+"""
+Command line tools for Lang2Logic.
+
+    lang2logic compile schemas/*.json -o mymodels/
+
+compiles Draft-7 schemas ahead of time into an importable package of
+Pydantic models and format instructions, see SchemaPackageCompiler.
+"""
+import argparse
+import json
+import keyword
+import os
+import re
+import sys
+import types
+from typing import Any, Dict, List, Optional, Tuple
+
+#custom imports
+from .response_schema import ResponseSchema, schema_fingerprint
+from .schema_codegen import render_models, render_value
+from .schema_shapes import classify_schema
+
+# Keys that mark a JSON document as a schema rather than a {key: schema}
+# collection written by ResponseSchema.save_to_json
+SCHEMA_KEYS = {
+    "$schema", "$ref", "type", "properties", "items", "enum", "const",
+    "allOf", "anyOf", "oneOf"
+}
+
+MODULE_TEMPLATE = '''"""
+Precompiled Lang2Logic schema {name!r} from {source}.
+Generated by `lang2logic compile`, do not edit.
+"""
+from typing import Any, Dict, List, Literal, Optional, Union  # noqa: F401
+
+from jsonschema import Draft7Validator
+from pydantic import BaseModel, ConfigDict, Field  # noqa: F401
+from typing_extensions import Annotated  # noqa: F401
+
+from Lang2Logic.precompiled import PrecompiledSchema
+
+SCHEMA = {schema}
+
+WRAPPED_SCHEMA = {wrapped_schema}
+
+FORMAT_INSTRUCTIONS = {format_instructions}
+
+# Checked when the package was compiled, so built without check_schema
+VALIDATOR = Draft7Validator(WRAPPED_SCHEMA)
+
+
+{models}
+
+schema = PrecompiledSchema(name={name!r},
+                           schema=SCHEMA,
+                           wrapped_schema=WRAPPED_SCHEMA,
+                           model={model_name},
+                           format_instructions=FORMAT_INSTRUCTIONS,
+                           validator=VALIDATOR,
+                           shape={shape!r},
+                           fingerprint={fingerprint!r},
+                           wrapped_fingerprint={wrapped_fingerprint!r})
+'''
+
+PACKAGE_TEMPLATE = '''"""
+Lang2Logic schemas precompiled by `lang2logic compile`, do not edit.
+
+Pass a schema to Generator.generate like any other schema:
+
+    from {package} import {example}
+    test_gen.generate(prompt, {example})
+"""
+{imports}
+
+SCHEMAS = {{
+{entries}
+}}
+'''
+
+
+class SchemaCompileError(ValueError):
+    pass
+
+
+def module_name(name: str) -> str:
+    """ A Python identifier for a schema name or file stem. """
+    identifier = re.sub(r"\W+", "_", name).strip("_").lower()
+    if not identifier or identifier[0].isdigit() or keyword.iskeyword(
+            identifier):
+        identifier = f"schema_{identifier}"
+    return identifier
+
+
+class SchemaPackageCompiler:
+    """
+    Compiles Draft-7 schemas into a package with one module per schema.
+    Each module holds the schema, its wrapped form, the generated Pydantic
+    model source, the Draft-7 validator of the wrapped schema and the format
+    instructions, and exposes them as a PrecompiledSchema named `schema`.
+    Every module is imported and its models checked field by field against
+    the ones compiled in-process before anything is written.
+    """
+
+    def __init__(self):
+        from .generate_response import ResponseGenerator
+        self.response_generator = ResponseGenerator(None, None)
+
+    def load_schemas(self, paths: List[str]) -> List[Tuple[str, Any, str]]:
+        """
+        Returns (name, schema, source) for every schema in paths. A path may
+        be a schema file, a file of {name: schema} entries, or a directory
+        of .json files.
+        """
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files.extend(
+                    os.path.join(path, file_name)
+                    for file_name in sorted(os.listdir(path))
+                    if file_name.endswith(".json"))
+            else:
+                files.append(path)
+
+        schemas = []
+        for file_path in files:
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    document = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                raise SchemaCompileError(f"Failed to read {file_path}: {e}")
+            source = os.path.basename(file_path)
+            if self.is_schema_document(document):
+                name = os.path.splitext(source)[0]
+                schemas.append((name, document, source))
+            else:
+                schemas.extend((name, schema, f"{source}#{name}")
+                               for name, schema in document.items())
+        return schemas
+
+    def is_schema_document(self, document: Any) -> bool:
+        if not isinstance(document, dict) or not document:
+            return True
+        if SCHEMA_KEYS & set(document):
+            return True
+        return not all(isinstance(value, dict) for value in document.values())
+
+    def compile_schema(self, name: str, schema: Any, source: str) -> str:
+        """ Returns the source of the module for one schema. """
+        from .generate_draft_7 import ModelOutputParser
+        from .schema_compiler import SchemaModelCompiler
+        response_schema = ResponseSchema(schema)
+        if not response_schema.is_valid_schema:
+            raise SchemaCompileError(
+                f"{source} is not a valid Draft-7 schema")
+        schema_dict = response_schema.to_dict()
+        wrapped_schema = self.response_generator.wrap_root_in_object(
+            schema_dict)
+        compiler = SchemaModelCompiler(wrapped_schema)
+        try:
+            model = compiler.compile()
+        except ValueError as e:
+            raise SchemaCompileError(f"Failed to compile {source}: {e}")
+        format_instructions = ModelOutputParser(
+            pydantic_object=model).get_format_instructions()
+        try:
+            models = render_models(compiler.models)
+        except ValueError as e:
+            raise SchemaCompileError(f"Failed to generate {source}: {e}")
+
+        module_source = MODULE_TEMPLATE.format(
+            name=name,
+            source=source,
+            schema=render_value(schema_dict),
+            wrapped_schema=render_value(wrapped_schema),
+            format_instructions=render_value(format_instructions),
+            models=models.rstrip() + "\n",
+            model_name=model.__name__,
+            shape=classify_schema(schema_dict),
+            fingerprint=schema_fingerprint(schema_dict),
+            wrapped_fingerprint=schema_fingerprint(wrapped_schema))
+        self.check_module(module_source, compiler.models, model.__name__,
+                          source)
+        return module_source
+
+    def check_module(self, module_source: str, models: Dict[str, Any],
+                     model_name: str, source: str) -> None:
+        """
+        Imports the generated module and checks that its models have the same
+        fields, aliases, defaults, annotations and constraints as models, by
+        rendering them again. Their JSON schemas are not compared, those of
+        recursive models come out shaped differently.
+        """
+        module = types.ModuleType(f"lang2logic_check_{module_name(source)}")
+        try:
+            exec(compile(module_source, source, "exec"), module.__dict__)
+            generated = {name: module.__dict__[name] for name in models}
+            rendered = render_models(generated)
+            model = module.schema.model
+        except Exception as e:
+            raise SchemaCompileError(
+                f"Generated module for {source} does not import: {e}")
+        if rendered != render_models(models) or model is not generated.get(
+                model_name):
+            raise SchemaCompileError(
+                f"Generated model for {source} differs from the compiled one")
+
+    def compile_package(self, paths: List[str], output: str) -> List[str]:
+        """ Writes the package to output and returns its module names. """
+        modules: Dict[str, str] = {}
+        for name, schema, source in self.load_schemas(paths):
+            identifier = module_name(name)
+            if identifier in modules:
+                raise SchemaCompileError(
+                    f"Two schemas map to the module name {identifier!r}")
+            modules[identifier] = self.compile_schema(name, schema, source)
+        if not modules:
+            raise SchemaCompileError("No schemas found")
+
+        os.makedirs(output, exist_ok=True)
+        for identifier, module_source in modules.items():
+            self.write_file(os.path.join(output, f"{identifier}.py"),
+                            module_source)
+        self.write_file(os.path.join(output, "__init__.py"),
+                        self.render_package(output, list(modules)))
+        return list(modules)
+
+    def render_package(self, output: str, identifiers: List[str]) -> str:
+        package = module_name(os.path.basename(os.path.normpath(output)))
+        return PACKAGE_TEMPLATE.format(
+            package=package,
+            example=identifiers[0],
+            imports="\n".join(f"from .{identifier} import schema as "
+                              f"{identifier}" for identifier in identifiers),
+            entries="\n".join(f"    {identifier!r}: {identifier},"
+                              for identifier in identifiers))
+
+    def write_file(self, path: str, content: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+
+
+def run_compile(args: argparse.Namespace) -> int:
+    try:
+        identifiers = SchemaPackageCompiler().compile_package(
+            args.paths, args.output)
+    except SchemaCompileError as e:
+        print(f"lang2logic compile: {e}", file=sys.stderr)
+        return 1
+    print(f"Compiled {len(identifiers)} schema(s) into {args.output}")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="lang2logic")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+    compile_parser = subparsers.add_parser(
+        "compile",
+        help="compile Draft-7 schemas into an importable models package")
+    compile_parser.add_argument(
+        "paths",
+        nargs="+",
+        help="schema files, or directories of .json schema files")
+    compile_parser.add_argument("-o",
+                                "--output",
+                                required=True,
+                                help="directory of the package to write")
+    compile_parser.set_defaults(func=run_compile)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
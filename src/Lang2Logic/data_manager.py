@@ -2,10 +2,6 @@ import json
 import os
 from datetime import datetime
 import warnings
-from jsonschema import validate
-from jsonschema import Draft7Validator
-
-import jsonschema
 import functools
 
 #custom imports
@@ -90,7 +86,11 @@ class DataManagement:
             "logs": [],
             "instructions": {
                 "draft-7":
-                "Given a set of instructions, generate a JSON Schema compliant with the Draft-07 specification for the purpose of defining the output format for a task. Your response must be draft-7 compliant. The schema should accurately reflect the structure and constraints. Use `enum` with a single item for constant values. Only return the Draft-07 Json and no other. Unique and Regex items not allowed "
+                "Given a set of instructions, generate a JSON Schema compliant with the Draft-07 specification for the purpose of defining the output format for a task. Your response must be draft-7 compliant. The schema should accurately reflect the structure and constraints. Use `enum` with a single item for constant values. Only return the Draft-07 Json and no other. Unique and Regex items not allowed ",
+                "combined":
+                "Given a set of instructions, generate a JSON Schema compliant with the Draft-07 specification for the purpose of defining the output format for a task, then complete the task. The schema should accurately reflect the structure and constraints. Use `enum` with a single item for constant values. Unique and Regex items not allowed. Return a single JSON object with exactly two keys: \"schema\", the Draft-07 schema, and \"response\", the answer to the task, which must be valid against that schema. Only return this JSON object and no other.",
+                "batch":
+                "You are given several numbered tasks that share one output format. Complete each task independently of the others. Return a single JSON array with exactly one answer per task, in the same order as the tasks. Every answer must be valid against the JSON Schema below. Only return this JSON array and no other."
             },
             "fatal_errors": [],
             "draft_7_schema": None
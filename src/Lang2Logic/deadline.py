@@ -0,0 +1,166 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    Raised when a call runs out of its time budget. stage names the step that
+    could not finish and partial holds whatever had been produced so far:
+    the model output, decoded as JSON when possible, or None.
+    """
+
+    def __init__(self,
+                 message: str,
+                 stage: Optional[str] = None,
+                 partial: Any = None):
+        super().__init__(message)
+        self.stage = stage
+        self.partial = partial
+
+
+class Deadline:
+    """
+    Absolute time budget for one request. It also remembers the slowest LLM
+    call seen so far, to judge whether another call can still finish.
+    """
+
+    def __init__(self, timeout: float, clock=time.monotonic):
+        if timeout <= 0:
+            raise ValueError("timeout must be positive")
+        self.clock = clock
+        self.expires_at = clock() + timeout
+        self.slowest_call = 0.0
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self.clock())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def record_call(self, seconds: float) -> None:
+        self.slowest_call = max(self.slowest_call, seconds)
+
+    def can_afford_call(self) -> bool:
+        remaining = self.remaining()
+        return remaining > 0 and remaining >= self.slowest_call
+
+    def check(self, stage: str, partial: Any = None) -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}", stage,
+                                   partial)
+
+
+_current_deadline: contextvars.ContextVar = contextvars.ContextVar(
+    "lang2logic_deadline", default=None)
+
+
+def get_deadline() -> Optional[Deadline]:
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(timeout: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    Sets the deadline for the calls made inside the block. A nested scope can
+    only shorten the enclosing deadline; timeout=None keeps it unchanged.
+    """
+    current = get_deadline()
+    if timeout is None:
+        yield current
+        return
+    deadline = Deadline(timeout)
+    if current is not None and current.expires_at < deadline.expires_at:
+        deadline = current
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def decode_partial(output: Any) -> Any:
+    """ Best-effort JSON value of a model output, for DeadlineExceeded. """
+    if not isinstance(output, str):
+        return output
+    from .json_repair import repair_json
+    try:
+        return repair_json(output)
+    except ValueError:
+        return output
+
+
+def check_deadline(stage: str, partial: Any = None) -> None:
+    deadline = get_deadline()
+    if deadline is not None:
+        deadline.check(stage, partial)
+
+
+def check_llm_budget(stage: str, output: Any = None) -> None:
+    """
+    Raises DeadlineExceeded instead of starting an LLM repair or retry step
+    that cannot finish before the deadline.
+    """
+    deadline = get_deadline()
+    if deadline is not None and not deadline.can_afford_call():
+        raise DeadlineExceeded(f"Not enough time left for {stage}", stage,
+                               decode_partial(output))
+
+
+def check_wait(seconds: float, stage: str) -> None:
+    """ Raises DeadlineExceeded when waiting seconds would pass the deadline. """
+    deadline = get_deadline()
+    if deadline is not None and seconds > deadline.remaining():
+        raise DeadlineExceeded(f"Waiting for {stage} would pass the deadline",
+                               stage)
+
+
+def invoke_with_deadline(chat_model: Any, text: str, stage: str,
+                         **kwargs: Any) -> Any:
+    """
+    chat_model.invoke bounded by the current deadline. The remaining budget
+    is passed to the model as its request timeout.
+    """
+    deadline = get_deadline()
+    if deadline is None:
+        return chat_model.invoke(text, **kwargs)
+    deadline.check(stage)
+    start = time.monotonic()
+    try:
+        response = chat_model.invoke(text,
+                                     timeout=deadline.remaining(),
+                                     **kwargs)
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        if deadline.expired():
+            raise DeadlineExceeded(f"Deadline exceeded during {stage}",
+                                   stage) from e
+        raise
+    finally:
+        deadline.record_call(time.monotonic() - start)
+    deadline.check(stage, decode_partial(response.content))
+    return response
+
+
+async def ainvoke_with_deadline(chat_model: Any, text: str, stage: str,
+                                **kwargs: Any) -> Any:
+    """ Coroutine version of invoke_with_deadline; cancels the call on expiry. """
+    deadline = get_deadline()
+    if deadline is None:
+        return await chat_model.ainvoke(text, **kwargs)
+    import asyncio
+    deadline.check(stage)
+    remaining = deadline.remaining()
+    start = time.monotonic()
+    try:
+        return await asyncio.wait_for(
+            chat_model.ainvoke(text, timeout=remaining, **kwargs), remaining)
+    except DeadlineExceeded:
+        raise
+    except asyncio.TimeoutError as e:
+        raise DeadlineExceeded(f"Deadline exceeded during {stage}",
+                               stage) from e
+    finally:
+        deadline.record_call(time.monotonic() - start)
@@ -0,0 +1,152 @@
+from typing import Optional, Union, List, Dict, Any
+from pydantic import BaseModel, Field
+from jsonschema import Draft7Validator, exceptions as jsonschema_exceptions
+
+#custom imports
+from .response_schema import schema_fingerprint, schema_registry
+
+
+class SchemaProperty(BaseModel):
+    # Basic JSON Schema fields
+    type: Optional[Union[str, List[str]]] = None
+    properties: Optional[Dict[str, 'SchemaProperty']] = None
+    items: Optional[Union['SchemaProperty', List['SchemaProperty']]] = None
+    additionalProperties: Union[bool, 'SchemaProperty'] = True
+    required: Optional[List[str]] = None
+    enum: Optional[List[Any]] = None
+    # String-specific fields
+    maxLength: Optional[int] = None
+    minLength: Optional[int] = None
+    #pattern: Optional[str] = None
+
+    # Numeric-specific fields
+    maximum: Optional[Union[int, float]] = None
+    exclusiveMaximum: Optional[Union[int, float]] = None
+    minimum: Optional[Union[int, float]] = None
+    exclusiveMinimum: Optional[Union[int, float]] = None
+    multipleOf: Optional[Union[int, float]] = None
+
+    # Array-specific fields
+    maxItems: Optional[int] = None
+    minItems: Optional[int] = None
+    #uniqueItems: Optional[bool] = None
+
+    # Object-specific fields
+    maxProperties: Optional[int] = None
+    minProperties: Optional[int] = None
+    dependentRequired: Optional[Dict[str, List[str]]] = None
+    dependentSchemas: Optional[Dict[str, 'SchemaProperty']] = None
+
+    # Combining schemas
+    allOf: Optional[List['SchemaProperty']] = None
+    anyOf: Optional[List['SchemaProperty']] = None
+    oneOf: Optional[List['SchemaProperty']] = None
+    not_: Optional['SchemaProperty'] = Field(None, alias='not')
+
+    # Annotations
+    title: Optional[str] = None
+    description: Optional[str] = None
+    default: Optional[Any] = None
+    examples: Optional[List[Any]] = None
+
+    # Conditional subschemas (Draft-07)
+    if_: Optional['SchemaProperty'] = Field(None, alias='if')
+    then: Optional['SchemaProperty'] = None
+    else_: Optional['SchemaProperty'] = Field(None, alias='else')
+
+    # Draft-07 specific fields
+    readOnly: Optional[bool] = None
+    writeOnly: Optional[bool] = None
+    contentMediaType: Optional[str] = None
+    contentEncoding: Optional[str] = None
+    comment: Optional[str] = Field(None, alias='$comment')
+
+    class Config:
+        extra = 'allow'
+        populate_by_name = True
+
+
+class Draft7Schema(BaseModel):
+    _raw_data: Optional[Dict[str, Any]] = None
+    # Core keywords
+    schema_: Optional[str] = Field(default=None,
+                                   alias='$schema',
+                                   format='uri-reference')
+    id_: Optional[str] = Field(default=None,
+                               alias='$id',
+                               format='uri-reference')
+    ref_: Optional[str] = Field(None, alias='$ref')
+    comment_: Optional[str] = Field(None, alias='$comment')
+
+    # Other schema fields
+    type: Optional[Union[str, List[str]]] = None
+    properties: Optional[Dict[str, SchemaProperty]] = None
+    additionalProperties: Union[bool, SchemaProperty] = True
+    required: Optional[List[str]] = None
+    patternProperties: Optional[Dict[str, 'SchemaProperty']] = None
+    dependencies: Optional[Dict[str, Union[List[str],
+                                           'SchemaProperty']]] = None
+    minProperties: Optional[int] = None
+    maxProperties: Optional[int] = None
+
+    # String validation keywords
+    minLength: Optional[int] = None
+    maxLength: Optional[int] = None
+    #pattern: Optional[str] = None
+    format: Optional[str] = None  # Includes the new formats from Draft-07
+
+    # Number validation keywords
+    minimum: Optional[float] = None
+    maximum: Optional[float] = None
+    exclusiveMinimum: Optional[float] = None
+    exclusiveMaximum: Optional[float] = None
+    multipleOf: Optional[float] = None
+
+    # Array validation keywords
+    items: Optional[Union['SchemaProperty', List['SchemaProperty']]] = None
+    additionalItems: Union[bool, 'SchemaProperty'] = True
+    minItems: Optional[int] = None
+    maxItems: Optional[int] = None
+    #uniqueItems: Optional[bool] = None
+
+    # Conditional subschemas (Draft-07)
+    if_: Optional['SchemaProperty'] = Field(None, alias='if')
+    then: Optional['SchemaProperty'] = None
+    else_: Optional['SchemaProperty'] = Field(None, alias='else')
+
+    # Draft-07 specific keywords
+    readOnly: Optional[bool] = None
+    writeOnly: Optional[bool] = None
+    contentMediaType: Optional[str] = None
+    contentEncoding: Optional[str] = None
+
+    # Annotations
+    title: Optional[str] = None
+    description: Optional[str] = None
+    default: Optional[Any] = None
+    examples: Optional[List[Any]] = None
+
+    # Keywords for hypermedia environments
+    links: Optional[List[Dict[str, Any]]] = None  # For hyper-schema links
+
+    # Additional class configuration
+    class Config:
+        extra = 'allow'
+        populate_by_name = True
+        json_encoders = {'SchemaProperty': lambda v: v.dict(by_alias=True, )}
+
+    def __init__(self, **data):
+        # Perform JSON Schema Draft-7 validation on the input data, re-running
+        # the uncached check only to build the error message
+        if not schema_registry.is_valid(schema_fingerprint(data), data):
+            try:
+                Draft7Validator.check_schema(data)
+            except jsonschema_exceptions.SchemaError as e:
+                raise ValueError(
+                    f"Schema validation error: {e.message}") from e
+
+        # Call the super __init__ to handle usual Pydantic initialization
+        super().__init__(**data)
+
+    def to_json(self, **kwargs):
+        return super().json(by_alias=True, exclude_none=True, **kwargs)
@@ -0,0 +1,166 @@
+import traceback
+from langchain.prompts import PromptTemplate
+
+#custom imports
+from .request_context import RequestContext
+from .response_schema import ResponseSchema
+from .json_utils import extract_json_payload
+from .json_repair import repair_json
+from .metrics import Metrics
+from .async_utils import run_blocking
+from .deadline import (DeadlineExceeded, ainvoke_with_deadline,
+                       invoke_with_deadline)
+
+
+class CombinedGenerator:
+    """
+    Asks the model for the Draft-7 schema and the answer in a single
+    completion. Both are checked locally; when either is unusable the caller
+    falls back to the two-step schema then response flow.
+    """
+
+    def __init__(self, chat_model, response_generator):
+        self.chat_model = chat_model
+        self.response_generator = response_generator
+        self.metrics = Metrics("successes", "invalid_schemas",
+                               "invalid_responses")
+
+    def get_context(self, context=None):
+        """Starts a new RequestContext when the caller did not pass one."""
+        return RequestContext() if context is None else context
+
+    def construct_template(self, context=None):
+        context = self.get_context(context)
+        instructions = context.get_instruction_by_key("combined")
+        prompt = PromptTemplate(
+            template=
+            "Based off of this task: \n{query}\nRequest: \n{format_instructions}\n",
+            input_variables=["query"],
+            partial_variables={"format_instructions": instructions},
+        )
+        return prompt
+
+    def construct_input(self, context=None):
+        context = self.get_context(context)
+        try:
+            prompt = self.construct_template(context)
+            _input = prompt.format_prompt(query=context.get_prompt())
+        except Exception as e:
+            context.log_message("code_errors",
+                                f"Failed to construct query: {e}")
+            context.log_fatal_error(f"Failed to construct query: {e}")
+        return _input
+
+    @staticmethod
+    def is_combined_payload(payload):
+        return isinstance(payload, dict) and "schema" in payload and (
+            "response" in payload)
+
+    def parse_output(self, output, context=None):
+        """
+        Returns (schema, answer) from the output. schema is None when the
+        output has no valid Draft-7 schema, and answer is None when it has no
+        answer that validates against that schema.
+        """
+        context = self.get_context(context)
+        try:
+            payload = extract_json_payload(output)
+        except ValueError:
+            payload = None
+        if not self.is_combined_payload(payload):
+            try:
+                payload = repair_json(output)
+            except ValueError:
+                payload = None
+        if not self.is_combined_payload(payload):
+            self.metrics.increment("invalid_schemas")
+            context.log_message(
+                "warnings",
+                f"Combined output has no schema and response\nResponse: {output}"
+            )
+            return None, None
+
+        try:
+            schema = ResponseSchema(payload["schema"])
+        except (TypeError, ValueError):
+            schema = None
+        if schema is None or not schema.is_valid_schema:
+            self.metrics.increment("invalid_schemas")
+            context.log_message(
+                "warnings",
+                f"Combined output has an invalid schema\nResponse: {output}")
+            return None, None
+
+        if not schema.is_valid_instance(payload["response"]):
+            self.metrics.increment("invalid_responses")
+            context.log_message(
+                "warnings",
+                f"Combined output answer does not match its schema\nResponse: {output}"
+            )
+            return schema, None
+        return schema, payload["response"]
+
+    def handle_output(self, output, context=None):
+        """
+        Records the schema and builds the response like ResponseGenerator
+        would. Returns (schema, response) with the same None rules as
+        parse_output.
+        """
+        context = self.get_context(context)
+        schema, answer = self.parse_output(output, context)
+        if schema is None:
+            return None, None
+        context.set_draft_7_schema(schema)
+        context.set_schema_generation_success(True)
+        if answer is None:
+            return schema, None
+        try:
+            model = self.response_generator.load_schema_to_pydantic(
+                schema, context)
+            if schema.to_dict().get("type") != "object":
+                # Match the {"root": ...} wrapper of the compiled model
+                answer = {"root": answer}
+            parsed_output = model.model_validate(answer)
+            response = self.response_generator.handle_output(
+                parsed_output, context)
+        except Exception as e:
+            self.metrics.increment("invalid_responses")
+            context.log_message(
+                "warnings",
+                f"Failed to build combined response: {e}\nResponse: {output}")
+            return schema, None
+        self.metrics.increment("successes")
+        return schema, response
+
+    def generate(self, context=None):
+        context = self.get_context(context)
+        _input = self.construct_input(context)
+        try:
+            response = invoke_with_deadline(self.chat_model,
+                                            _input.to_string(),
+                                            "combined generation",
+                                            max_tokens=3000)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            context.log_fatal_error(
+                f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
+            )
+        return self.handle_output(response.content, context)
+
+    async def agenerate(self, context=None):
+        context = self.get_context(context)
+        _input = self.construct_input(context)
+        try:
+            response = await ainvoke_with_deadline(self.chat_model,
+                                                   _input.to_string(),
+                                                   "combined generation",
+                                                   max_tokens=3000)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            context.log_fatal_error(
+                f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
+            )
+        return await run_blocking(self.handle_output, response.content,
+                                  context)
@@ -1,352 +1,742 @@
+import functools
 import json
-import tempfile
-import importlib.util
+import threading
 from langchain.prompts import PromptTemplate
 from pydantic import ValidationError
-from pathlib import Path
-import subprocess
-from pydantic import BaseModel
-from typing import Type, Any, List
-from typing import ForwardRef, _eval_type, List, Dict
 import traceback
-import sys
 from langchain.output_parsers import OutputFixingParser, PydanticOutputParser, RetryWithErrorOutputParser
 
 #custom imports
-from .generate_draft_7 import SchemaGenerator
-from .data_manager import DataManagement
+from .generate_draft_7 import ModelOutputParser
+from .request_context import RequestContext
 from .response_schema import ResponseSchema
+from .schema_compiler import SchemaModelCompiler
+from .model_cache import CompiledResponseModel, ResponseModelCache
+from .async_utils import StepCall, arun_steps, run_steps
+from .deadline import (DeadlineExceeded, ainvoke_with_deadline,
+                       check_llm_budget, invoke_with_deadline)
+from .json_utils import extract_json_payload
+from .json_repair import repair_json
+from .incremental_json import (IncrementalJSONParser, PartialSchemaChecker,
+                               StreamDiverged, StreamSchemaViolation)
+from .managed_chat_model import with_deadline
+from .metrics import Metrics
+from .schema_shapes import lean_plans
+from .schema_compaction import model_format_instructions
+
+
+# Top-level keywords that stay on the wrapper object when the root is wrapped
+DOCUMENT_KEYWORDS = ("$schema", "$id", "definitions", "$defs")
 
 
 class ResponseGenerator:
 
-    def __init__(self, llm_model, chat_model):
+    def __init__(self, llm_model, chat_model, model_cache=None,
+                 lean_path=True):
         self.llm_model = llm_model
         self.chat_model = chat_model
-        self.schema_generator = SchemaGenerator(llm_model, chat_model)
-        self.data_manager = DataManagement()
-        self.generated_pydantic_model = None
-        self.parser = None
-        self.fixer = None
-
-    def generate_parsers(self):
-        if self.generated_pydantic_model:
-            try:
-                self.parser = PydanticOutputParser(
-                    pydantic_object=self.generated_pydantic_model)
-                self.fixer = OutputFixingParser.from_llm(parser=self.parser,
-                                                         llm=self.chat_model)
-                self.retry_parser = RetryWithErrorOutputParser.from_llm(
-                    parser=self.parser, llm=self.chat_model)
-            except Exception as e:
-                self.data_manager.log_message(
-                    "code_error", f"Failed to generate parsers: {e}")
-                self.data_manager.log_message(
-                    "user_error", f"Failed to generate parsers: {e}")
-                self.data_manager.log_fatal_error(
-                    f"Failed to generate parsers: {e}")
-        else:
-            self.data_manager.log_fatal_error(
+        # Answer scalar, enum, list and flat object schemas without a model
+        self.lean_path = lean_path
+        if model_cache is None:
+            model_cache = ResponseModelCache()
+        self.model_cache = model_cache
+        # Entries for PrecompiledSchema handles, keyed by schema fingerprint
+        self.precompiled = {}
+        self._precompiled_lock = threading.Lock()
+        # How often responses are parsed without the LangChain parsers
+        self.metrics = Metrics("fast_path_hits", "fast_path_misses",
+                               "local_repairs", "llm_fixes", "stream_aborts",
+                               "lean_hits", "lean_misses")
+
+    def get_context(self, context=None):
+        """Starts a new RequestContext when the caller did not pass one."""
+        return RequestContext() if context is None else context
+
+    def generate_parsers(self, model, context=None):
+        context = self.get_context(context)
+        if not model:
+            context.log_fatal_error(
                 "No generated model available for parsing.")
+        try:
+            parser = ModelOutputParser(pydantic_object=model)
+            # The parsers call the model themselves, bound them by the deadline
+            fixer = OutputFixingParser.from_llm(
+                parser=parser, llm=with_deadline(self.chat_model))
+            retry_parser = RetryWithErrorOutputParser.from_llm(
+                parser=parser, llm=with_deadline(self.chat_model))
+        except Exception as e:
+            context.log_message("code_error",
+                                f"Failed to generate parsers: {e}")
+            context.log_message("user_error",
+                                f"Failed to generate parsers: {e}")
+            context.log_fatal_error(
+                f"Failed to generate parsers: {e}")
+        return parser, fixer, retry_parser
 
-    def wrap_root_in_object(self, json_schema):
+    def wrap_root_in_object(self, json_schema, context=None):
         """
         Takes a JSON schema and wraps the root element in an object if it's not already an object.
         """
+        context = self.get_context(context)
         # Load the schema into a dictionary if it's a string
         try:
-            if self.data_manager.validate_draft_7_schema(json_schema):
-                schema_dict = self.data_manager.get_response_schema_dict(
+            if context.validate_draft_7_schema(json_schema):
+                schema_dict = context.get_response_schema_dict(
                     json_schema)
         except ValidationError as e:
-            self.data_manager.log_message(
+            context.log_message(
                 "code_error",
                 f"Please contact dylanpwilson2005@gmail.com about this error. Wrong input type. Failed to load schema into dictionary during wraping of schema: {e}"
             )
-            self.data_manager.log_message(
+            context.log_message(
                 "user_error",
                 f"During conversion of schema to validator object an error occured please contact dylanpwilson2005@gmail.com abou the error. \n Error: {e}"
             )
-            self.data_manager.log_fatal_error(
+            context.log_fatal_error(
                 f"Failed to convert schema to validator object: {e}")
         # Check if the root type is already an object
         try:
             if schema_dict.get("type") == "object":
                 return schema_dict
 
-            # Extract $schema and any other top-level keys except for those defining the root type
+            # Keep $schema and the definitions refs point into at the top
+            # level, every other keyword (enum, minItems, ...) describes the root
             wrapped_schema = {
                 key: value
                 for key, value in schema_dict.items()
-                if key != "type" and key != "properties" and key != "items"
+                if key in DOCUMENT_KEYWORDS
+            }
+            # A null "properties" or "items" is not a valid Draft-7 schema
+            root = {
+                key: value
+                for key, value in schema_dict.items()
+                if key not in DOCUMENT_KEYWORDS and value is not None
             }
             wrapped_schema.update({
                 "type": "object",
                 "properties": {
-                    "root": {
-                        "type": schema_dict.get("type"),
-                        "properties": schema_dict.get("properties"),
-                        "items": schema_dict.get("items")
-                    }
+                    "root": root
                 },
                 "required": ["root"]
             })
         except Exception as e:
-            self.data_manager.log_message(
+            context.log_message(
                 "code_error",
                 f"Please contact dylanpwilson2005@gmail.com about this error. Failed to remove root during wraping of schema: {e}"
             )
-            self.data_manager.log_message(
+            context.log_message(
                 "user_error",
                 f"During conversion of schema to validator object an error occured please contact dylanpwilson2005@gmail.com about the error. \n Error: {e}"
             )
-            self.data_manager.log_fatal_error(
+            context.log_fatal_error(
                 f"Failed to convert schema to validator object: {e}")
 
         return wrapped_schema
 
-    def load_schema_to_pydantic(self, schema):
+    def load_schema_to_pydantic(self, schema, context=None):
         """
-        loads a schema into a pydantic model
+        loads a schema into a pydantic model, reusing the cached compilation
+        of the wrapped schema when there is one
         """
-        #retrieve schema from data manager
+        context = self.get_context(context)
+        #retrieve schema from the request context
         try:
-            schema = self.data_manager.get_draft_7_schema()
+            if schema is None:
+                schema = context.get_draft_7_schema()
             if not schema:
-                self.data_manager.log_message(
-                    "code_error", "No schema provided to create validator.")
-                self.data_manager.log_fatal_error(
+                context.log_message("code_error",
+                                    "No schema provided to create validator.")
+                context.log_fatal_error(
                     "Please contact dylanpwilson2005@gmail.com regarding this bug. No schema provided to create validator."
                 )
         except ValidationError as e:
-            self.data_manager.log_message(
+            context.log_message(
                 "code_error",
                 f"Please contact Please contact dylanpwilson2005@gmail.com regarding this bug. Schema could not be retireved.Error{e}"
             )
+        context.compiled_model = self.get_compiled_model(schema, context)
+        return context.compiled_model.model
+
+    def get_compiled_model(self, schema, context=None):
+        """
+        Returns the compiled model for a schema, compiling the wrapped schema
+        only when it is not cached yet.
+        """
         schema = ResponseSchema(schema)
-        schema_dict = self.wrap_root_in_object(schema.to_dict())
+        precompiled = self.precompiled.get(schema.fingerprint)
+        if precompiled is not None:
+            return precompiled[1]
+        schema_dict = self.wrap_root_in_object(schema.to_dict(), context)
+        return self.model_cache.get_or_create(
+            schema_dict,
+            functools.partial(self.compile_response_model, context=context))
 
+    def register_precompiled(self, handle):
+        """
+        Answers handle's schema with its generated model from now on, so the
+        schema is never wrapped or compiled at runtime.
+        """
+        with self._precompiled_lock:
+            if handle.fingerprint in self.precompiled:
+                return
+            compiled = self.build_compiled_model(
+                handle.wrapped_fingerprint,
+                handle.wrapped_schema,
+                handle.model,
+                handle.format_instructions,
+                validator=handle.validator)
+            self.precompiled[handle.fingerprint] = (handle, compiled)
+
+    def compile_response_model(self,
+                               fingerprint,
+                               schema_dict,
+                               stored=None,
+                               context=None):
+        """
+        Builds the model, parsers and format instructions for a wrapped schema.
+        stored is the (model, format_instructions) pair from the model cache's
+        disk tier, used instead of compiling when given. Build logs go to the
+        context of the request that triggered the build.
+        """
+        context = self.get_context(context)
+        if stored is not None:
+            model, format_instructions = stored
+            return self.build_compiled_model(fingerprint,
+                                             schema_dict,
+                                             model,
+                                             format_instructions,
+                                             context=context)
         try:
-            with tempfile.NamedTemporaryFile(mode='w+',
-                                             suffix='.json',
-                                             delete=False) as temp_input:
-                json.dump(schema_dict, temp_input)
-                temp_input.flush()
-
-                output_file = Path(temp_input.name).with_suffix('.py')
-                subprocess.run([
-                    sys.executable, '-m', 'datamodel_code_generator',
-                    '--input', temp_input.name, '--input-file-type',
-                    'jsonschema', '--output',
-                    str(output_file)
-                ],
-                               check=True)
+            compiler = SchemaModelCompiler(schema_dict)
+            model = compiler.compile()
         except Exception as e:
-            self.data_manager.log_message(
+            context.log_message(
                 "code_error", f"Failed to generate Pydantic models: {e}")
-            self.data_manager.log_message(
+            context.log_message(
                 "user_error", f"Failed to generate Pydantic models: {e}")
-            self.data_manager.log_fatal_error(
-                "Failed to generate Pydantic models. Ensure dependencies are up to date and check permissions."
+            context.log_fatal_error(
+                f"Failed to generate Pydantic models: {e}TRACEBACK{traceback.format_exc()}"
             )
-            return None
-        self.generated_pydantic_model = self.import_generated_models(
-            output_file)
-        return self.generated_pydantic_model
+        return self.build_compiled_model(fingerprint,
+                                         schema_dict,
+                                         model,
+                                         models=compiler.models,
+                                         context=context)
 
-    def import_generated_models(self, output_file):
-        try:
-            # Execute the entire Python file
-            namespace = {}
-            with open(output_file, "r") as file:
-                exec(file.read(), namespace)
-
-            # Collect only Pydantic models from the namespace
-            all_models: Dict[str, Type[BaseModel]] = {
-                name: cls
-                for name, cls in namespace.items()
-                if isinstance(cls, type) and issubclass(cls, BaseModel)
-            }
-            top_level_model = self.find_top_level_model(all_models)
-            if top_level_model:
-                top_level_model.update_forward_refs()
-            if not top_level_model:
-                self.data_manager.log_fatal_error("failed to get top level")
+    def build_compiled_model(self,
+                             fingerprint,
+                             schema_dict,
+                             model,
+                             format_instructions=None,
+                             models=None,
+                             validator=None,
+                             context=None):
+        """
+        Wraps a model with its parsers, format instructions and validator,
+        building the validator unless a precompiled one is given.
+        """
+        context = self.get_context(context)
+        parser, fixer, retry_parser = self.generate_parsers(model, context)
+        compaction = None
+        if format_instructions is None:
+            format_instructions, compaction = model_format_instructions(model)
+            context.log_message(
+                "logs",
+                f"Format instructions schema compacted from "
+                f"{compaction.before_tokens} to {compaction.after_tokens} "
+                f"estimated tokens")
+        if validator is None:
+            wrapped = ResponseSchema(schema_dict)
+            if wrapped.is_valid_schema:
+                validator = wrapped.validator
+        return CompiledResponseModel(
+            fingerprint=fingerprint,
+            wrapped_schema=schema_dict,
+            model=model,
+            parser=parser,
+            fixer=fixer,
+            retry_parser=retry_parser,
+            format_instructions=format_instructions,
+            validator=validator,
+            compaction=compaction,
+            models=models)
 
-            return top_level_model
-        except Exception as e:
-            self.data_manager.log_fatal_error(
-                f"Error importing generated models: {e}TRACEBACK{traceback.format_exc()}"
-            )
-            return None
+    def get_request_model(self, context):
+        if context.compiled_model is None:
+            context.log_fatal_error("No generated model available for parsing.")
+        return context.compiled_model
 
-    def find_top_level_model(self, all_models: Dict[str, Type[BaseModel]]):
-        referenced_models = set()
-        # Collect all models that are referenced in other models
-        all_models.pop('BaseModel', None)
-        all_models.pop('RootItem', None)
-        for model in all_models.values():
-            for field in model.__fields__.values():
-                field_type = self.get_field_type(field)
-                if field_type in all_models.values():
-                    referenced_models.add(field_type)
-
-                # Handling generic types
-                if hasattr(field_type, '__args__'):
-                    for arg in field_type.__args__:
-                        if arg in all_models.values():
-                            referenced_models.add(arg)
-        # Identify top-level models (not referenced by any other model)
-        top_level_models = [
-            model for model in all_models.values()
-            if model not in referenced_models
-        ]
-
-        return top_level_models[0] if top_level_models else None
-
-    def construct_template(self):
+    def construct_template(self, context=None):
+        compiled = self.get_request_model(self.get_context(context))
         # Construct the prompt
         prompt = PromptTemplate(
             template=
             "Return the desired value for this query in the correct format.\n{format_instructions}\n{query}\n",
             input_variables=["query"],
             partial_variables={
-                "format_instructions": self.parser.get_format_instructions()
+                "format_instructions": compiled.format_instructions
             },
         )
         return prompt
 
-    def get_field_type(self, field: Any) -> Type[Any]:
-        if hasattr(field, 'type_'):
-            return field.type_
-        elif hasattr(field, 'outer_type_'):
-            return field.outer_type_
-        else:
-            return type(field)
-
-    def un_wrap_dict(self, dict_object):
+    def un_wrap_dict(self, dict_object, context=None):
         """
         Extracts internal data from a Pydantic model dump.
-        If the model dump contains a 'root' key, it returns the value of 'root'.
-        Otherwise, it returns the entire model dump.
+        If the root of the request schema was wrapped, it returns the value of
+        'root'. Otherwise, it returns the entire model dump.
         """
         try:
-            if 'root' in dict_object and isinstance(dict_object['root'], list):
-                return dict_object['root']
-            return dict_object
+            if 'root' not in dict_object:
+                return dict_object
+            wrapped = self.is_wrapped_root(context)
+            if wrapped is None:
+                # No request schema to tell, only list roots are known wrapped
+                wrapped = isinstance(dict_object['root'], list)
+            return dict_object['root'] if wrapped else dict_object
         except Exception as e:
-            self.data_manager.log_message(
-                "code_errors", f"Failed to convert to desired object: {e}")
-            self.data_manager.log_fatal_error(
-                f"Failed to generate response: {e}")
+            context = self.get_context(context)
+            context.log_message("code_errors",
+                                f"Failed to convert to desired object: {e}")
+            context.log_fatal_error(f"Failed to generate response: {e}")
+
+    def is_wrapped_root(self, context=None):
+        """
+        True when the request schema's root is not an object, None when the
+        request has no schema.
+        """
+        try:
+            schema = ResponseSchema(
+                self.get_context(context).get_draft_7_schema()).to_dict()
+        except Exception:
+            return None
+        if not isinstance(schema, dict) or not schema:
+            return None
+        return schema.get("type") != "object"
 
-    def handle_output(self, parsed_output):
+    def handle_output(self, parsed_output, context=None):
+        context = self.get_context(context)
         if not parsed_output:
-            self.data_manager.log_fatal_error("Parsed output is empty")
+            context.log_fatal_error("Parsed output is empty")
         try:
-            dict_output = self.un_wrap_dict(parsed_output.dict())
-            self.data_manager.log_schema_generation_message(dict_output)
-            self.data_manager.set_response(dict_output)
-            self.data_manager.set_schema_generation_success(True)
+            dict_output = self.un_wrap_dict(parsed_output.dict(by_alias=True),
+                                            context)
+            context.log_schema_generation_message(dict_output)
+            context.set_response(dict_output)
+            context.set_schema_generation_success(True)
             return dict_output
         except Exception as e:
             raise Exception(
                 f"Failed to convert to desired object and handle parsed output: {e}"
             )
 
-    def retry_with_error(self, output):
+    def construct_input(self, context=None):
+        context = self.get_context(context)
         try:
-            prompt = self.data_manager.get_prompt()
-            if not prompt:
-                self.data_manager.log_fatal_error(
-                    "Failed to get prompt. Value is None")
-        except ValueError as e:
-            self.data_manager.log_fatal_error(f"Failed to get prompt: {e}")
+            # Construct the query
+            prompt = self.construct_template(context)
+            _input = prompt.format_prompt(query=context.get_prompt())
+        except Exception as e:
+            context.log_message("code_errors",
+                                f"Failed to construct query: {e}")
+            context.log_fatal_error(f"Failed to construct query: {e}")
+        return _input
+
+    def retry_with_error_steps(self, output, context=None):
+        """ Step generator behind retry_with_error and aretry_with_error. """
+        context = self.get_context(context)
+        if not context.get_prompt():
+            context.log_fatal_error("Failed to get prompt. Value is None")
         try:
-            _input = prompt.format_prompt(query=self.data_manager.get_prompt())
-            response = self.retry_parser.parse_with_prompt(output, _input)
-            self.handle_output(response)
+            _input = self.construct_input(context)
+            retry_parser = self.get_request_model(context).retry_parser
+            response = yield StepCall(retry_parser.parse_with_prompt,
+                                      retry_parser.aparse_with_prompt, output,
+                                      _input)
+            return self.handle_output(response, context)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            self.data_manager.log_fatal_error(
+            context.log_fatal_error(
                 f"Failed to retry parse: {e} TRACEBACK: TRACEBACK{traceback.format_exc()}"
             )
 
-    def retry_parse(self, output):
+    def retry_with_error(self, output, context=None):
+        return run_steps(self.retry_with_error_steps(output, context))
+
+    async def aretry_with_error(self, output, context=None):
+        return await arun_steps(self.retry_with_error_steps(output, context))
+
+    def fast_parse(self, output, compiled):
+        """
+        Builds the model straight from the JSON in the output when it already
+        satisfies the schema. Returns None so the caller can fall back to the
+        LangChain parsers.
+        """
+        if compiled.validator is None:
+            return None
+        try:
+            payload = extract_json_payload(output)
+        except ValueError:
+            return None
+        if not compiled.validator.is_valid(payload):
+            return None
+        try:
+            return compiled.model.model_validate(payload)
+        except ValueError:
+            return None
+
+    def parse_output(self, output, context=None):
+        context = self.get_context(context)
+        compiled = self.get_request_model(context)
+        parsed_output = self.fast_parse(output, compiled)
+        if parsed_output is None:
+            self.metrics.increment("fast_path_misses")
+            parsed_output = compiled.parser.parse(output)
+        else:
+            self.metrics.increment("fast_path_hits")
+        return self.handle_output(parsed_output, context)
+
+    def repair_output(self, output, context=None):
+        """
+        Builds the model from output after deterministic local fixes guided
+        by the schema, or returns None so the caller can escalate to the LLM
+        fixer.
+        """
+        compiled = self.get_request_model(self.get_context(context))
         try:
-            parsed_output = self.parser.parse(output)
-            dict_output = self.handle_output(parsed_output)
-            return dict_output
+            repaired = repair_json(output, compiled.wrapped_schema,
+                                   compiled.validator)
+            parsed_output = compiled.model.model_validate(repaired)
+        except ValueError:
+            return None
+        self.metrics.increment("local_repairs")
+        return parsed_output
+
+    def retry_parse_steps(self, output, context=None):
+        """
+        Step generator behind retry_parse and aretry_parse: parses output,
+        then repairs it locally, then asks the LLM fixer and finally retries
+        with the error, yielding a StepCall for each LLM call.
+        """
+        context = self.get_context(context)
+        try:
+            return self.parse_output(output, context)
         except ValueError as e:
-            self.data_manager.add_try_schema_generation()
-            self.data_manager.log_message(
+            context.add_try_schema_generation()
+            context.log_message(
                 "warnings",
                 f"Failed to parse output during schema generation\n Error: {e}\nResponse: {output}"
             )
+            repaired = self.repair_output(output, context)
+            if repaired is not None:
+                context.log_message("logs", "Output repaired locally")
+                return self.handle_output(repaired, context)
+            check_llm_budget("response repair", output)
             try:
-                fixed_output = self.fixer.parse(output)
-                dict_output = self.handle_output(fixed_output)
+                fixer = self.get_request_model(context).fixer
+                self.metrics.increment("llm_fixes")
+                fixed_output = yield StepCall(fixer.parse, fixer.aparse,
+                                              output)
+                dict_output = self.handle_output(fixed_output, context)
                 return dict_output
             except Exception as ex:
-                self.data_manager.add_try_schema_generation()
-                self.data_manager.log_message(
+                context.add_try_schema_generation()
+                context.log_message(
                     "warnings",
                     f"Failed to parse output after fixing output during schema generation. \n Error: {e}\nResponse: {output}"
                 )
+                check_llm_budget("response retry", output)
                 try:
-                    self.retry_with_error(output)
+                    return (yield from self.retry_with_error_steps(
+                        output, context))
+                except DeadlineExceeded:
+                    raise
                 except Exception as ex:
-                    self.data_manager.add_try_schema_generation()
-                    self.data_manager.set_schema_generation_success(False)
-                    self.data_manager.log_fatal_error(
+                    context.add_try_schema_generation()
+                    context.set_schema_generation_success(False)
+                    context.log_fatal_error(
                         f"Failed to fix and parse output with prompt. \nOutput:{output} \n Error: {ex}"
                     )
         return None
 
-    def generate(self, prompt, schema=None):
-        if not self.data_manager.get_prompt():
-            self.data_manager.log_fatal_error("No prompt provided")
+    def retry_parse(self, output, context=None):
+        return run_steps(self.retry_parse_steps(output, context))
+
+    async def aretry_parse(self, output, context=None):
+        return await arun_steps(self.retry_parse_steps(output, context))
+
+    def check_generate_args(self, schema, context):
+        if not context.get_prompt():
+            context.log_fatal_error("No prompt provided")
         if schema:
             if not isinstance(schema, ResponseSchema):
-                self.data_manager.log_message(
-                    "code_errors", f"f{schema} is not a valid schema")
-                self.data_manager.log_fatal_error(
+                context.log_message("code_errors",
+                                    f"f{schema} is not a valid schema")
+                context.log_fatal_error(
                     "Invalid schema used as paramater for generate_response report error to dylanpwilson2005@gmail.com"
                 )
         else:
-            self.data_manager.log_message(
-                "code_errors", "No schema provided generating schema")
-            self.data_manager.log_fatal_error(
+            context.log_message("code_errors",
+                                "No schema provided generating schema")
+            context.log_fatal_error(
                 "Nonetype. Invalid schema used as paramater for generate_response report error to dylanpwilson2005@gmail.com"
             )
 
-        # Load the schema into a Pydantic model
-        self.load_schema_to_pydantic(schema)
-        self.data_manager.log_message(
-            "logs", "Schema loaded into Pydantic model\nSchema\n")
-        #generate parsers
-        self.generate_parsers()
+    def get_lean_plan(self, schema):
+        """ The LeanResponsePlan for schema, or None when it needs a model. """
+        if not self.lean_path:
+            return None
+        precompiled = self.precompiled.get(ResponseSchema(schema).fingerprint)
+        if precompiled is not None:
+            return precompiled[0].lean_plan
+        return lean_plans.get(schema)
+
+    def generation_call(self, text):
+        """ The StepCall asking the chat model for the response to text. """
+        return StepCall(invoke_with_deadline,
+                        ainvoke_with_deadline,
+                        self.chat_model,
+                        text,
+                        "response generation",
+                        max_tokens=3000)
+
+    def parse_lean_output_steps(self, plan, output, context=None):
+        """
+        Reads output with plan, falling back to the model and its parsers
+        when the output does not match the schema.
+        """
+        context = self.get_context(context)
         try:
-            # Construct the query
-            prompt = self.construct_template()
-            #make request
+            response = plan.parse(output)
+        except ValueError:
+            self.metrics.increment("lean_misses")
+            self.load_schema_to_pydantic(plan.schema, context)
+            return (yield from self.retry_parse_steps(output, context))
+        self.metrics.increment("lean_hits")
+        context.log_schema_generation_message(response)
+        context.set_response(response)
+        context.set_schema_generation_success(True)
+        return response
+
+    def generate_lean_steps(self, plan, context):
+        try:
+            response = yield self.generation_call(
+                plan.construct_prompt(context.get_prompt()))
+            return (yield from self.parse_lean_output_steps(
+                plan, response.content, context))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            self.data_manager.log_message("code_errors",
-                                          f"Failed to construct query: {e}")
-            self.data_manager.log_fatal_error(
-                f"Failed to construct query: {e}")
+            context.log_message(
+                "warnings",
+                f"Failed to generate response from language model: {e}")
+            context.log_fatal_error(
+                f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
+            )
+
+    def generate_steps(self, prompt, schema=None, context=None):
+        """ Step generator behind generate and agenerate. """
+        context = self.get_context(context)
+        if prompt:
+            context.set_prompt(prompt)
+        self.check_generate_args(schema, context)
+
+        plan = self.get_lean_plan(schema)
+        if plan is not None:
+            return (yield from self.generate_lean_steps(plan, context))
+
+        # Load the schema into a Pydantic model and its parsers
+        self.load_schema_to_pydantic(schema, context)
+        context.log_message("logs",
+                            "Schema loaded into Pydantic model\nSchema\n")
+        _input = self.construct_input(context)
 
         try:
             # Generate the response
-            _input = prompt.format_prompt(query=self.data_manager.get_prompt())
-            response = self.chat_model.invoke(_input.to_string(),
-                                              max_tokens=3000)
+            response = yield self.generation_call(_input.to_string())
 
             # Generate the respons
-            return self.retry_parse(response.content)
+            return (yield from self.retry_parse_steps(response.content,
+                                                      context))
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            self.data_manager.log_message(
+            context.log_message(
                 "warnings",
                 f"Failed to generate response from language model: {e}")
-            self.data_manager.log_fatal_error(
+            context.log_fatal_error(
                 f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
             )
+
+    def generate(self, prompt, schema=None, context=None):
+        return run_steps(self.generate_steps(prompt, schema, context))
+
+    async def agenerate(self, prompt, schema=None, context=None):
+        # Schema compilation and parsing run off the event loop
+        return await arun_steps(self.generate_steps(prompt, schema, context))
+
+    def get_stream_mode(self, schema):
+        """
+        Returns "items" when array elements can be streamed, "properties"
+        when top-level properties can, and None when only the complete value
+        can be returned.
+        """
+        root_type = ResponseSchema(schema).to_dict().get("type")
+        if root_type == "array":
+            return "items"
+        if root_type == "object":
+            return "properties"
+        return None
+
+    def get_stream_key(self, mode, path):
+        """ Index or property name of a streamed part, or None to skip it. """
+        if mode == "items":
+            # Accept a bare array as well as the wrapped {"root": [...]}
+            if len(path) == 2 and path[0] == "root" and isinstance(
+                    path[1], int):
+                return path[1]
+            if len(path) == 1 and isinstance(path[0], int):
+                return path[0]
+        elif mode == "properties":
+            if len(path) == 1 and isinstance(path[0], str):
+                return path[0]
+        return None
+
+    def get_stream_part_schema(self, compiled, mode, key):
+        """ Subschema a streamed part must satisfy, or None if unknown. """
+        wrapped = compiled.wrapped_schema
+        if mode == "items":
+            items = wrapped["properties"]["root"].get("items", {})
+            return items if isinstance(items, dict) else None
+        properties = wrapped.get("properties") or {}
+        if key in properties:
+            return properties[key]
+        if wrapped.get("patternProperties"):
+            return None
+        additional = wrapped.get("additionalProperties", {})
+        if additional is False:
+            return None
+        return additional if isinstance(additional, dict) else {}
+
+
+    def continues_stream(self, response, mode, emitted):
+        """ True when response agrees with every part already streamed. """
+        if not emitted:
+            return True
+        if mode == "items" and isinstance(response, list):
+            return len(response) >= len(emitted) and all(
+                response[index] == value for index, value in emitted.items())
+        if mode == "properties" and isinstance(response, dict):
+            return all(key in response and response[key] == value
+                       for key, value in emitted.items())
+        return False
+
+    def remaining_stream_parts(self, response, mode, emitted):
+        """ Yields the parts of a complete response not streamed yet. """
+        if mode == "items" and isinstance(response, list):
+            yield from response[len(emitted):]
+        elif mode == "properties" and isinstance(response, dict):
+            for key, value in response.items():
+                if key not in emitted:
+                    yield key, value
+        elif not emitted:
+            yield response
+
+    def generate_stream(self, prompt, schema=None, context=None):
+        """
+        Streams the response for prompt from the chat model. Array elements
+        are yielded as soon as they close and validate against the item
+        schema; object schemas yield (key, value) pairs for each top-level
+        property. Anything that could not be streamed is yielded from the
+        fully parsed response at the end, which is also returned.
+
+        The partial document is checked against the schema as it arrives.
+        On a definite violation the stream is closed and the output goes
+        straight to retry_with_error instead of being completed and fixed.
+        If the response that is finally parsed does not agree with the parts
+        already yielded, StreamDiverged is raised instead of splicing two
+        answers together.
+        """
+        context = self.get_context(context)
+        if prompt:
+            context.set_prompt(prompt)
+        self.check_generate_args(schema, context)
+        self.load_schema_to_pydantic(schema, context)
+        compiled = self.get_request_model(context)
+        mode = self.get_stream_mode(schema)
+        _input = self.construct_input(context)
+
+        checking = compiled.validator is not None
+        parser = IncrementalJSONParser(checker=PartialSchemaChecker(
+            compiled.wrapped_schema, compiled.validator
+        ) if checking else None)
+        streaming = mode is not None
+        violation = None
+        emitted = {}
+        chunks = []
+        try:
+            stream = self.chat_model.stream(_input.to_string(),
+                                            max_tokens=3000)
+        except Exception as e:
+            context.log_fatal_error(
+                f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
+            )
+        try:
+            for chunk in stream:
+                chunks.append(chunk.content)
+                if not checking:
+                    continue
+                for path, value in parser.feed(chunk.content):
+                    key = self.get_stream_key(mode, path)
+                    if key is None or not streaming:
+                        continue
+                    part_schema = self.get_stream_part_schema(
+                        compiled, mode, key)
+                    if part_schema is None:
+                        # Cannot tell whether this part is valid on its own
+                        streaming = False
+                        continue
+                    error = next(
+                        compiled.validator.descend(value, part_schema), None)
+                    if error is not None:
+                        violation = StreamSchemaViolation(path, error.message)
+                        break
+                    emitted[key] = value
+                    yield value if mode == "items" else (key, value)
+                violation = violation or parser.violation
+                if violation is not None:
+                    break
+                # Malformed output is left to the full parse
+                checking = not parser.failed
+        except Exception as e:
+            context.log_message(
+                "warnings",
+                f"Failed to stream response from language model: {e}")
+            context.log_fatal_error(
+                f"Failed to generate response: {e}TRACEBACK{traceback.format_exc()}"
+            )
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+        output = "".join(chunks)
+        if violation is None:
+            response = self.retry_parse(output, context)
+        else:
+            self.metrics.increment("stream_aborts")
+            context.add_try_schema_generation()
+            context.log_message(
+                "warnings",
+                f"Stopped streaming a response that breaks the schema: {violation}\nResponse: {output}"
+            )
+            response = self.retry_with_error(output, context)
+        if not self.continues_stream(response, mode, emitted):
+            context.log_message(
+                "warnings",
+                f"Response no longer matches the streamed parts\nResponse: {response}"
+            )
+            partial = list(emitted.values()) if mode == "items" else list(
+                emitted.items())
+            raise StreamDiverged(partial, response)
+        yield from self.remaining_stream_parts(response, mode, emitted)
+        return response
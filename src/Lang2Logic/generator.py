@@ -1,111 +1,717 @@
 import os
-from langchain_community.chat_models import ChatOpenAI
+import threading
 import warnings
 
 #custom imports
-from .generate_draft_7 import SchemaGenerator
-from .generate_response import ResponseGenerator
 from .response_schema import ResponseSchema
-from .data_manager import DataManagement
-from .model_unwrap import SchemaModelUnwrapper
-
-#suprress warnings
-# Suppress PydanticDeprecatedSince20 warnings from pydantic module
-warnings.filterwarnings("ignore",
-                        category=DeprecationWarning,
-                        module="pydantic.*")
-
-# Suppress UserWarning from langchain_community.llms.openai module
-warnings.filterwarnings("ignore",
-                        category=UserWarning,
-                        module="langchain_community.llms.openai")
-
-# Suppress DeprecationWarning from langchain_core.prompts.prompt module
-warnings.filterwarnings("ignore",
-                        category=DeprecationWarning,
-                        module="langchain_core.prompts.prompt")
-
-# Suppress PydanticDeprecatedSince20 warnings from langchain.output_parsers.pydantic module
-warnings.filterwarnings("ignore",
-                        category=DeprecationWarning,
-                        module="langchain.output_parsers.pydantic")
-
-# Suppress PydanticDeprecatedSince20 warnings from langchain.output_parsers.pydantic module
-warnings.filterwarnings("ignore",
-                        category=DeprecationWarning,
-                        message=".*`pydantic.config.Extra` is deprecated.*",
-                        module='pydantic.*')
-
-# Suppress PydanticDeprecatedSince20 warnings from pydantic.main module
-warnings.filterwarnings("ignore",
-                        category=DeprecationWarning,
-                        module="pydantic.main")
+from .request_context import RequestContext
+from .async_utils import run_blocking
+from .batch import BatchResult
+from .deadline import DeadlineExceeded, deadline_scope
+from .precompiled import PrecompiledSchema
+from .schema_cache import SchemaCache
+
+# langchain, pydantic, asyncio and the generator modules built on them are
+# imported on first use, so importing this module stays cheap
+
+_warning_filters_installed = False
+
+
+def install_warning_filters():
+    """Suppresses the deprecation warnings langchain and pydantic emit."""
+    global _warning_filters_installed
+    if _warning_filters_installed:
+        return
+    # Suppress PydanticDeprecatedSince20 warnings from pydantic module
+    warnings.filterwarnings("ignore",
+                            category=DeprecationWarning,
+                            module="pydantic.*")
+
+    # Suppress UserWarning from langchain_community.llms.openai module
+    warnings.filterwarnings("ignore",
+                            category=UserWarning,
+                            module="langchain_community.llms.openai")
+
+    # Suppress DeprecationWarning from langchain_core.prompts.prompt module
+    warnings.filterwarnings("ignore",
+                            category=DeprecationWarning,
+                            module="langchain_core.prompts.prompt")
+
+    # Suppress PydanticDeprecatedSince20 warnings from langchain.output_parsers.pydantic module
+    warnings.filterwarnings("ignore",
+                            category=DeprecationWarning,
+                            module="langchain.output_parsers.pydantic")
+
+    # Suppress PydanticDeprecatedSince20 warnings from langchain.output_parsers.pydantic module
+    warnings.filterwarnings(
+        "ignore",
+        category=DeprecationWarning,
+        message=".*`pydantic.config.Extra` is deprecated.*",
+        module='pydantic.*')
+
+    # Suppress PydanticDeprecatedSince20 warnings from pydantic.main module
+    warnings.filterwarnings("ignore",
+                            category=DeprecationWarning,
+                            module="pydantic.main")
+    _warning_filters_installed = True
 
 
 class Generator:
 
-    def __init__(self, api_key):
-        self.data_manager = DataManagement()
-        self.data_manager.reset_data_except_instructions()
+    def __init__(self,
+                 api_key,
+                 model_cache=None,
+                 schema_cache=None,
+                 response_cache=None,
+                 chat_model=None,
+                 single_flight=None,
+                 scheduler=None,
+                 hedging=None,
+                 lean_path=True):
+        install_warning_filters()
+        from .generate_response import ResponseGenerator
+        from .generate_combined import CombinedGenerator
+        self.schema_cache = schema_cache
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        if chat_model is not None:
+            # A caller supplied LangChain chat model replaces the OpenAI models
+            self.chat_model = chat_model
+            self.llm_model = chat_model
+        else:
+            self.init_openai_models(api_key)
+        if scheduler is not None or hedging is not None:
+            self.manage_chat_models(scheduler, hedging)
+        self._schema_generator = None
+        self._schema_generator_lock = threading.Lock()
+        self.ResponseGenerator = ResponseGenerator(self.llm_model,
+                                                   self.chat_model,
+                                                   model_cache=model_cache,
+                                                   lean_path=lean_path)
+        self.combined_generator = CombinedGenerator(self.chat_model,
+                                                    self.ResponseGenerator)
+
+    @property
+    def schema_generator(self):
+        """
+        Built on first use, since it compiles the large Draft-7 models and
+        calls served from the schema cache never need it.
+        """
+        if self._schema_generator is None:
+            with self._schema_generator_lock:
+                if self._schema_generator is None:
+                    from .generate_draft_7 import SchemaGenerator
+                    self._schema_generator = SchemaGenerator(
+                        self.llm_model, self.chat_model)
+        return self._schema_generator
+
+    def init_openai_models(self, api_key):
         if not api_key:
-            self.data_manager.log_fatal_error(
+            self.get_context().log_fatal_error(
                 "API key must be used to initialize the generator")
 
         if not isinstance(api_key, str):
-            self.data_manager.log_fatal_error("API key must be a string")
+            self.get_context().log_fatal_error("API key must be a string")
         try:
+            from langchain_community.chat_models import ChatOpenAI
             os.environ["OPENAI_API_KEY"] = api_key
             self.chat_model = ChatOpenAI(model="gpt-4-1106-preview")
             self.llm_model = ChatOpenAI(model="gpt-4-1106-preview")
         except Exception as e:
-            self.data_manager.log_fatal_error(
+            self.get_context().log_fatal_error(
                 f"Failed to initialize models: {e}")
-        self.schema_generator = SchemaGenerator(self.llm_model,
-                                                self.chat_model)
-        self.ResponseGenerator = ResponseGenerator(self.llm_model,
-                                                   self.chat_model)
+
+    def manage_chat_models(self, scheduler=None, hedging=None):
+        """
+        Routes every chat model call through an LLMScheduler and/or a
+        HedgePolicy.
+        """
+        from .managed_chat_model import ManagedChatModel
+
+        def manage(chat_model):
+            return ManagedChatModel(chat_model=chat_model,
+                                    scheduler=scheduler,
+                                    hedging=hedging)
+
+        shared = self.llm_model is self.chat_model
+        self.chat_model = manage(self.chat_model)
+        self.llm_model = self.chat_model if shared else manage(self.llm_model)
 
     def check_input_as_string(self, input):
         if not isinstance(input, str):
-            self.data_manager.log_fatal_error("Input must be a string")
+            self.get_context().log_fatal_error("Input must be a string")
 
         if len(input) > 800000:
-            self.data_manager.log_fatal_error(
+            self.get_context().log_fatal_error(
                 "Input must be less than 800000 characters")
 
         return input
 
-    def set_schema(self, schema):
+    def set_schema(self, schema, context=None):
+        context = self.get_context(context)
         Unverified_Schema = ResponseSchema(schema)
         if Unverified_Schema.validate_schema():
-            self.data_manager.set_draft_7_schema(Unverified_Schema)
+            context.set_draft_7_schema(Unverified_Schema)
             return True
         else:
             return False
 
-    def generate_schema(self, query):
-        self.data_manager.reset_data_except_instructions()
-        self.data_manager.set_prompt(query)
-        self.schema_generator.generate_draft_7()
-        schema = ResponseSchema(self.data_manager.get_draft_7_schema())
+    def get_context(self, context=None):
+        """Starts a new RequestContext when the caller did not pass one."""
+        return RequestContext() if context is None else context
+
+    def get_request_context(self, query, context=None):
+        if context is None:
+            return RequestContext(query)
+        context.set_prompt(query)
+        return context
+
+    def start_schema_generation(self, query, context, use_cache=True):
+        """
+        Returns the cached schema for query, or None when it has to be
+        generated.
+        """
+        if not use_cache or self.schema_cache is None:
+            return None
+        instructions = context.get_instruction_by_key("draft-7")
+        cached_schema = self.schema_cache.get(query, instructions)
+        if cached_schema is None:
+            return None
+        context.log_message("logs", "Schema loaded from cache")
+        context.set_draft_7_schema(cached_schema)
+        context.set_schema_generation_success(True)
+        return ResponseSchema(cached_schema)
+
+    def finish_schema_generation(self, query, context, use_cache=True):
+        schema = ResponseSchema(context.get_draft_7_schema())
+        if use_cache and self.schema_cache is not None:
+            self.schema_cache.set(query,
+                                  context.get_instruction_by_key("draft-7"),
+                                  schema.to_dict())
         return schema
 
-    def generate(self, query, schema=None):
-        if schema is not None:
-            self.data_manager.reset_data_except_instructions()
-            self.data_manager.set_prompt(query)
-            if not self.set_schema(schema):
-                self.data_manager.log_fatal_error(
-                    "Invalid schema used as parameter for generate_response")
-        else:
-            schema = self.generate_schema(query)
-        model = self.ResponseGenerator.generate(query, schema)
+    def coalesce(self, key, func, *args):
+        """Runs func, sharing one in-flight call among identical requests."""
+        if self.single_flight is None:
+            return func(*args)
+        return self.single_flight.do(key, func, *args)
+
+    async def acoalesce(self, key, func, *args):
+        if self.single_flight is None:
+            return await func(*args)
+        return await self.single_flight.ado(key, func, *args)
+
+    def schema_flight_key(self, query, context):
+        return ("schema", SchemaCache.normalize_prompt(query),
+                context.get_instruction_by_key("draft-7"))
+
+    def response_flight_key(self, query, schema):
+        return ("response", query, schema.fingerprint, self.get_model_name())
+
+    def run_schema_generation(self, context):
+        self.schema_generator.generate_draft_7(context)
+        return ResponseSchema(context.get_draft_7_schema())
+
+    async def arun_schema_generation(self, context):
+        await self.schema_generator.agenerate_draft_7(context)
+        return ResponseSchema(context.get_draft_7_schema())
+
+    def use_shared_schema(self, schema, context):
+        # Callers that waited on another request's call adopt its schema
+        context.set_draft_7_schema(schema)
+        context.set_schema_generation_success(True)
+
+    def use_examples(self, examples, context):
+        """Infers the schema from example documents instead of asking the model."""
+        if isinstance(examples, (str, dict)) or not hasattr(
+                examples, "__iter__"):
+            context.log_fatal_error("examples must be a list of documents")
+        try:
+            schema = ResponseSchema.infer_from_examples(*examples)
+        except (TypeError, ValueError) as e:
+            context.log_fatal_error(f"Failed to infer schema from examples: {e}")
+        context.log_message("logs", "Schema inferred from examples")
+        context.set_draft_7_schema(schema)
+        context.set_schema_generation_success(True)
+        return schema
+
+    def generate_schema(self,
+                        query,
+                        use_cache=True,
+                        context=None,
+                        examples=None):
+        """
+        Generates the schema for query. When example documents are given the
+        schema is inferred from them locally, without a model call.
+        """
+        context = self.get_request_context(query, context)
+        if examples is not None:
+            return self.use_examples(examples, context)
+        cached_schema = self.start_schema_generation(query, context, use_cache)
+        if cached_schema is not None:
+            return cached_schema
+        schema = self.coalesce(self.schema_flight_key(query, context),
+                               self.run_schema_generation, context)
+        self.use_shared_schema(schema, context)
+        return self.finish_schema_generation(query, context, use_cache)
+
+    async def agenerate_schema(self,
+                               query,
+                               use_cache=True,
+                               context=None,
+                               examples=None):
+        context = self.get_request_context(query, context)
+        if examples is not None:
+            return self.use_examples(examples, context)
+        cached_schema = await run_blocking(self.start_schema_generation, query,
+                                           context, use_cache)
+        if cached_schema is not None:
+            return cached_schema
+        schema = await self.acoalesce(self.schema_flight_key(query, context),
+                                      self.arun_schema_generation, context)
+        self.use_shared_schema(schema, context)
+        return await run_blocking(self.finish_schema_generation, query,
+                                  context, use_cache)
+
+    def pin_schema(self, query, schema):
+        """Pins the schema used for query in the schema cache."""
+        if self.schema_cache is None:
+            self.get_context().log_fatal_error("No schema cache configured")
+        schema = ResponseSchema(schema)
+        if not schema.validate_schema():
+            self.get_context().log_fatal_error("Cannot pin an invalid schema")
+        self.schema_cache.pin(
+            query, self.get_context().get_instruction_by_key("draft-7"),
+            schema.to_dict())
+
+    def invalidate_schema(self, query):
+        """Removes any cached schema for query."""
+        if self.schema_cache is None:
+            return False
+        return self.schema_cache.invalidate(
+            query, self.get_context().get_instruction_by_key("draft-7"))
+
+    def get_model_name(self):
+        return getattr(self.chat_model, "model_name", None) or type(
+            self.chat_model).__name__
+
+    def use_precompiled(self, handle):
+        """ Registers a PrecompiledSchema and returns its ResponseSchema. """
+        self.ResponseGenerator.register_precompiled(handle)
+        return handle.response_schema
+
+    def use_schema(self, schema, context):
+        if isinstance(schema, PrecompiledSchema):
+            schema = self.use_precompiled(schema)
+        if not self.set_schema(schema, context):
+            context.log_fatal_error(
+                "Invalid schema used as parameter for generate_response")
+        return ResponseSchema(schema)
+
+    def load_cached_response(self, query, schema, context, use_cache=True):
+        if self.response_cache is None:
+            return None
+        if not use_cache:
+            self.response_cache.metrics.increment("bypasses")
+            return None
+        cached_response = self.response_cache.get(query, schema.to_dict(),
+                                                  self.get_model_name())
+        if cached_response is not None:
+            context.log_message("logs", "Response loaded from cache")
+            context.set_response(cached_response)
+        return cached_response
+
+    def finish_response(self, query, model, context, use_cache=True):
         try:
-            schema = ResponseSchema(
-                self.data_manager.get_draft_7_schema()).to_dict()
+            schema = ResponseSchema(context.get_draft_7_schema()).to_dict()
+            from .model_unwrap import SchemaModelUnwrapper
             unwrapper = SchemaModelUnwrapper(schema=schema,
-                                             data_manager=self.data_manager)
+                                             data_manager=context)
 
-            return unwrapper.unwrap(model)
+            response = unwrapper.unwrap(model)
         except Exception as e:
-            self.data_manager.log_fatal_error(f"Failed to unwrap model: {e}")
+            context.log_fatal_error(f"Failed to unwrap model: {e}")
+        if use_cache and self.response_cache is not None:
+            self.response_cache.set(query, schema, self.get_model_name(),
+                                    response)
+        return response
+
+    def start_combined_generation(self, query, context, use_cache=True):
+        """
+        Returns the cached schema for query, or the schema and response from
+        a single combined completion. Either may be None, in which case the
+        two-step flow produces it.
+        """
+        schema = self.start_schema_generation(query, context, use_cache)
+        if schema is not None:
+            return schema, None
+        schema, model = self.combined_generator.generate(context)
+        return self.finish_combined_generation(query, schema, model, context,
+                                               use_cache)
+
+    async def astart_combined_generation(self, query, context, use_cache=True):
+        schema = await run_blocking(self.start_schema_generation, query,
+                                    context, use_cache)
+        if schema is not None:
+            return schema, None
+        schema, model = await self.combined_generator.agenerate(context)
+        return await run_blocking(self.finish_combined_generation, query,
+                                  schema, model, context, use_cache)
+
+    def finish_combined_generation(self, query, schema, model, context,
+                                   use_cache):
+        if schema is not None:
+            self.finish_schema_generation(query, context, use_cache)
+        if model is None:
+            context.log_message(
+                "warnings",
+                "Combined generation failed, falling back to the two-step flow"
+            )
+        return schema, model
+
+    def generate(self,
+                 query,
+                 schema=None,
+                 use_cache=True,
+                 context=None,
+                 combined=False,
+                 timeout=None):
+        """
+        Generates a response for query. Every call runs in its own
+        RequestContext (pass one in to inspect its logs afterwards), so a
+        single Generator can serve concurrent calls. With a SingleFlight,
+        identical concurrent calls share one schema and one response call.
+
+        With combined=True and no schema, the schema and the answer are
+        requested in one completion; the separate schema and response calls
+        only run for whichever part of it is invalid.
+
+        schema may also be a PrecompiledSchema from a package generated by
+        `lang2logic compile`, which skips all schema processing.
+
+        timeout (seconds) bounds the whole call, schema generation, parsing
+        and retries included. Each model call gets the remaining time, LLM
+        repair and retry steps that cannot finish in time are skipped, and
+        DeadlineExceeded is raised with whatever partial result there is.
+        """
+        context = self.get_request_context(query, context)
+        self.check_timeout(timeout)
+        with deadline_scope(timeout):
+            try:
+                return self.run_generate(query, schema, use_cache, context,
+                                         combined)
+            except DeadlineExceeded as e:
+                context.log_message("warnings", f"{e} (stage: {e.stage})")
+                raise
+
+    def run_generate(self, query, schema, use_cache, context, combined):
+        if schema is None and combined:
+            schema, model = self.start_combined_generation(
+                query, context, use_cache)
+            if model is not None:
+                return self.finish_response(query, model, context, use_cache)
+        if schema is not None:
+            schema = self.use_schema(schema, context)
+        else:
+            schema = self.generate_schema(query,
+                                          use_cache=use_cache,
+                                          context=context)
+
+        cached_response = self.load_cached_response(query, schema, context,
+                                                    use_cache)
+        if cached_response is not None:
+            return cached_response
+
+        model = self.coalesce(self.response_flight_key(query, schema),
+                              self.ResponseGenerator.generate, query, schema,
+                              context)
+        return self.finish_response(query, model, context, use_cache)
+
+    async def agenerate(self,
+                        query,
+                        schema=None,
+                        use_cache=True,
+                        context=None,
+                        combined=False,
+                        timeout=None):
+        context = self.get_request_context(query, context)
+        self.check_timeout(timeout)
+        with deadline_scope(timeout):
+            try:
+                return await self.arun_generate(query, schema, use_cache,
+                                                context, combined)
+            except DeadlineExceeded as e:
+                context.log_message("warnings", f"{e} (stage: {e.stage})")
+                raise
+
+    async def arun_generate(self, query, schema, use_cache, context,
+                            combined):
+        if schema is None and combined:
+            schema, model = await self.astart_combined_generation(
+                query, context, use_cache)
+            if model is not None:
+                return await run_blocking(self.finish_response, query, model,
+                                          context, use_cache)
+        if schema is not None:
+            schema = await run_blocking(self.use_schema, schema, context)
+        else:
+            schema = await self.agenerate_schema(query,
+                                                 use_cache=use_cache,
+                                                 context=context)
+
+        cached_response = await run_blocking(self.load_cached_response, query,
+                                             schema, context, use_cache)
+        if cached_response is not None:
+            return cached_response
+
+        model = await self.acoalesce(self.response_flight_key(query, schema),
+                                     self.ResponseGenerator.agenerate, query,
+                                     schema, context)
+        return await run_blocking(self.finish_response, query, model, context,
+                                  use_cache)
+
+    def generate_stream(self, query, schema=None, use_cache=True, context=None):
+        """
+        Generates a response for query and yields it while the chat model is
+        still writing: each element for array schemas, (key, value) pairs for
+        object schemas and the complete value otherwise. The full response
+        is cached like generate's.
+        """
+        context = self.get_request_context(query, context)
+        if schema is not None:
+            schema = self.use_schema(schema, context)
+        else:
+            schema = self.generate_schema(query,
+                                          use_cache=use_cache,
+                                          context=context)
+
+        cached_response = self.load_cached_response(query, schema, context,
+                                                    use_cache)
+        if cached_response is not None:
+            mode = self.ResponseGenerator.get_stream_mode(schema)
+            yield from self.ResponseGenerator.remaining_stream_parts(
+                cached_response, mode, [])
+            return
+
+        model = yield from self.ResponseGenerator.generate_stream(
+            query, schema, context)
+        self.finish_response(query, model, context, use_cache)
+
+    def prepare_batch_schema(self, schema):
+        """Validates and compiles a schema shared by every prompt of a batch."""
+        if schema is None:
+            return None
+        if isinstance(schema, PrecompiledSchema):
+            return self.use_precompiled(schema)
+        schema = ResponseSchema(schema)
+        if not schema.validate_schema():
+            self.get_context().log_fatal_error(
+                "Invalid schema used as parameter for generate_many")
+        self.ResponseGenerator.get_compiled_model(schema)
+        return schema
+
+    def micro_batcher(self, schema, **options):
+        """
+        Returns a MicroBatcher that packs prompts for schema into shared
+        completions, see micro_batcher.MicroBatcher for the options.
+        """
+        from .micro_batcher import MicroBatcher
+        return MicroBatcher(self, schema, **options)
+
+    def check_timeout(self, timeout):
+        if timeout is not None and (isinstance(timeout, bool)
+                                    or not isinstance(timeout, (int, float))
+                                    or timeout <= 0):
+            self.get_context().log_fatal_error(
+                "timeout must be a positive number of seconds")
+
+    def check_max_concurrency(self, max_concurrency):
+        if not isinstance(max_concurrency, int) or max_concurrency < 1:
+            self.get_context().log_fatal_error(
+                "max_concurrency must be a positive integer")
+
+    def generate_many(self,
+                      prompts,
+                      schema=None,
+                      max_concurrency=4,
+                      use_cache=True,
+                      timeout=None):
+        """
+        Runs generate for every prompt on a pool of max_concurrency threads.
+        Returns one BatchResult per prompt, in input order; a failing prompt
+        records its error instead of aborting the batch. timeout applies to
+        each prompt.
+        """
+        prompts = list(prompts)
+        self.check_max_concurrency(max_concurrency)
+        schema = self.prepare_batch_schema(schema)
+
+        def run(index, prompt):
+            try:
+                value = self.generate(prompt,
+                                      schema,
+                                      use_cache=use_cache,
+                                      timeout=timeout)
+            except Exception as e:
+                return BatchResult(index, prompt, error=e)
+            return BatchResult(index, prompt, value=value)
+
+        if not prompts:
+            return []
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(
+                max_workers=min(max_concurrency, len(prompts))) as executor:
+            return list(executor.map(run, range(len(prompts)), prompts))
+
+    async def agenerate_many(self,
+                             prompts,
+                             schema=None,
+                             max_concurrency=4,
+                             use_cache=True,
+                             timeout=None):
+        """Coroutine version of generate_many bounded by a semaphore."""
+        prompts = list(prompts)
+        self.check_max_concurrency(max_concurrency)
+        schema = await run_blocking(self.prepare_batch_schema, schema)
+        import asyncio
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run(index, prompt):
+            async with semaphore:
+                try:
+                    value = await self.agenerate(prompt,
+                                                 schema,
+                                                 use_cache=use_cache,
+                                                 timeout=timeout)
+                except Exception as e:
+                    return BatchResult(index, prompt, error=e)
+            return BatchResult(index, prompt, value=value)
+
+        return list(await asyncio.gather(
+            *(run(index, prompt) for index, prompt in enumerate(prompts))))
+
+    def prepare_long_input(self, query, document, max_chunk_chars, overlap,
+                           max_concurrency):
+        """ Splits document into the per-chunk prompts of generate_long. """
+        from .map_reduce import CHUNK_TEMPLATE, TextChunker
+        self.check_input_as_string(query)
+        if not isinstance(document, str):
+            self.get_context().log_fatal_error("Document must be a string")
+        self.check_max_concurrency(max_concurrency)
+        try:
+            chunks = TextChunker(max_chunk_chars, overlap).split(document)
+        except ValueError as e:
+            self.get_context().log_fatal_error(str(e))
+        if len(chunks) <= 1:
+            return [f"{query}\n\n{document}"]
+        return [
+            CHUNK_TEMPLATE.format(query=query,
+                                  index=index,
+                                  count=len(chunks),
+                                  chunk=chunk)
+            for index, chunk in enumerate(chunks, 1)
+        ]
+
+    def get_long_input_reducer(self, schema, reducer):
+        from .map_reduce import SchemaReducer
+        try:
+            return SchemaReducer(schema, reducer)
+        except ValueError as e:
+            self.get_context().log_fatal_error(str(e))
+
+    def reduce_chunk_results(self, results, schema, reducer, context):
+        """ Merges the chunk answers, raising the first chunk's error. """
+        for result in results:
+            if not result.ok:
+                context.log_message(
+                    "warnings",
+                    f"Chunk {result.index + 1} of {len(results)} failed: "
+                    f"{result.error}")
+                raise result.error
+        values = [result.value for result in results]
+        if len(values) == 1:
+            return values[0]
+        merged = reducer.reduce(values)
+        if not ResponseSchema(schema).is_valid_instance(
+                reducer.to_instance(merged)):
+            # e.g. concatenated arrays over maxItems, pass a reducer for those
+            context.log_message(
+                "user_errors",
+                f"The merged answer for a long input does not match its schema: {merged}"
+            )
+            context.log_fatal_error(
+                "The merged answer for a long input does not match its schema")
+        return merged
+
+    def generate_long(self,
+                      query,
+                      document,
+                      schema=None,
+                      max_chunk_chars=12000,
+                      overlap=0,
+                      max_concurrency=4,
+                      reducer=None,
+                      use_cache=True,
+                      timeout=None,
+                      context=None):
+        """
+        Answers query about a document too long for one prompt. The document
+        is split on paragraph, sentence or line boundaries into chunks of at
+        most max_chunk_chars, every chunk is answered in parallel against the
+        same schema, and the answers are merged by a SchemaReducer: arrays
+        are concatenated, objects merged, enums, booleans and other scalars
+        voted on. reducer replaces the merge, see SchemaReducer. A merged
+        answer that breaks the schema (more than maxItems, say) raises like
+        any invalid response. timeout applies to each chunk, so the call
+        takes about as long as its slowest chunk.
+
+        With overlap > 0 the text shared by neighbouring chunks is answered
+        twice, so array answers repeat what it mentions unless the schema
+        sets uniqueItems or reducer removes duplicates.
+
+        context receives the schema and the merge logs; every chunk runs in
+        its own RequestContext.
+        """
+        context = self.get_request_context(query, context)
+        prompts = self.prepare_long_input(query, document, max_chunk_chars,
+                                          overlap, max_concurrency)
+        if schema is None:
+            schema = self.generate_schema(query,
+                                          use_cache=use_cache,
+                                          context=context)
+        schema = self.prepare_batch_schema(schema)
+        reducer = self.get_long_input_reducer(schema, reducer)
+        results = self.generate_many(prompts,
+                                     schema,
+                                     max_concurrency=max_concurrency,
+                                     use_cache=use_cache,
+                                     timeout=timeout)
+        return self.reduce_chunk_results(results, schema, reducer, context)
+
+    async def agenerate_long(self,
+                             query,
+                             document,
+                             schema=None,
+                             max_chunk_chars=12000,
+                             overlap=0,
+                             max_concurrency=4,
+                             reducer=None,
+                             use_cache=True,
+                             timeout=None,
+                             context=None):
+        """Coroutine version of generate_long."""
+        context = self.get_request_context(query, context)
+        prompts = self.prepare_long_input(query, document, max_chunk_chars,
+                                          overlap, max_concurrency)
+        if schema is None:
+            schema = await self.agenerate_schema(query,
+                                                 use_cache=use_cache,
+                                                 context=context)
+        schema = await run_blocking(self.prepare_batch_schema, schema)
+        reducer = self.get_long_input_reducer(schema, reducer)
+        results = await self.agenerate_many(prompts,
+                                            schema,
+                                            max_concurrency=max_concurrency,
+                                            use_cache=use_cache,
+                                            timeout=timeout)
+        return self.reduce_chunk_results(results, schema, reducer, context)
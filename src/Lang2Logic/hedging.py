@@ -0,0 +1,183 @@
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+#custom imports
+from .metrics import Metrics
+
+
+class LatencyTracker:
+    """ Keeps the latencies of the last `window` calls. """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._latencies)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = max(0, math.ceil(percent / 100 * len(latencies)) - 1)
+        return latencies[index]
+
+
+class HedgeBudget:
+    """ Allows at most ratio hedges per call, e.g. 0.1 for 10% extra calls. """
+
+    def __init__(self, ratio: float = 0.1):
+        self.ratio = ratio
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedges = 0
+
+    def record_call(self) -> None:
+        with self._lock:
+            self._calls += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.ratio * self._calls:
+                return False
+            self._hedges += 1
+            return True
+
+
+class HedgePolicy:
+    """
+    Hedges slow chat model calls: when a call has not returned after the
+    given percentile of recent latencies, the same call is issued again and
+    the first one to succeed wins. The other one is cancelled; a synchronous
+    call that is already running cannot be interrupted, so its result is
+    discarded when it finishes.
+
+    Hedging starts once min_samples latencies have been seen and is capped
+    by the budget. Counters: calls, hedges (fired) and hedge_wins.
+    """
+
+    def __init__(self,
+                 percentile: float = 95,
+                 budget_ratio: float = 0.1,
+                 min_samples: int = 20,
+                 min_delay: float = 0.0,
+                 window: int = 200,
+                 max_workers: int = 32):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.max_workers = max_workers
+        self.tracker = LatencyTracker(window)
+        self.budget = HedgeBudget(budget_ratio)
+        self.metrics = Metrics("calls", "hedges", "hedge_wins")
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """ Seconds to wait before hedging, or None while still warming up. """
+        if len(self.tracker) < self.min_samples:
+            return None
+        return max(self.min_delay, self.tracker.percentile(self.percentile))
+
+    def get_executor(self) -> Any:
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="lang2logic-hedge")
+        return self._executor
+
+    def timed(self, func: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        result = func()
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    async def atimed(self, func: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        result = await func()
+        self.tracker.record(time.monotonic() - start)
+        return result
+
+    def start_call(self) -> Optional[float]:
+        self.metrics.increment("calls")
+        self.budget.record_call()
+        return self.hedge_delay()
+
+    def call(self, func: Callable[[], Any]) -> Any:
+        from concurrent.futures import TimeoutError as FutureTimeout
+        delay = self.start_call()
+        if delay is None:
+            return self.timed(func)
+        executor = self.get_executor()
+        primary = executor.submit(contextvars.copy_context().run, self.timed,
+                                  func)
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeout:
+            pass
+        if not self.budget.try_spend():
+            return primary.result()
+        self.metrics.increment("hedges")
+        hedge = executor.submit(contextvars.copy_context().run, self.timed,
+                                func)
+        return self.first_success(primary, hedge)
+
+    def first_success(self, primary: Any, hedge: Any) -> Any:
+        from concurrent.futures import FIRST_COMPLETED, wait
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        self.metrics.increment("hedge_wins")
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def acall(self, func: Callable[[], Any]) -> Any:
+        """ Coroutine version of call; the losing task is cancelled. """
+        import asyncio
+        delay = self.start_call()
+        if delay is None:
+            return await self.atimed(func)
+        primary = asyncio.ensure_future(self.atimed(func))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done or not self.budget.try_spend():
+                return await primary
+            self.metrics.increment("hedges")
+            hedge = asyncio.ensure_future(self.atimed(func))
+            pending = {primary, hedge}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.metrics.increment("hedge_wins")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
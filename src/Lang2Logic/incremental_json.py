@@ -0,0 +1,385 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+Path = Tuple[Any, ...]
+
+_WHITESPACE = " \t\r\n"
+_COMBINATORS = ("anyOf", "oneOf", "allOf", "not", "if")
+
+
+class StreamSchemaViolation(ValueError):
+    """ The partial document can no longer satisfy the schema. """
+
+    def __init__(self, path: Path, message: str):
+        super().__init__(f"{message} at {list(path)}")
+        self.path = path
+
+
+class StreamDiverged(ValueError):
+    """
+    The response a stream ended with does not continue the parts it already
+    yielded, e.g. because a retry answered differently. partial holds the
+    parts yielded so far and response the complete new response.
+    """
+
+    def __init__(self, partial: List[Any], response: Any):
+        super().__init__(
+            "The final response does not match the parts already streamed")
+        self.partial = partial
+        self.response = response
+
+
+def _start_types(char: str) -> Optional[set]:
+    """ JSON types a value starting with char can have. """
+    if char == "{":
+        return {"object"}
+    if char == "[":
+        return {"array"}
+    if char == '"':
+        return {"string"}
+    if char in "tf":
+        return {"boolean"}
+    if char == "n":
+        return {"null"}
+    if char == "-" or char.isdigit():
+        return {"number", "integer"}
+    return None
+
+
+def _value_types(value: Any) -> set:
+    if isinstance(value, bool):
+        return {"boolean"}
+    if isinstance(value, int):
+        return {"number", "integer"}
+    if isinstance(value, float):
+        return {"number"}
+    if isinstance(value, str):
+        return {"string"}
+    if isinstance(value, list):
+        return {"array"}
+    if isinstance(value, dict):
+        return {"object"}
+    return {"null"}
+
+
+class PartialSchemaChecker:
+    """
+    Checks a document against a Draft-7 schema while it is still being
+    written and raises StreamSchemaViolation as soon as it is certain the
+    finished document cannot validate: a value of the wrong type starts, a
+    string leaves every enum value behind, an object gets a key its schema
+    forbids, or a complete scalar fails its subschema.
+
+    Subschemas behind anyOf/oneOf/allOf/not/if or non-local $refs are not
+    checked. When the schema is a wrapped root object, a bare value is
+    checked against the root property instead.
+    """
+
+    def __init__(self, schema: Dict[str, Any], validator: Any):
+        self.schema = schema
+        self.validator = validator
+        properties = schema.get("properties") or {}
+        self.wraps_root = list(properties) == ["root"]
+        self.prefix: Path = ()
+
+    def reset(self) -> None:
+        """ Forgets the document start, for a parser that starts over. """
+        self.prefix = ()
+
+    def resolve(self, schema: Any) -> Optional[Dict[str, Any]]:
+        seen = set()
+        while isinstance(schema, dict) and "$ref" in schema:
+            ref = schema["$ref"]
+            if not ref.startswith("#") or ref in seen:
+                return None
+            seen.add(ref)
+            schema = self.schema
+            for part in ref[1:].split("/")[1:]:
+                part = part.replace("~1", "/").replace("~0", "~")
+                if not isinstance(schema, dict) or part not in schema:
+                    return None
+                schema = schema[part]
+        if not isinstance(schema, dict) or any(key in schema
+                                               for key in _COMBINATORS):
+            return None
+        return schema
+
+    def subschema_at(self, path: Path) -> Optional[Dict[str, Any]]:
+        schema = self.resolve(self.schema)
+        for part in self.prefix + path:
+            if schema is None:
+                return None
+            if isinstance(part, str):
+                properties = schema.get("properties") or {}
+                if part in properties:
+                    schema = properties[part]
+                elif schema.get("patternProperties"):
+                    return None
+                else:
+                    additional = schema.get("additionalProperties", {})
+                    schema = additional if isinstance(additional,
+                                                      dict) else None
+            else:
+                items = schema.get("items", {})
+                if isinstance(items, list):
+                    if part < len(items):
+                        schema = items[part]
+                    else:
+                        additional = schema.get("additionalItems", {})
+                        schema = additional if isinstance(additional,
+                                                          dict) else None
+                else:
+                    schema = items
+            schema = self.resolve(schema)
+        return schema
+
+    def start_value(self, path: Path, char: str) -> None:
+        if path == () and self.wraps_root and char != "{":
+            self.prefix = ("root", )
+        schema = self.subschema_at(path)
+        kinds = _start_types(char)
+        if schema is None or kinds is None:
+            return
+        allowed = schema.get("type")
+        if allowed is not None:
+            allowed = {allowed} if isinstance(allowed, str) else set(allowed)
+            if not kinds & allowed:
+                raise StreamSchemaViolation(
+                    path, f"Expected {sorted(allowed)}, got {sorted(kinds)}")
+        options = self.options(schema)
+        if options is not None and not any(kinds & _value_types(option)
+                                           for option in options):
+            raise StreamSchemaViolation(path,
+                                        "Value cannot match any enum value")
+
+    def partial_string(self, path: Path, raw: str) -> None:
+        """ raw is the undecoded string content written so far. """
+        if "\\" in raw:
+            return
+        schema = self.subschema_at(path)
+        options = self.options(schema) if schema is not None else None
+        if options is None:
+            return
+        if not any(
+                isinstance(option, str) and option.startswith(raw)
+                for option in options):
+            raise StreamSchemaViolation(path,
+                                        f"{raw!r} does not start any enum value")
+
+    def check_key(self, path: Path, key: str) -> None:
+        schema = self.subschema_at(path)
+        if schema is None or schema.get("additionalProperties") is not False:
+            return
+        if key in (schema.get("properties") or {}) or schema.get(
+                "patternProperties"):
+            return
+        raise StreamSchemaViolation(path + (key, ),
+                                    f"Property {key!r} is not allowed")
+
+    def check_scalar(self, path: Path, value: Any) -> None:
+        schema = self.subschema_at(path)
+        if schema is None:
+            return
+        error = next(self.validator.descend(value, schema), None)
+        if error is not None:
+            raise StreamSchemaViolation(path, error.message)
+
+    @staticmethod
+    def options(schema: Dict[str, Any]) -> Optional[List[Any]]:
+        if "const" in schema:
+            return [schema["const"]]
+        return schema.get("enum")
+
+
+class _Frame:
+    """ An open object or array and the position of its current member. """
+
+    __slots__ = ("kind", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, start: int):
+        self.kind = kind
+        self.start = start
+        self.key = None
+        self.index = 0
+        self.expect_key = kind == "{"
+
+    @property
+    def position(self) -> Any:
+        return self.key if self.kind == "{" else self.index
+
+
+class IncrementalJSONParser:
+    """
+    Push parser for a JSON document arriving in chunks.
+
+    feed() returns (path, value) for every value that closed within the
+    chunk, where path holds the object keys and array indexes leading to it
+    (the document itself has the path ()). Only values at most max_depth
+    levels deep are decoded. Text before the first '{' or '[' and after the
+    document closes is ignored, so prose and markdown fences around the
+    JSON do not matter.
+
+    Brackets in prose ("[Answer]", "see [1]") look like a document start,
+    so a document that turns out malformed or of the wrong type before
+    reporting any value is dropped and the parser looks for the next '{' or
+    '['. Otherwise malformed input sets failed and stops further events;
+    callers are expected to parse the complete text themselves at the end.
+
+    With a checker (see PartialSchemaChecker), a schema violation inside a
+    document whose bracket began a line (the line after a fence included)
+    is certain: it is stored in violation and also stops further events.
+    One inside a document that began mid-line only counts as malformed.
+    """
+
+    def __init__(self, max_depth: int = 2, checker: Any = None):
+        self.max_depth = max_depth
+        self.checker = checker
+        self.violation: Optional[StreamSchemaViolation] = None
+        self.buffer = ""
+        self.pos = 0
+        self.stack: List[_Frame] = []
+        self.started = False
+        # Where the document started, whether that bracket began a line and
+        # how many values it has reported
+        self.start = None
+        self.anchored = False
+        self.reported = 0
+        self.done = False
+        self.failed = False
+        # Start of the string or scalar currently being read, and whether
+        # the string is an object key
+        self.string_start = None
+        self.string_is_key = False
+        self.escape = False
+        self.scalar_start = None
+
+    @property
+    def path(self) -> Path:
+        """ Path of the value currently being read. """
+        return tuple(frame.position for frame in self.stack)
+
+    def feed(self, chunk: str) -> List[Tuple[Path, Any]]:
+        self.buffer += chunk
+        events: List[Tuple[Path, Any]] = []
+        if self.done or self.failed:
+            return events
+        while True:
+            try:
+                self._scan(events)
+                if (self.checker is not None and self.string_start is not None
+                        and not self.string_is_key):
+                    self.checker.partial_string(
+                        self.path, self.buffer[self.string_start + 1:])
+                return events
+            except ValueError as e:
+                certain = (isinstance(e, StreamSchemaViolation)
+                           and self.anchored and e.path != ())
+                if not certain and not self.reported:
+                    # Likely a bracket in prose, look for the real document
+                    self._restart()
+                    continue
+                if certain:
+                    self.violation = e
+                self.failed = True
+                return events
+
+    def _restart(self) -> None:
+        """ Drops the document read so far and scans on after its start. """
+        self.pos = self.start + 1
+        self.stack = []
+        self.started = False
+        self.done = False
+        self.start = None
+        self.string_start = None
+        self.string_is_key = False
+        self.escape = False
+        self.scalar_start = None
+        if self.checker is not None:
+            self.checker.reset()
+
+    def _scan(self, events: List[Tuple[Path, Any]]) -> None:
+        buffer = self.buffer
+        while self.pos < len(buffer) and not self.done:
+            index = self.pos
+            char = buffer[index]
+            self.pos += 1
+            if not self.started:
+                if char in "{[":
+                    self.started = True
+                    self.start = index
+                    line_start = buffer.rfind("\n", 0, index) + 1
+                    self.anchored = not buffer[line_start:index].strip()
+                    self._open(char, index)
+                continue
+            if self.string_start is not None:
+                self._read_string_char(char, index, events)
+                continue
+            if self.scalar_start is not None:
+                if char not in _WHITESPACE and char not in ",]}":
+                    continue
+                start, self.scalar_start = self.scalar_start, None
+                self._complete(start, index, events, scalar=True)
+            if char in _WHITESPACE:
+                continue
+            frame = self.stack[-1]
+            if char == '"':
+                self.string_start = index
+                self.string_is_key = frame.kind == "{" and frame.expect_key
+                if not self.string_is_key and self.checker is not None:
+                    self.checker.start_value(self.path, char)
+            elif char in "{[":
+                self._open(char, index)
+            elif char in "}]":
+                if (char == "}") != (frame.kind == "{"):
+                    raise ValueError(f"Unexpected {char!r} at {index}")
+                self.stack.pop()
+                self._complete(frame.start, index + 1, events)
+            elif char == ",":
+                if frame.kind == "[":
+                    frame.index += 1
+                else:
+                    frame.expect_key = True
+            elif char == ":":
+                frame.expect_key = False
+            else:
+                if self.checker is not None:
+                    self.checker.start_value(self.path, char)
+                self.scalar_start = index
+
+    def _read_string_char(self, char: str, index: int,
+                          events: List[Tuple[Path, Any]]) -> None:
+        if self.escape:
+            self.escape = False
+        elif char == "\\":
+            self.escape = True
+        elif char == '"':
+            start, self.string_start = self.string_start, None
+            if self.string_is_key:
+                key = json.loads(self.buffer[start:index + 1])
+                self.stack[-1].key = key
+                if self.checker is not None:
+                    self.checker.check_key(self.path[:-1], key)
+            else:
+                self._complete(start, index + 1, events, scalar=True)
+
+    def _open(self, char: str, index: int) -> None:
+        if self.checker is not None:
+            self.checker.start_value(self.path, char)
+        self.stack.append(_Frame(char, index))
+
+    def _complete(self,
+                  start: int,
+                  end: int,
+                  events: List[Tuple[Path, Any]],
+                  scalar: bool = False) -> None:
+        path = self.path
+        if not self.stack:
+            self.done = True
+        check = scalar and self.checker is not None
+        if len(path) <= self.max_depth or check:
+            value = json.loads(self.buffer[start:end])
+            if check:
+                self.checker.check_scalar(path, value)
+            if len(path) <= self.max_depth:
+                events.append((path, value))
+                self.reported += 1
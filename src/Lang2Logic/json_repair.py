@@ -0,0 +1,183 @@
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+#custom imports
+from .response_schema import ResponseSchema
+
+_FENCE = re.compile(r"```[\w-]*[ \t]*\n?(.*?)(?:```|$)", re.DOTALL)
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class JSONRepairer:
+    """
+    Fixes the mechanical mistakes models make when writing JSON without
+    calling a model: markdown fences, prose around the document, trailing
+    commas, single quotes, Python literals, unquoted keys and truncated
+    closing brackets.
+
+    When a schema is given, only documents that validate against it are
+    returned, and a bare value is wrapped as {"root": value} when the schema
+    is a wrapped root object.
+    """
+
+    def __init__(self,
+                 schema: Optional[Dict[str, Any]] = None,
+                 validator: Any = None):
+        self.schema = schema
+        if validator is None and schema is not None:
+            response_schema = ResponseSchema(schema)
+            if response_schema.is_valid_schema:
+                validator = response_schema.validator
+        self.validator = validator
+        properties = (schema or {}).get("properties") or {}
+        self.wraps_root = list(properties) == ["root"]
+
+    def repair(self, text: str) -> Any:
+        """
+        Returns the repaired document. Raises ValueError when no repair
+        produces one that satisfies the schema.
+        """
+        if not isinstance(text, str):
+            raise ValueError(f"Expected model output as a string, got {type(text)}")
+        for candidate in self.candidates(text):
+            for source in (candidate, self.normalize(candidate)):
+                try:
+                    value = json.loads(source)
+                except ValueError:
+                    continue
+                fitted = self.fit(value)
+                if fitted is not None:
+                    return fitted
+        raise ValueError("Could not repair the model output locally")
+
+    def candidates(self, text: str) -> List[str]:
+        """ Substrings of the output that may hold the document. """
+        stripped = text.strip()
+        candidates = [stripped]
+        fence = _FENCE.search(stripped)
+        if fence:
+            candidates.append(fence.group(1).strip())
+        starts = [
+            index for index in (stripped.find("{"), stripped.find("["))
+            if index != -1
+        ]
+        if starts:
+            candidates.append(stripped[min(starts):])
+        return candidates
+
+    def fit(self, value: Any) -> Optional[Any]:
+        """ Returns value, or value wrapped in root, if the schema accepts it. """
+        if self.validator is None:
+            return value
+        if self.validator.is_valid(value):
+            return value
+        if self.wraps_root and not (isinstance(value, dict)
+                                    and "root" in value):
+            wrapped = {"root": value}
+            if self.validator.is_valid(wrapped):
+                return wrapped
+        return None
+
+    def normalize(self, text: str) -> str:
+        """
+        Rewrites text into strict JSON, stopping after the first complete
+        top-level value and closing anything left open by truncation.
+        """
+        out: List[str] = []
+        stack: List[str] = []
+        # Length of out and open brackets at the last point where cutting
+        # the text still leaves a complete prefix
+        safe: Tuple[int, List[str]] = (0, [])
+        quote = None
+        escape = False
+        index = 0
+        while index < len(text):
+            char = text[index]
+            index += 1
+            if quote:
+                if escape:
+                    escape = False
+                    if char == "'":
+                        # \' is not a JSON escape
+                        out[-1] = "'"
+                        continue
+                    out.append(char)
+                elif char == "\\":
+                    escape = True
+                    out.append(char)
+                elif char == quote:
+                    quote = None
+                    out.append('"')
+                elif char == '"':
+                    out.append('\\"')
+                elif char == "\n":
+                    out.append("\\n")
+                else:
+                    out.append(char)
+                continue
+            if char in "\"'":
+                quote = char
+                out.append('"')
+            elif char in "{[":
+                stack.append(char)
+                out.append(char)
+                safe = (len(out), list(stack))
+            elif char in "}]":
+                if not stack:
+                    break
+                self._strip_trailing(out)
+                # Close whatever is actually open, even if the model
+                # mismatched the bracket
+                opener = stack.pop()
+                out.append("}" if opener == "{" else "]")
+                if not stack:
+                    return "".join(out)
+                safe = (len(out), list(stack))
+            elif char == ",":
+                safe = (len(out), list(stack))
+                out.append(char)
+            elif char.isalpha() or char == "_":
+                end = index
+                while end < len(text) and (text[end].isalnum()
+                                           or text[end] == "_"):
+                    end += 1
+                word = text[index - 1:end]
+                index = end
+                rest = text[end:].lstrip()
+                if stack and stack[-1] == "{" and rest.startswith(":"):
+                    out.append(json.dumps(word))
+                else:
+                    out.append(_LITERALS.get(word, word))
+            else:
+                out.append(char)
+
+        if quote:
+            out.append('"')
+        closed = self._close(out, stack)
+        try:
+            json.loads(closed)
+            return closed
+        except ValueError:
+            length, open_brackets = safe
+            return self._close(out[:length], open_brackets)
+
+    @staticmethod
+    def _strip_trailing(out: List[str]) -> None:
+        """ Drops trailing whitespace, commas and dangling colons. """
+        while out and (out[-1].isspace() or out[-1] in ",:"):
+            out.pop()
+
+    def _close(self, out: List[str], stack: List[str]) -> str:
+        out = list(out)
+        self._strip_trailing(out)
+        for bracket in reversed(stack):
+            out.append("}" if bracket == "{" else "]")
+        return "".join(out)
+
+
+def repair_json(text: str,
+                schema: Optional[Dict[str, Any]] = None,
+                validator: Any = None) -> Any:
+    """ Repairs model output into a JSON document, see JSONRepairer. """
+    return JSONRepairer(schema, validator).repair(text)
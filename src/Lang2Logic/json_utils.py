@@ -0,0 +1,37 @@
+import json
+from typing import Any
+
+_decoder = json.JSONDecoder()
+
+
+def extract_json_payload(text: str) -> Any:
+    """
+    Returns the first JSON object or array embedded in a model response,
+    skipping any surrounding prose or markdown fences.
+
+    Raises ValueError when the text contains no complete JSON value.
+    """
+    if not isinstance(text, str):
+        raise ValueError(f"Expected model output as a string, got {type(text)}")
+    stripped = text.strip()
+    try:
+        return json.loads(stripped)
+    except json.JSONDecodeError:
+        pass
+    index = _next_start(stripped, 0)
+    while index != -1:
+        try:
+            value, _ = _decoder.raw_decode(stripped, index)
+            return value
+        except json.JSONDecodeError:
+            index = _next_start(stripped, index + 1)
+    raise ValueError("No JSON payload found in model output")
+
+
+def _next_start(text: str, start: int) -> int:
+    """ Index of the next '{' or '[' at or after start, or -1. """
+    positions = [
+        position for position in (text.find("{", start), text.find("[", start))
+        if position != -1
+    ]
+    return min(positions) if positions else -1
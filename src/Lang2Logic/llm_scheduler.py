@@ -0,0 +1,240 @@
+import time
+from typing import Any, Callable, Iterator, Optional
+
+#custom imports
+from .deadline import DeadlineExceeded, check_wait, get_deadline
+from .metrics import Metrics
+from .rate_limiter import AdaptiveConcurrency, TokenBucket
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def get_status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code",
+                         None)
+    return status
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """ True for rate limit, overload and timeout errors worth backing off on. """
+    if isinstance(error, DeadlineExceeded):
+        # Our own budget ran out, retrying cannot help
+        return False
+    if get_status_code(error) in THROTTLE_STATUS_CODES:
+        return True
+    if isinstance(error, TimeoutError):
+        return True
+    name = type(error).__name__
+    return name == "RateLimitError" or "Timeout" in name
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """ Reads the delay the provider asked for, if any. """
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is None:
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers is not None:
+            retry_after = headers.get("retry-after")
+    try:
+        return float(retry_after) if retry_after is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMScheduler:
+    """
+    Shared gate for chat model calls: requests-per-minute and tokens-per-minute
+    token buckets, an AdaptiveConcurrency limit, and retries with backoff for
+    throttled calls (429/503 and timeouts), which also shrink the limit.
+
+    Wrap a chat model with wrap() so every call made through it, including
+    the ones from LangChain's output fixing parsers, is scheduled.
+    """
+
+    def __init__(self,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 max_retries: int = 3,
+                 base_delay: float = 1.0,
+                 max_delay: float = 30.0,
+                 expected_output_tokens: int = 256):
+        self.request_bucket = (TokenBucket(requests_per_minute)
+                               if requests_per_minute else None)
+        self.token_bucket = (TokenBucket(tokens_per_minute)
+                             if tokens_per_minute else None)
+        self.concurrency = (concurrency if concurrency is not None else
+                            AdaptiveConcurrency())
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.expected_output_tokens = expected_output_tokens
+        self.metrics = Metrics("calls", "throttled", "retries",
+                               "rate_limited")
+
+    def wrap(self, chat_model: Any) -> Any:
+        """ Returns chat_model behind this scheduler. """
+        from .managed_chat_model import ManagedChatModel
+        if isinstance(chat_model, ManagedChatModel):
+            chat_model = chat_model.chat_model
+        return ManagedChatModel(chat_model=chat_model, scheduler=self)
+
+    def reserve(self, tokens: float) -> float:
+        """ Takes one request and tokens from the buckets, returns the wait. """
+        delay = 0.0
+        if self.request_bucket is not None:
+            delay = max(delay, self.request_bucket.reserve(1))
+        if self.token_bucket is not None and tokens:
+            delay = max(delay, self.token_bucket.reserve(tokens))
+        if delay > 0:
+            self.metrics.increment("rate_limited")
+        return delay
+
+    def reserve_within_deadline(self, tokens: float) -> float:
+        """ reserve, giving the reservation back if the wait passes the deadline. """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            try:
+                check_wait(delay, "rate limit")
+            except DeadlineExceeded:
+                self.refund(tokens)
+                raise
+        return delay
+
+    def refund(self, tokens: float) -> None:
+        """ Gives back a reservation that will not be used. """
+        if self.request_bucket is not None:
+            self.request_bucket.refund(1)
+        if self.token_bucket is not None and tokens:
+            self.token_bucket.refund(tokens)
+
+    def slot_timeout(self) -> Optional[float]:
+        deadline = get_deadline()
+        return None if deadline is None else deadline.remaining()
+
+    def slot_timed_out(self, tokens: float) -> DeadlineExceeded:
+        self.refund(tokens)
+        return DeadlineExceeded(
+            "Deadline exceeded waiting for a concurrency slot",
+            "concurrency limit")
+
+    def acquire_within_deadline(self, tokens: float) -> None:
+        """ Waits for a concurrency slot, but no longer than the deadline. """
+        if not self.concurrency.acquire(self.slot_timeout()):
+            raise self.slot_timed_out(tokens)
+
+    async def aacquire_within_deadline(self, tokens: float) -> None:
+        if not await self.concurrency.aacquire(timeout=self.slot_timeout()):
+            raise self.slot_timed_out(tokens)
+
+    def settle_tokens(self, reserved: float, used: Optional[float]) -> None:
+        """ Corrects the token bucket once the real usage is known. """
+        if self.token_bucket is None or used is None:
+            return
+        if used < reserved:
+            self.token_bucket.refund(reserved - used)
+        elif used > reserved:
+            self.token_bucket.reserve(used - reserved)
+
+    def retry_delay(self, error: Exception, attempt: int) -> float:
+        retry_after = get_retry_after(error)
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        return min(self.max_delay, self.base_delay * 2**attempt)
+
+    def backoff_delay(self, error: Exception, attempt: int) -> float:
+        delay = self.retry_delay(error, attempt)
+        try:
+            check_wait(delay, "throttling backoff")
+        except DeadlineExceeded as e:
+            raise e from error
+        return delay
+
+    def should_retry(self, error: Exception, attempt: int) -> bool:
+        if not is_throttle_error(error):
+            return False
+        self.metrics.increment("throttled")
+        self.concurrency.on_throttle()
+        if attempt >= self.max_retries:
+            return False
+        self.metrics.increment("retries")
+        return True
+
+    def finish_call(self) -> None:
+        self.metrics.increment("calls")
+        self.concurrency.on_success()
+
+    def call(self, func: Callable[[], Any], tokens: float = 0) -> Any:
+        attempt = 0
+        while True:
+            delay = self.reserve_within_deadline(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            self.acquire_within_deadline(tokens)
+            try:
+                result = func()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                error = e
+            else:
+                self.finish_call()
+                return result
+            finally:
+                self.concurrency.release()
+            time.sleep(self.backoff_delay(error, attempt))
+            attempt += 1
+
+    async def acall(self, func: Callable[[], Any], tokens: float = 0) -> Any:
+        """ Coroutine version of call; func returns an awaitable. """
+        import asyncio
+        attempt = 0
+        while True:
+            delay = self.reserve_within_deadline(tokens)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.aacquire_within_deadline(tokens)
+            try:
+                result = await func()
+            except Exception as e:
+                if not self.should_retry(e, attempt):
+                    raise
+                error = e
+            else:
+                self.finish_call()
+                return result
+            finally:
+                self.concurrency.release()
+            await asyncio.sleep(self.backoff_delay(error, attempt))
+            attempt += 1
+
+    def stream(self, func: Callable[[], Iterator[Any]],
+               tokens: float = 0) -> Iterator[Any]:
+        """
+        Schedules a streamed call, holding its concurrency slot until the
+        stream ends. Only failures before the first chunk are retried.
+        """
+        attempt = 0
+        while True:
+            delay = self.reserve_within_deadline(tokens)
+            if delay > 0:
+                time.sleep(delay)
+            self.acquire_within_deadline(tokens)
+            started = False
+            try:
+                for chunk in func():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                if started or not self.should_retry(e, attempt):
+                    raise
+                error = e
+            else:
+                self.finish_call()
+                return
+            finally:
+                self.concurrency.release()
+            time.sleep(self.backoff_delay(error, attempt))
+            attempt += 1
@@ -0,0 +1,173 @@
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+#custom imports
+from .deadline import DeadlineExceeded, get_deadline
+
+
+class ManagedChatModel(BaseChatModel):
+    """
+    Chat model that sends every call of the wrapped chat_model through an
+    LLMScheduler and/or a HedgePolicy. It is a regular LangChain chat model,
+    so chains and output parsers built on it are managed too.
+
+    Calls made under a deadline get the time left when they start as their
+    request timeout, and async calls are cancelled once it runs out.
+    """
+
+    chat_model: Any
+    scheduler: Any = None
+    hedging: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"managed-{self.chat_model._llm_type}"
+
+    @property
+    def _identifying_params(self) -> Any:
+        return self.chat_model._identifying_params
+
+    @property
+    def model_name(self) -> str:
+        """ The wrapped model's name, so cache keys do not change. """
+        return getattr(self.chat_model, "model_name", None) or type(
+            self.chat_model).__name__
+
+    def estimate_tokens(self, messages: List[BaseMessage]) -> int:
+        """ Rough token count: four characters per token plus the answer. """
+        characters = sum(
+            len(message.content) for message in messages
+            if isinstance(message.content, str))
+        return characters // 4 + self.scheduler.expected_output_tokens
+
+    @staticmethod
+    def get_used_tokens(result: ChatResult) -> Optional[int]:
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        return usage.get("total_tokens")
+
+    def deadline_kwargs(self, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        """ kwargs with the remaining time budget as the request timeout. """
+        deadline = get_deadline()
+        if deadline is None:
+            return kwargs
+        deadline.check("model call")
+        return dict(kwargs, timeout=deadline.remaining())
+
+    def call_wrapped(self, messages: List[BaseMessage], stop: Any,
+                     run_manager: Any, kwargs: Dict[str, Any]) -> ChatResult:
+        deadline = get_deadline()
+        start = time.monotonic()
+        try:
+            return self.chat_model._generate(messages,
+                                             stop=stop,
+                                             run_manager=run_manager,
+                                             **self.deadline_kwargs(kwargs))
+        finally:
+            if deadline is not None:
+                deadline.record_call(time.monotonic() - start)
+
+    async def acall_wrapped(self, messages: List[BaseMessage], stop: Any,
+                            run_manager: Any,
+                            kwargs: Dict[str, Any]) -> ChatResult:
+        deadline = get_deadline()
+        call = self.chat_model._agenerate(messages,
+                                          stop=stop,
+                                          run_manager=run_manager,
+                                          **self.deadline_kwargs(kwargs))
+        if deadline is None:
+            return await call
+        import asyncio
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(call, deadline.remaining())
+        except DeadlineExceeded:
+            raise
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("Deadline exceeded during model call",
+                                   "model call") from e
+        finally:
+            deadline.record_call(time.monotonic() - start)
+
+    def schedule(self, func: Callable[[], ChatResult],
+                 messages: List[BaseMessage]) -> ChatResult:
+        if self.scheduler is None:
+            return func()
+        tokens = self.estimate_tokens(messages)
+        result = self.scheduler.call(func, tokens)
+        self.scheduler.settle_tokens(tokens, self.get_used_tokens(result))
+        return result
+
+    async def aschedule(self, func: Callable[[], Any],
+                        messages: List[BaseMessage]) -> ChatResult:
+        if self.scheduler is None:
+            return await func()
+        tokens = self.estimate_tokens(messages)
+        result = await self.scheduler.acall(func, tokens)
+        self.scheduler.settle_tokens(tokens, self.get_used_tokens(result))
+        return result
+
+    def _generate(self,
+                  messages: List[BaseMessage],
+                  stop: Optional[List[str]] = None,
+                  run_manager: Any = None,
+                  **kwargs: Any) -> ChatResult:
+
+        def attempt():
+            return self.schedule(
+                lambda: self.call_wrapped(messages, stop, run_manager, kwargs),
+                messages)
+
+        if self.hedging is None:
+            return attempt()
+        return self.hedging.call(attempt)
+
+    async def _agenerate(self,
+                         messages: List[BaseMessage],
+                         stop: Optional[List[str]] = None,
+                         run_manager: Any = None,
+                         **kwargs: Any) -> ChatResult:
+
+        def attempt():
+            return self.aschedule(
+                lambda: self.acall_wrapped(messages, stop, run_manager,
+                                           kwargs),
+                messages)
+
+        if self.hedging is None:
+            return await attempt()
+        return await self.hedging.acall(attempt)
+
+    def _stream(self,
+                messages: List[BaseMessage],
+                stop: Optional[List[str]] = None,
+                run_manager: Any = None,
+                **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        if type(self.chat_model)._stream == BaseChatModel._stream:
+            # The wrapped model cannot stream, hand back its whole answer
+            result = self._generate(messages, stop, run_manager, **kwargs)
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=result.generations[0].message.content))
+            return
+        if self.scheduler is None:
+            yield from self.chat_model._stream(messages,
+                                               stop=stop,
+                                               run_manager=run_manager,
+                                               **kwargs)
+            return
+        yield from self.scheduler.stream(
+            lambda: self.chat_model._stream(
+                messages, stop=stop, run_manager=run_manager, **kwargs),
+            self.estimate_tokens(messages))
+
+
+def with_deadline(chat_model: Any) -> Any:
+    """
+    chat_model behind a ManagedChatModel, so calls that LangChain makes on
+    its own, such as the fixing and retry parsers', respect the deadline.
+    """
+    if isinstance(chat_model, ManagedChatModel) or chat_model is None:
+        return chat_model
+    return ManagedChatModel(chat_model=chat_model)
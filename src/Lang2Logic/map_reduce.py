@@ -0,0 +1,184 @@
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Union
+from pydantic_core import to_jsonable_python
+
+#custom imports
+from .response_schema import ResponseSchema
+
+# Boundaries tried in order when a chunk has to end, the largest units first
+SAFE_BOUNDARIES = ("\n\n", ". ", "! ", "? ", "\n", "; ", ", ", " ")
+
+CHUNK_TEMPLATE = ("{query}\n\nThe input is too long to send at once. This is "
+                  "part {index} of {count}, answer for this part only:\n"
+                  "{chunk}")
+
+Reducer = Callable[[List[Any], Dict[str, Any]], Any]
+
+
+def value_key(value: Any) -> str:
+    """ A comparable key for an answer value, dates and patterns included. """
+    return json.dumps(to_jsonable_python(value), sort_keys=True)
+
+
+class TextChunker:
+    """
+    Splits a long text into chunks of at most max_chars characters. A chunk
+    ends at the last paragraph break before the limit, or failing that a
+    sentence end, a line break, a clause or a space; only text without any
+    of them is cut mid-word. overlap characters from the end of each chunk
+    are repeated at the start of the next.
+    """
+
+    def __init__(self, max_chars: int = 12000, overlap: int = 0):
+        if not isinstance(max_chars, int) or max_chars < 1:
+            raise ValueError("max_chars must be a positive integer")
+        if not isinstance(overlap, int) or not 0 <= overlap < max_chars:
+            raise ValueError("overlap must be between 0 and max_chars")
+        self.max_chars = max_chars
+        self.overlap = overlap
+
+    def find_boundary(self, text: str, start: int) -> int:
+        """ End of the chunk starting at start, just after a safe boundary. """
+        limit = start + self.max_chars
+        if limit >= len(text):
+            return len(text)
+        # Never end in the first half of a chunk, tiny chunks cost a call each
+        floor = start + self.max_chars // 2
+        for boundary in SAFE_BOUNDARIES:
+            position = text.rfind(boundary, floor, limit)
+            if position != -1:
+                return position + len(boundary)
+        return limit
+
+    def split(self, text: str) -> List[str]:
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = self.find_boundary(text, start)
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+            if end >= len(text):
+                break
+            start = max(end - self.overlap, start + 1)
+        return chunks
+
+
+class SchemaReducer:
+    """
+    Merges the answers for the chunks of one input into a single answer,
+    guided by the schema they all follow: arrays are concatenated (without
+    duplicates under uniqueItems), objects are merged property by property,
+    and enums, booleans and other scalars are decided by majority vote, the
+    earliest answer winning ties. Missing (null) answers are skipped.
+
+    reducer overrides the merge: a callable(values, schema) for the whole
+    answer, or a {property: callable} dict for top-level properties.
+    """
+
+    def __init__(self,
+                 schema: Any,
+                 reducer: Union[Reducer, Dict[str, Reducer], None] = None):
+        self.schema = ResponseSchema(schema).to_dict()
+        if reducer is not None and not callable(reducer) and not isinstance(
+                reducer, dict):
+            raise ValueError(
+                "reducer must be a callable or a dict of callables")
+        self.reducer = reducer
+
+    def reduce(self, values: List[Any]) -> Any:
+        if callable(self.reducer):
+            return self.reducer(values, self.schema)
+        overrides = self.reducer or {}
+        return self.merge(values, self.schema, overrides)
+
+    def resolve(self, schema: Any) -> Dict[str, Any]:
+        """ Follows local $defs/definitions references. """
+        seen = set()
+        while isinstance(schema, dict) and isinstance(schema.get("$ref"), str):
+            reference = schema["$ref"]
+            if reference in seen or not reference.startswith("#/"):
+                break
+            seen.add(reference)
+            target: Any = self.schema
+            for part in reference[2:].split("/"):
+                part = part.replace("~1", "/").replace("~0", "~")
+                if not isinstance(target, dict) or part not in target:
+                    return {}
+                target = target[part]
+            schema = target
+        return schema if isinstance(schema, dict) else {}
+
+    def to_instance(self, value: Any, schema: Any = None) -> Any:
+        """
+        value as the JSON the model answered: formats such as dates back to
+        strings and optional properties no answer filled (None) dropped, so
+        it can be validated against the schema.
+        """
+        schema = self.resolve(self.schema if schema is None else schema)
+        if isinstance(value, dict):
+            properties = schema.get("properties", {})
+            additional = schema.get("additionalProperties", {})
+            required = schema.get("required", [])
+            return {
+                key: self.to_instance(item, properties.get(key, additional))
+                for key, item in value.items()
+                if item is not None or key in required
+            }
+        if isinstance(value, list):
+            items = schema.get("items", {})
+            return [self.to_instance(item, items) for item in value]
+        return to_jsonable_python(value)
+
+    def merge(self,
+              values: List[Any],
+              schema: Any,
+              overrides: Optional[Dict[str, Reducer]] = None) -> Any:
+        schema = self.resolve(schema)
+        values = [value for value in values if value is not None]
+        if not values:
+            return None
+        if all(isinstance(value, list) for value in values):
+            return self.merge_arrays(values, schema)
+        if all(isinstance(value, dict) for value in values):
+            return self.merge_objects(values, schema, overrides or {})
+        return self.vote(values)
+
+    def merge_arrays(self, values: List[List[Any]], schema: Dict[str,
+                                                                  Any]) -> Any:
+        merged = [item for value in values for item in value]
+        if not schema.get("uniqueItems"):
+            return merged
+        unique, seen = [], set()
+        for item in merged:
+            key = value_key(item)
+            if key not in seen:
+                seen.add(key)
+                unique.append(item)
+        return unique
+
+    def merge_objects(self, values: List[Dict[str, Any]],
+                      schema: Dict[str, Any],
+                      overrides: Dict[str, Reducer]) -> Dict[str, Any]:
+        properties = schema.get("properties", {})
+        additional = schema.get("additionalProperties", {})
+        keys: List[str] = []
+        for value in values:
+            keys.extend(key for key in value if key not in keys)
+
+        merged = {}
+        for key in keys:
+            subschema = properties.get(key, additional)
+            found = [value[key] for value in values if key in value]
+            if key in overrides:
+                merged[key] = overrides[key](found, self.resolve(subschema))
+            else:
+                merged[key] = self.merge(found, subschema)
+        return merged
+
+    def vote(self, values: List[Any]) -> Any:
+        counts = Counter(value_key(value) for value in values)
+        best = max(counts.values())
+        return next(value for value in values
+                    if counts[value_key(value)] == best)
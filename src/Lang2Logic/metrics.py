@@ -0,0 +1,28 @@
+import threading
+from typing import Dict
+
+
+class Metrics:
+    """Thread-safe named counters used to report cache and fast-path statistics."""
+
+    def __init__(self, *names: str):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {name: 0 for name in names}
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        with self._lock:
+            return self._counts.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """ Returns a copy of the current counter values. """
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self) -> None:
+        with self._lock:
+            for name in self._counts:
+                self._counts[name] = 0
@@ -0,0 +1,243 @@
+import threading
+from typing import Any, List, Optional, Tuple
+
+#custom imports
+from .deadline import invoke_with_deadline
+from .json_repair import repair_json
+from .json_utils import extract_json_payload
+from .metrics import Metrics
+from .schema_compaction import compact_schema_json
+from .request_context import RequestContext
+
+
+class MicroBatcher:
+    """
+    Packs prompts that share a schema into one completion. Prompts submitted
+    within max_wait seconds of each other, up to max_batch_size of them, are
+    sent as numbered tasks and the model answers with one array item per
+    task. Each item is validated against the schema on its own and routed
+    back to its caller; an invalid item falls back to a regular
+    single-prompt generate for its prompt. When the answer count does not
+    match the task count, or the batch fails, every prompt falls back.
+
+    Counters: batches, batched_items (answered from a batch) and fallbacks.
+    """
+
+    def __init__(self,
+                 generator: Any,
+                 schema: Any,
+                 max_batch_size: int = 8,
+                 max_wait: float = 0.05,
+                 max_concurrency: int = 4,
+                 use_cache: bool = True):
+        if schema is None:
+            generator.get_context().log_fatal_error(
+                "MicroBatcher needs a schema shared by every prompt")
+        if not isinstance(max_batch_size, int) or max_batch_size < 1:
+            generator.get_context().log_fatal_error(
+                "max_batch_size must be a positive integer")
+        generator.check_max_concurrency(max_concurrency)
+        self.generator = generator
+        self.schema = generator.prepare_batch_schema(schema)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self.use_cache = use_cache
+        self.metrics = Metrics("batches", "batched_items", "fallbacks")
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[str, Any]] = []
+        self._timer: Optional[threading.Timer] = None
+        self._executor = None
+        self._closed = False
+
+    def get_executor(self) -> Any:
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_concurrency,
+                thread_name_prefix="lang2logic-batch")
+        return self._executor
+
+    def submit(self, prompt: str) -> Any:
+        """ Queues prompt and returns a concurrent.futures.Future for its result. """
+        from concurrent.futures import Future
+        self.generator.check_input_as_string(prompt)
+        future = Future()
+        with self._lock:
+            if self._closed:
+                self.generator.get_context().log_fatal_error(
+                    "MicroBatcher is closed")
+            self._pending.append((prompt, future))
+            if len(self._pending) >= self.max_batch_size:
+                self._dispatch_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.max_wait, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def generate(self, prompt: str) -> Any:
+        return self.submit(prompt).result()
+
+    async def agenerate(self, prompt: str) -> Any:
+        import asyncio
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    def flush(self) -> None:
+        """ Sends the pending prompts now instead of waiting for max_wait. """
+        with self._lock:
+            self._dispatch_locked()
+
+    def _dispatch_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        self.get_executor().submit(self.run_batch, batch)
+
+    def close(self) -> None:
+        """ Sends what is pending and waits for every batch to finish. """
+        with self._lock:
+            self._closed = True
+            self._dispatch_locked()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def construct_input(self, prompts: List[str]) -> str:
+        instructions = self.generator.get_context().get_instruction_by_key(
+            "batch")
+        tasks = "\n\n".join(f"Task {index}:\n{prompt}"
+                            for index, prompt in enumerate(prompts, 1))
+        schema_json = compact_schema_json(self.schema.to_dict())
+        return (f"{instructions}\nJSON Schema:\n{schema_json}\n\n"
+                f"{tasks}\n")
+
+    def parse_output(self, output: str, count: int) -> List[Any]:
+        """
+        Returns the answer array, or an empty list when there is none. An
+        array with more or fewer than count answers is rejected as a whole:
+        answers are matched to tasks by position, so once one is missing or
+        extra there is no telling which prompt the others belong to.
+        """
+        try:
+            payload = extract_json_payload(output)
+        except ValueError:
+            try:
+                payload = repair_json(output)
+            except ValueError:
+                return []
+        if isinstance(payload, dict) and len(payload) == 1:
+            # Models sometimes wrap the array, e.g. {"answers": [...]}
+            payload = next(iter(payload.values()))
+        if not isinstance(payload, list):
+            return []
+        if len(payload) != count:
+            self.generator.get_context().log_message(
+                "warnings",
+                f"Batch returned {len(payload)} answers for {count} tasks")
+            return []
+        return payload
+
+    def build_response(self, prompt: str, answer: Any) -> Any:
+        """
+        Builds the result generate would return for answer, or raises
+        ValueError when answer does not match the schema.
+        """
+        if not self.schema.is_valid_instance(answer):
+            raise ValueError("Batch answer does not match the schema")
+        generator = self.generator
+        context = RequestContext(prompt)
+        generator.use_schema(self.schema, context)
+        plan = generator.ResponseGenerator.get_lean_plan(self.schema)
+        if plan is not None:
+            response = plan.normalize(answer)
+        else:
+            model = generator.ResponseGenerator.load_schema_to_pydantic(
+                self.schema, context)
+            if self.schema.to_dict().get("type") != "object":
+                # Match the {"root": ...} wrapper of the compiled model
+                answer = {"root": answer}
+            parsed_output = model.model_validate(answer)
+            response = generator.ResponseGenerator.handle_output(
+                parsed_output, context)
+        return generator.finish_response(prompt, response, context,
+                                         self.use_cache)
+
+    def run_batch(self, batch: List[Tuple[str, Any]]) -> None:
+        remaining = []
+        for prompt, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            cached = self.load_cached_response(prompt)
+            if cached is not None:
+                future.set_result(cached)
+            else:
+                remaining.append((prompt, future))
+        if len(remaining) == 1:
+            self.resolve(*remaining[0])
+            return
+        if not remaining:
+            return
+
+        prompts = [prompt for prompt, _ in remaining]
+        try:
+            output = invoke_with_deadline(self.generator.chat_model,
+                                          self.construct_input(prompts),
+                                          "batch generation",
+                                          max_tokens=3000).content
+            answers = self.parse_output(output, len(prompts))
+        except Exception as e:
+            self.generator.get_context().log_message(
+                "warnings", f"Batch generation failed: {e}")
+            answers = []
+        self.metrics.increment("batches")
+
+        failed = []
+        for index, (prompt, future) in enumerate(remaining):
+            if index >= len(answers):
+                failed.append((prompt, future))
+                continue
+            try:
+                future.set_result(self.build_response(prompt, answers[index]))
+            except Exception:
+                failed.append((prompt, future))
+            else:
+                self.metrics.increment("batched_items")
+        self.fall_back(failed)
+
+    def load_cached_response(self, prompt: str) -> Any:
+        context = RequestContext(prompt)
+        return self.generator.load_cached_response(prompt, self.schema,
+                                                   context, self.use_cache)
+
+    def fall_back(self, items: List[Tuple[str, Any]]) -> None:
+        """ Answers each prompt with its own generate call, concurrently. """
+        if not items:
+            return
+        self.metrics.increment("fallbacks", len(items))
+        if len(items) == 1:
+            self.resolve(*items[0])
+            return
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency,
+                                                len(items))) as executor:
+            for prompt, future in items:
+                executor.submit(self.resolve, prompt, future)
+
+    def resolve(self, prompt: str, future: Any) -> None:
+        try:
+            value = self.generator.generate(prompt,
+                                            self.schema,
+                                            use_cache=self.use_cache)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(value)
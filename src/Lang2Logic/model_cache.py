@@ -0,0 +1,201 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+#custom imports
+from .metrics import Metrics
+from .canonicalize import normal_fingerprint
+
+
+class CompiledResponseModel:
+    """
+    Everything ResponseGenerator needs to answer against one wrapped schema:
+    the compiled Pydantic model, its LangChain parsers, the format
+    instructions embedded in the prompt and the shared Draft-7 validator used
+    by the fast parse path (None when the wrapped schema cannot be compiled
+    to one). compaction is the CompactionReport of the schema embedded in
+    the format instructions, None when they came with a precompiled schema
+    or from the disk tier. models holds every model the compiler built by
+    name, for writing the disk tier; None when the model was not compiled.
+    """
+
+    def __init__(self,
+                 fingerprint: str,
+                 wrapped_schema: Dict[str, Any],
+                 model: Any,
+                 parser: Any,
+                 fixer: Any,
+                 retry_parser: Any,
+                 format_instructions: str,
+                 validator: Any = None,
+                 compaction: Any = None,
+                 models: Optional[Dict[str, Any]] = None):
+        self.fingerprint = fingerprint
+        self.wrapped_schema = wrapped_schema
+        self.model = model
+        self.parser = parser
+        self.fixer = fixer
+        self.retry_parser = retry_parser
+        self.format_instructions = format_instructions
+        self.validator = validator
+        self.compaction = compaction
+        self.models = models
+
+
+# Bumped whenever the stored model source would change meaning
+DISK_FORMAT = 1
+
+StoredModel = Tuple[Any, str]
+
+
+class ResponseModelCache:
+    """
+    Bounded LRU cache of CompiledResponseModel entries keyed by the normal
+    form hash of the wrapped schema. Different schemas compile in parallel,
+    each schema only once.
+
+    When cache_dir is set, the generated source of every compiled model and
+    its format instructions are also written there, so a restarted worker
+    imports its models instead of compiling them again. The stored source
+    is executed on load: only use a directory no one else can write to.
+    """
+
+    def __init__(self, max_size: int = 128, cache_dir: Optional[str] = None):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self._entries: "OrderedDict[str, CompiledResponseModel]" = OrderedDict()
+        self._lock = threading.RLock()
+        # One lock per fingerprint being built, so a schema compiles once
+        self._building: Dict[str, threading.Lock] = {}
+        self.metrics = Metrics("hits", "misses", "disk_hits", "evictions")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, fingerprint: str) -> bool:
+        with self._lock:
+            return fingerprint in self._entries
+
+    def get(self, fingerprint: str) -> Optional[CompiledResponseModel]:
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                self._entries.move_to_end(fingerprint)
+            return entry
+
+    def put(self, entry: CompiledResponseModel) -> None:
+        with self._lock:
+            self._entries[entry.fingerprint] = entry
+            self._entries.move_to_end(entry.fingerprint)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.metrics.increment("evictions")
+
+    def get_or_create(
+        self, wrapped_schema: Dict[str, Any],
+        build: Callable[[str, Dict[str, Any], Optional[StoredModel]],
+                        CompiledResponseModel]
+    ) -> CompiledResponseModel:
+        """
+        Returns the cached entry for wrapped_schema, building it with
+        build(fingerprint, wrapped_schema, stored) on a miss. stored is the
+        (model, format_instructions) pair loaded from the disk tier, or None
+        when the model has to be compiled.
+        """
+        fingerprint = normal_fingerprint(wrapped_schema)
+        entry = self.get(fingerprint)
+        if entry is not None:
+            self.metrics.increment("hits")
+            return entry
+        with self._lock:
+            building = self._building.setdefault(fingerprint,
+                                                 threading.Lock())
+        try:
+            with building:
+                # Another thread may have built it while this one waited
+                entry = self.get(fingerprint)
+                if entry is not None:
+                    self.metrics.increment("hits")
+                    return entry
+                self.metrics.increment("misses")
+                stored = self._load_from_disk(fingerprint)
+                if stored is not None:
+                    self.metrics.increment("disk_hits")
+                entry = build(fingerprint, wrapped_schema, stored)
+                self.put(entry)
+                if stored is None:
+                    self._save_to_disk(entry)
+                return entry
+        finally:
+            with self._lock:
+                if self._building.get(fingerprint) is building:
+                    del self._building[fingerprint]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """ Returns hit/miss counters along with the current size. """
+        stats = self.metrics.snapshot()
+        stats["size"] = len(self)
+        return stats
+
+    def _disk_path(self, fingerprint: str) -> str:
+        return os.path.join(self.cache_dir, f"{fingerprint}.json")
+
+    def _load_from_disk(self, fingerprint: str) -> Optional[StoredModel]:
+        """ The stored model and format instructions, None on any mismatch. """
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(fingerprint), "r",
+                      encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(stored, dict) or stored.get(
+                "format") != DISK_FORMAT or normal_fingerprint(
+                    stored.get("wrapped_schema")) != fingerprint:
+            return None
+        # schema_codegen pulls in pydantic model rendering, only load it here
+        from .schema_codegen import load_models
+        try:
+            model = load_models(stored["model_source"], stored["model_name"],
+                                f"lang2logic_cached_{fingerprint[:16]}")
+        except (KeyError, TypeError, ValueError):
+            return None
+        return model, stored["format_instructions"]
+
+    def _save_to_disk(self, entry: CompiledResponseModel) -> None:
+        if not self.cache_dir or not entry.models:
+            return
+        from .schema_codegen import render_models
+        try:
+            stored = {
+                "format": DISK_FORMAT,
+                "wrapped_schema": entry.wrapped_schema,
+                "model_name": entry.model.__name__,
+                "model_source": render_models(entry.models),
+                "format_instructions": entry.format_instructions
+            }
+            # Write then rename so concurrent workers never read a partial file
+            with tempfile.NamedTemporaryFile("w",
+                                             dir=self.cache_dir,
+                                             suffix=".tmp",
+                                             delete=False,
+                                             encoding="utf-8") as f:
+                json.dump(stored, f)
+            os.replace(f.name, self._disk_path(entry.fingerprint))
+        except (OSError, ValueError, TypeError):
+            # The disk tier is best effort, e.g. models with format types
+            # cannot be rendered; the in-memory entry is still valid
+            pass
@@ -42,7 +42,8 @@ class SchemaModelUnwrapper:
         """
         Resolves '$ref' references in the schema.
         """
-        parts = reference.lstrip('#/').split('/')
+        # "#" alone is the whole schema, as in recursive schemas
+        parts = [part for part in reference.lstrip('#/').split('/') if part]
         ref_schema = self.schema
         for part in parts:
             ref_schema = ref_schema.get(part, {})
@@ -88,6 +89,9 @@ class SchemaModelUnwrapper:
             return self._convert_type(model, schema)
 
     def _convert_type(self, value: Any, schema: Dict[str, Any]) -> Any:
+        if value is None:
+            # A missing optional value stays missing whatever its type
+            return None
         schema_type = schema.get('type', 'string')
         schema_format = schema.get('format', '')
 
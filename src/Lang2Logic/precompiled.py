@@ -0,0 +1,60 @@
+from typing import Any, Dict, Optional
+
+#custom imports
+from .response_schema import ResponseSchema, schema_registry
+from .schema_shapes import COMPLEX, LeanResponsePlan
+
+
+class PrecompiledSchema:
+    """
+    Handle to a schema compiled ahead of time by `lang2logic compile`. It
+    carries the generated Pydantic model, the wrapped schema, its Draft-7
+    validator and the format instructions, so generate can use it without
+    compiling, wrapping or checking the schema at runtime.
+
+    Generated modules create one per schema as their `schema` attribute.
+    """
+
+    def __init__(self,
+                 name: str,
+                 schema: Dict[str, Any],
+                 wrapped_schema: Dict[str, Any],
+                 model: Any,
+                 format_instructions: str,
+                 validator: Any = None,
+                 shape: str = COMPLEX,
+                 fingerprint: Optional[str] = None,
+                 wrapped_fingerprint: Optional[str] = None):
+        self.name = name
+        self.wrapped_schema = wrapped_schema
+        self.model = model
+        self.format_instructions = format_instructions
+        self.validator = validator
+        self.shape = shape
+        # Both schemas were checked when they were compiled
+        for checked in (fingerprint, wrapped_fingerprint):
+            if checked is not None:
+                schema_registry.mark_valid(checked)
+        self.response_schema = ResponseSchema(schema)
+        self.wrapped_fingerprint = wrapped_fingerprint
+        self._lean_plan = None
+
+    def __repr__(self) -> str:
+        return f"PrecompiledSchema({self.name!r})"
+
+    @property
+    def fingerprint(self) -> str:
+        return self.response_schema.fingerprint
+
+    @property
+    def lean_plan(self) -> Optional[LeanResponsePlan]:
+        """ The lean path plan for simple shapes, None for complex schemas. """
+        if self.shape == COMPLEX:
+            return None
+        if self._lean_plan is None:
+            self._lean_plan = LeanResponsePlan(self.response_schema,
+                                               self.shape)
+        return self._lean_plan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.response_schema.to_dict()
@@ -0,0 +1,145 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenBucket:
+    """
+    Refills at rate_per_minute up to capacity (a full minute's worth by
+    default). reserve takes tokens immediately, letting the balance go
+    negative, and returns how long the caller has to wait before using them,
+    so the same bucket serves threads and coroutines.
+    """
+
+    def __init__(self,
+                 rate_per_minute: float,
+                 capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(
+            capacity if capacity is not None else rate_per_minute)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity,
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float = 1) -> float:
+        """ Takes amount tokens and returns the seconds to wait for them. """
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def refund(self, amount: float) -> None:
+        """ Returns tokens that were reserved but not used. """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class AdaptiveConcurrency:
+    """
+    Limits the number of calls in flight with AIMD: every success raises the
+    limit by 1/limit (about one per window of calls) and a throttled call
+    multiplies it by backoff_factor. Decreases closer together than cooldown
+    seconds count once, so a burst of 429s from one overload halves the limit
+    a single time.
+    """
+
+    def __init__(self,
+                 initial: int = 4,
+                 min_limit: int = 1,
+                 max_limit: int = 64,
+                 backoff_factor: float = 0.5,
+                 cooldown: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        if not 1 <= min_limit <= initial <= max_limit:
+            raise ValueError(
+                "Expected 1 <= min_limit <= initial <= max_limit")
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_factor = backoff_factor
+        self.cooldown = cooldown
+        self.clock = clock
+        self._condition = threading.Condition()
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._last_decrease = None
+
+    @property
+    def limit(self) -> int:
+        with self._condition:
+            return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        with self._condition:
+            return self._in_flight
+
+    def _has_room(self) -> bool:
+        return self._in_flight < int(self._limit)
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if not self._has_room():
+                return False
+            self._in_flight += 1
+            return True
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """ Waits up to timeout seconds for a slot, False if none freed up. """
+        with self._condition:
+            if not self._condition.wait_for(self._has_room, timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    async def aacquire(self,
+                       poll_interval: float = 0.01,
+                       timeout: Optional[float] = None) -> bool:
+        import asyncio
+
+        async def wait_for_room():
+            while not self.try_acquire():
+                await asyncio.sleep(poll_interval)
+
+        try:
+            await asyncio.wait_for(wait_for_room(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            self._condition.notify_all()
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            now = self.clock()
+            if (self._last_decrease is not None
+                    and now - self._last_decrease < self.cooldown):
+                return
+            self._limit = max(self.min_limit,
+                              self._limit * self.backoff_factor)
+            self._last_decrease = now
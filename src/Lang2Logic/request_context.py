@@ -0,0 +1,24 @@
+#custom imports
+from .data_manager import DataManagement
+
+
+class RequestContext(DataManagement):
+    """
+    Per-call state for one generate request: the prompt, the schema, the
+    response, tries and logs.
+
+    It exposes the same methods as DataManagement, but every instance is
+    independent, so concurrent requests served by one Generator cannot
+    overwrite each other's state.
+    """
+
+    def __new__(cls, *args, **kwargs):
+        # Bypass the DataManagement singleton
+        return object.__new__(cls)
+
+    def __init__(self, prompt=None):
+        self.initialize()
+        # Compiled response model and parsers used by this request
+        self.compiled_model = None
+        if prompt is not None:
+            self.set_prompt(prompt)
@@ -0,0 +1,62 @@
+import copy
+import hashlib
+from typing import Any, Dict, Optional
+
+#custom imports
+from .cache_backends import CacheBackend, MemoryCacheBackend
+from .metrics import Metrics
+from .canonicalize import normal_fingerprint
+
+
+class ResponseCache:
+    """
+    Opt-in cache of unwrapped generate() results keyed by the exact prompt,
+    the normal form hash of the schema and the chat model name.
+    """
+
+    def __init__(self,
+                 backend: Optional[CacheBackend] = None,
+                 ttl: Optional[float] = None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.metrics = Metrics("hits", "misses", "bypasses")
+
+    def make_key(self, prompt: str, schema: Dict[str, Any],
+                 model_name: str) -> str:
+        return hashlib.sha256(
+            f"response:{model_name}:{normal_fingerprint(schema)}:{prompt}".
+            encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, schema: Dict[str, Any],
+            model_name: str) -> Optional[Any]:
+        """ Returns a copy of the cached result, or None on a miss. """
+        result = self.backend.get(self.make_key(prompt, schema, model_name))
+        if result is None:
+            self.metrics.increment("misses")
+            return None
+        self.metrics.increment("hits")
+        return copy.deepcopy(result)
+
+    def set(self,
+            prompt: str,
+            schema: Dict[str, Any],
+            model_name: str,
+            result: Any,
+            ttl: Optional[float] = None) -> None:
+        if result is None:
+            return
+        self.backend.set(self.make_key(prompt, schema, model_name),
+                         copy.deepcopy(result),
+                         ttl=self.ttl if ttl is None else ttl)
+
+    def invalidate(self, prompt: str, schema: Dict[str, Any],
+                   model_name: str) -> bool:
+        return self.backend.delete(self.make_key(prompt, schema, model_name))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.metrics.snapshot()
+        stats["size"] = len(self.backend)
+        return stats
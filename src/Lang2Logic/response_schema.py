@@ -1,51 +1,198 @@
+import copy
 import json
-from jsonschema import validate, Draft7Validator, ValidationError
-from typing import Dict, Any, Union
-from jsonschema.exceptions import SchemaError
-from jsonschema.exceptions import ValidationError
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Union
+
+#custom imports
+from .canonicalize import canonical_json, normal_fingerprint
+
+
+def schema_fingerprint(schema: Any) -> str:
+    """
+    Returns a stable SHA-256 digest of the schema's canonical JSON form,
+    exact up to key order. normal_fingerprint also ignores annotations.
+    """
+    return hashlib.sha256(canonical_json(schema).encode("utf-8")).hexdigest()
+
+
+class SchemaRegistry:
+    """
+    Process-wide memo of Draft-7 validity checks and compiled validators,
+    keyed by schema fingerprint and bounded to the most recent max_size
+    schemas.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, fingerprint: str) -> Dict[str, Any]:
+        entry = self._entries.get(fingerprint)
+        if entry is None:
+            entry = {}
+            self._entries[fingerprint] = entry
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(fingerprint)
+        return entry
+
+    def is_valid(self, fingerprint: str, schema: Any) -> bool:
+        with self._lock:
+            entry = self._entry(fingerprint)
+            if "valid" not in entry:
+                # jsonschema is imported on first use to keep imports fast
+                from jsonschema import Draft7Validator
+                try:
+                    Draft7Validator.check_schema(schema)
+                    entry["valid"] = True
+                except Exception:
+                    entry["valid"] = False
+            return entry["valid"]
+
+    def mark_valid(self, fingerprint: str) -> None:
+        """ Records a validity check done elsewhere, e.g. at compile time. """
+        with self._lock:
+            self._entry(fingerprint)["valid"] = True
+
+    def get_validator(self, fingerprint: str, schema: Any) -> Any:
+        if not self.is_valid(fingerprint, schema):
+            raise ValueError("Cannot build a validator for an invalid schema.")
+        with self._lock:
+            entry = self._entry(fingerprint)
+            if "validator" not in entry:
+                from jsonschema import Draft7Validator
+                entry["validator"] = Draft7Validator(copy.deepcopy(schema))
+            return entry["validator"]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+schema_registry = SchemaRegistry()
 
 
 class ResponseSchema:
+    """
+    Immutable, hashable Draft-7 schema value.
+
+    Equality and hashing use the fingerprint of the normal form (see
+    canonicalize.normalize_schema), so schemas that only differ in spelling
+    share caches and compiled models. Validity checks and compiled
+    validators are shared process-wide through schema_registry, keyed by the
+    exact schema, so re-wrapping the same schema is cheap.
+    """
+
+    def __new__(cls, input_data: Union[str, Dict[str, Any], 'ResponseSchema']):
+        # Instances are immutable, so wrapping one again returns it unchanged
+        if isinstance(input_data, ResponseSchema):
+            return input_data
+        return super().__new__(cls)
+
     def __init__(self, input_data: Union[str, Dict[str, Any], 'ResponseSchema']):
+        if getattr(self, "_frozen", False):
+            return
         if isinstance(input_data, str):
             try:
-                self.schema = json.loads(input_data)
+                schema = json.loads(input_data)
             except json.JSONDecodeError:
                 raise ValueError("Invalid JSON string.")
         elif isinstance(input_data, dict):
-            self.schema = input_data
-        elif isinstance(input_data, ResponseSchema):
-            self.schema = input_data.schema
+            schema = input_data
         else:
             raise TypeError("Input must be a JSON string, a dictionary, or a ResponseSchema instance.")
 
-        # Validate the schema as a Draft 7 JSON Schema
         try:
-            self.is_valid_schema=self.validate_schema()
-        except ValidationError as e:
-            self.is_valid_schema = False
+            canonical = canonical_json(schema)
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Schema must be JSON serializable: {e}")
+        # Keep a private copy so later changes to input_data cannot leak in.
+        # The copy keeps the declared key order, property order decides the
+        # field order of the model and of the prompt; only the fingerprint
+        # ignores it.
+        object.__setattr__(self, "_schema", json.loads(json.dumps(schema)))
+        object.__setattr__(
+            self, "_exact_fingerprint",
+            hashlib.sha256(canonical.encode("utf-8")).hexdigest())
+
+        # Validate the schema as a Draft 7 JSON Schema
+        object.__setattr__(self, "is_valid_schema", self.validate_schema())
+        # Only valid schemas are normalized, the normal form of an invalid
+        # schema could be valid
+        object.__setattr__(
+            self, "_fingerprint",
+            normal_fingerprint(self._schema)
+            if self.is_valid_schema else self._exact_fingerprint)
+        object.__setattr__(self, "_frozen", True)
+
+    @classmethod
+    def infer_from_examples(cls, *docs: Any, **options: Any) -> 'ResponseSchema':
+        """
+        Infers the schema from example documents (parsed JSON values)
+        locally, see SchemaInferrer for the rules and options.
+        """
+        from .schema_inference import infer_schema
+        schema = cls(infer_schema(*docs, **options))
+        if not schema.is_valid_schema:
+            raise ValueError("Inferred schema is not a valid Draft-7 schema")
+        return schema
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ResponseSchema instances are immutable.")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ResponseSchema instances are immutable.")
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ResponseSchema):
+            return NotImplemented
+        return self._fingerprint == other._fingerprint
+
+    def __hash__(self) -> int:
+        return hash(self._fingerprint)
+
+    def __reduce__(self):
+        # __new__ needs the schema, so rebuild from it when pickling or copying
+        return (ResponseSchema, (self._schema, ))
+
+    def __repr__(self) -> str:
+        return f"ResponseSchema({canonical_json(self._schema)})"
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return self.to_dict()
+
+    @property
+    def fingerprint(self) -> str:
+        """ SHA-256 digest of the schema's normal form. """
+        return self._fingerprint
+
+    @property
+    def validator(self) -> Any:
+        """ Compiled Draft7Validator shared by every equal schema. """
+        return schema_registry.get_validator(self._exact_fingerprint,
+                                             self._schema)
+
     def validate_schema(self) -> bool:
         """ Validates if the provided schema is a valid Draft 7 JSON Schema. """
-        try:
-            Draft7Validator.check_schema(self.schema)
-            return True
-        except ValidationError as e:
-            return False
-        except SchemaError as e:
-            return False
-        except Exception as e:
-            return False
-        
+        return schema_registry.is_valid(self._exact_fingerprint, self._schema)
+
+    def is_valid_instance(self, instance: Any) -> bool:
+        """ Checks a document against the schema with the shared validator. """
+        return self.validator.is_valid(instance)
 
     def to_dict(self) -> Dict[str, Any]:
-        """ Returns the schema as a dictionary. """
-        return self.schema
+        """ Returns a copy of the schema as a dictionary. """
+        return copy.deepcopy(self._schema)
 
-    
     def to_json(self) -> str:
         """ Converts the schema to a JSON string. """
         try:
-            return json.dumps(self.schema, indent=4)
+            return json.dumps(self._schema, indent=4)
         except Exception as e:
             raise ValueError(f"Failed to convert schema to JSON string: {e}")
     
@@ -65,7 +212,7 @@ class ResponseSchema:
                 pass
 
             # Update the existing data with the new schema under the specified key
-            existing_data[key] = self.schema
+            existing_data[key] = self.to_dict()
 
             # Saving the updated data back to the file
             with open(filepath, "w", encoding='utf-8') as f:
@@ -0,0 +1,66 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+#custom imports
+from .cache_backends import CacheBackend, MemoryCacheBackend
+from .metrics import Metrics
+
+
+class SchemaCache:
+    """
+    Memoizes generated Draft-7 schemas by normalized prompt text and the
+    version of the schema generation instructions, so repeated prompts skip
+    the schema generation round trip.
+    """
+
+    def __init__(self,
+                 backend: Optional[CacheBackend] = None,
+                 ttl: Optional[float] = None):
+        self.backend = backend if backend is not None else MemoryCacheBackend()
+        self.ttl = ttl
+        self.metrics = Metrics("hits", "misses")
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """ Collapses runs of whitespace so formatting changes share an entry. """
+        return " ".join(prompt.split())
+
+    def make_key(self, prompt: str, instructions: str) -> str:
+        instructions_version = hashlib.sha256(
+            instructions.encode("utf-8")).hexdigest()
+        normalized = self.normalize_prompt(prompt)
+        return hashlib.sha256(
+            f"schema:{instructions_version}:{normalized}".encode(
+                "utf-8")).hexdigest()
+
+    def get(self, prompt: str, instructions: str) -> Optional[Dict[str, Any]]:
+        schema = self.backend.get(self.make_key(prompt, instructions))
+        self.metrics.increment("hits" if schema is not None else "misses")
+        return schema
+
+    def set(self,
+            prompt: str,
+            instructions: str,
+            schema: Dict[str, Any],
+            ttl: Optional[float] = None) -> None:
+        self.backend.set(self.make_key(prompt, instructions),
+                         schema,
+                         ttl=self.ttl if ttl is None else ttl)
+
+    def pin(self, prompt: str, instructions: str, schema: Dict[str,
+                                                                Any]) -> None:
+        """ Stores a schema that never expires and is never evicted. """
+        self.backend.set(self.make_key(prompt, instructions),
+                         schema,
+                         pinned=True)
+
+    def invalidate(self, prompt: str, instructions: str) -> bool:
+        return self.backend.delete(self.make_key(prompt, instructions))
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, int]:
+        stats = self.metrics.snapshot()
+        stats["size"] = len(self.backend)
+        return stats
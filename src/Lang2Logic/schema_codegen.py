@@ -0,0 +1,163 @@
+import pprint
+import types
+import typing
+from typing import Any, Dict, List, Set, Type
+
+from pydantic import BaseModel
+from typing_extensions import Annotated
+
+# annotated_types constraints mapped back onto pydantic Field arguments
+CONSTRAINT_ARGUMENTS = {
+    "MinLen": "min_length",
+    "MaxLen": "max_length",
+    "Ge": "ge",
+    "Le": "le",
+    "Gt": "gt",
+    "Lt": "lt",
+    "MultipleOf": "multiple_of",
+}
+CONFIG_KEYS = ("populate_by_name", "protected_namespaces", "extra")
+BUILTIN_NAMES = {str: "str", int: "int", float: "float", bool: "bool"}
+
+# The names rendered model source expects, see load_models
+MODELS_PRELUDE = '''from typing import Any, Dict, List, Literal, Optional, Union  # noqa: F401
+
+from pydantic import BaseModel, ConfigDict, Field  # noqa: F401
+from typing_extensions import Annotated  # noqa: F401
+'''
+
+
+class ModelSourceWriter:
+    """
+    Renders the models built by SchemaModelCompiler as Python source, so
+    they can be imported instead of compiled. Models are written in the
+    order the compiler created them; references to a model that is not
+    defined yet (recursive $refs) are quoted and resolved by model_rebuild
+    at the end of the module.
+    """
+
+    def __init__(self, models: Dict[str, Type[BaseModel]]):
+        self.models = models
+        self._defined: Set[str] = set()
+        self.has_forward_refs = False
+
+    def render(self) -> str:
+        classes = [self.render_model(name, model)
+                   for name, model in self.models.items()]
+        source = "\n\n".join(classes)
+        if self.has_forward_refs:
+            names = ", ".join(self.models)
+            if len(self.models) == 1:
+                names += ","
+            source += (f"\n\nfor _model in ({names}):\n"
+                       "    _model.model_rebuild()\n")
+        return source
+
+    def render_model(self, name: str, model: Type[BaseModel]) -> str:
+        lines = [f"class {name}(BaseModel):"]
+        if model.__doc__:
+            lines.append(f"    {model.__doc__!r}")
+        config = ", ".join(f"{key}={model.model_config[key]!r}"
+                           for key in CONFIG_KEYS
+                           if key in model.model_config)
+        lines.append(f"    model_config = ConfigDict({config})")
+        if model.model_fields:
+            lines.append("")
+        for field_name, field in model.model_fields.items():
+            annotation = self.render_annotation(field.annotation)
+            lines.append(f"    {field_name}: {annotation} = "
+                         f"{self.render_field(field)}")
+        # Only defined once the class body has run
+        self._defined.add(name)
+        return "\n".join(lines) + "\n"
+
+    def render_field(self, field: Any) -> str:
+        arguments = ["..." if field.is_required() else repr(field.default)]
+        if field.alias is not None:
+            arguments.append(f"alias={field.alias!r}")
+        if field.description is not None:
+            arguments.append(f"description={field.description!r}")
+        arguments.extend(self.render_constraints(field.metadata))
+        return f"Field({', '.join(arguments)})"
+
+    def render_constraints(self, metadata: List[Any]) -> List[str]:
+        arguments = []
+        for constraint in metadata:
+            argument = CONSTRAINT_ARGUMENTS.get(type(constraint).__name__)
+            if argument is None:
+                raise ValueError(f"Cannot render constraint {constraint!r}")
+            arguments.append(f"{argument}={getattr(constraint, argument)!r}")
+        return arguments
+
+    def render_annotation(self, annotation: Any) -> str:
+        if annotation is Any:
+            return "Any"
+        if annotation is type(None) or annotation is None:
+            return "None"
+        if annotation in BUILTIN_NAMES:
+            return BUILTIN_NAMES[annotation]
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return self.render_model_reference(annotation.__name__)
+        if isinstance(annotation, typing.ForwardRef):
+            return self.render_model_reference(annotation.__forward_arg__)
+        if isinstance(annotation, str):
+            return self.render_model_reference(annotation)
+
+        origin = typing.get_origin(annotation)
+        arguments = typing.get_args(annotation)
+        if origin is Annotated:
+            inner, *metadata = arguments
+            constraints = []
+            for field in metadata:
+                constraints.extend(
+                    self.render_constraints(getattr(field, "metadata", [])))
+            return (f"Annotated[{self.render_annotation(inner)}, "
+                    f"Field({', '.join(constraints)})]")
+        if origin is typing.Literal:
+            return f"Literal[{', '.join(repr(value) for value in arguments)}]"
+        if origin is typing.Union:
+            options = [self.render_annotation(option) for option in arguments]
+            if len(options) == 2 and "None" in options:
+                options.remove("None")
+                return f"Optional[{options[0]}]"
+            return f"Union[{', '.join(options)}]"
+        if origin is list:
+            return f"List[{self.render_annotation(arguments[0])}]"
+        if origin is dict:
+            return (f"Dict[{self.render_annotation(arguments[0])}, "
+                    f"{self.render_annotation(arguments[1])}]")
+        raise ValueError(f"Cannot render annotation {annotation!r}")
+
+    def render_model_reference(self, name: str) -> str:
+        if name in self._defined:
+            return name
+        self.has_forward_refs = True
+        return repr(name)
+
+
+def render_value(value: Any) -> str:
+    """ Renders a JSON value as a Python literal. """
+    return pprint.pformat(value, indent=4, width=79, sort_dicts=False)
+
+
+def render_models(models: Dict[str, Type[BaseModel]]) -> str:
+    """ Returns Python source defining models, see ModelSourceWriter. """
+    return ModelSourceWriter(models).render()
+
+
+def load_models(source: str, model_name: str,
+                module_name: str = "lang2logic_models") -> Type[BaseModel]:
+    """
+    Runs model source from render_models in a fresh module and returns its
+    model_name model. Raises ValueError when the source does not import.
+    """
+    module = types.ModuleType(module_name)
+    try:
+        exec(compile(MODELS_PRELUDE + source, module_name, "exec"),
+             module.__dict__)
+        model = module.__dict__[model_name]
+    except Exception as e:
+        raise ValueError(f"Generated models do not import: {e}")
+    if not isinstance(model, type) or not issubclass(model, BaseModel):
+        raise ValueError(f"{model_name} is not a generated model")
+    return model
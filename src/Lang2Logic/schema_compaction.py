@@ -0,0 +1,257 @@
+import json
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+#custom imports
+from .canonicalize import (SCHEMA_KEYWORDS, SCHEMA_LIST_KEYWORDS,
+                           SCHEMA_MAP_KEYWORDS)
+
+# Keywords that cost prompt tokens without telling the model anything
+DROPPED_KEYWORDS = {"title", "$comment"}
+DEFINITION_KEYWORDS = ("$defs", "definitions")
+
+_encoding = None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Counts tokens with tiktoken's cl100k_base encoding when tiktoken is
+    installed, otherwise estimates four characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def minify(schema: Any) -> str:
+    return json.dumps(schema, separators=(",", ":"), ensure_ascii=False)
+
+
+def map_subschemas(schema: Dict[str, Any],
+                   func: Callable[[Any], Any]) -> Dict[str, Any]:
+    """ Returns a copy of schema with func applied to each direct subschema. """
+    mapped = {}
+    for key, value in schema.items():
+        if key in SCHEMA_KEYWORDS:
+            value = func(value)
+        elif key in SCHEMA_LIST_KEYWORDS and isinstance(value, list):
+            value = [func(option) for option in value]
+        elif key in SCHEMA_MAP_KEYWORDS and isinstance(value, dict):
+            value = {name: func(subschema) for name, subschema in value.items()}
+        elif key == "items":
+            value = ([func(item) for item in value]
+                     if isinstance(value, list) else func(value))
+        elif key == "dependencies" and isinstance(value, dict):
+            value = {
+                name: func(dependency) if isinstance(dependency, dict) else
+                dependency
+                for name, dependency in value.items()
+            }
+        mapped[key] = value
+    return mapped
+
+
+class CompactionReport:
+    """ Size of one schema in a prompt before and after compaction. """
+
+    def __init__(self, before: str, after: str):
+        self.before_chars = len(before)
+        self.after_chars = len(after)
+        self.before_tokens = estimate_tokens(before)
+        self.after_tokens = estimate_tokens(after)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.before_tokens - self.after_tokens
+
+    def __repr__(self) -> str:
+        return (f"CompactionReport(before_tokens={self.before_tokens}, "
+                f"after_tokens={self.after_tokens})")
+
+
+class SchemaCompactor:
+    """
+    Shrinks a JSON schema for use in a prompt. It drops title and $comment
+    (and `default: null`), inlines $defs/definitions entries wherever the
+    inlined copies are smaller than the definition plus its references,
+    collapses single-item allOf and minifies the JSON. Recursive
+    definitions are never inlined. The result is only meant to be read by
+    the model, never used for validation.
+    """
+
+    def compact(self, schema: Any) -> Any:
+        if not isinstance(schema, dict):
+            return schema
+        schema = self.strip(schema)
+        schema = self.inline_refs(schema)
+        return self.collapse_all_of(schema)
+
+    def to_json(self, schema: Any) -> str:
+        return minify(self.compact(schema))
+
+    def report(self, schema: Any) -> CompactionReport:
+        return CompactionReport(json.dumps(schema), self.to_json(schema))
+
+    def strip(self, schema: Any) -> Any:
+        if not isinstance(schema, dict):
+            return schema
+        stripped = {
+            key: value
+            for key, value in schema.items()
+            if key not in DROPPED_KEYWORDS and not (key == "default"
+                                                    and value is None)
+        }
+        return map_subschemas(stripped, self.strip)
+
+    def get_definition_key(self, reference: Any) -> Optional[Tuple[str, str]]:
+        if not isinstance(reference, str):
+            return None
+        for container in DEFINITION_KEYWORDS:
+            prefix = f"#/{container}/"
+            if reference.startswith(prefix) and "/" not in reference[len(
+                    prefix):]:
+                name = reference[len(prefix):]
+                return container, name.replace("~1", "/").replace("~0", "~")
+        return None
+
+    def collect_refs(self, schema: Any, found: Dict[Tuple[str, str],
+                                                   int]) -> None:
+        if not isinstance(schema, dict):
+            return
+        key = self.get_definition_key(schema.get("$ref"))
+        if key is not None:
+            found[key] = found.get(key, 0) + 1
+
+        def visit(subschema):
+            self.collect_refs(subschema, found)
+            return subschema
+
+        map_subschemas(schema, visit)
+
+    def find_recursive(self, definitions: Dict[Tuple[str, str],
+                                               Any]) -> Set[Tuple[str, str]]:
+        """ Definitions that can reach themselves through references. """
+        edges = {}
+        for key, body in definitions.items():
+            found: Dict[Tuple[str, str], int] = {}
+            self.collect_refs(body, found)
+            edges[key] = set(found)
+        recursive = set()
+        for start in definitions:
+            stack, seen = list(edges[start]), set()
+            while stack:
+                current = stack.pop()
+                if current == start:
+                    recursive.add(start)
+                    break
+                if current in seen or current not in edges:
+                    continue
+                seen.add(current)
+                stack.extend(edges[current])
+        return recursive
+
+    def inline_refs(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        definitions = {
+            (container, name): body
+            for container in DEFINITION_KEYWORDS
+            if isinstance(schema.get(container), dict)
+            for name, body in schema[container].items()
+        }
+        if not definitions:
+            return schema
+        counts: Dict[Tuple[str, str], int] = {}
+        self.collect_refs(schema, counts)
+        recursive = self.find_recursive(definitions)
+
+        inlined = {}
+        for key, body in definitions.items():
+            count = counts.get(key, 0)
+            if key in recursive:
+                continue
+            body_size = len(minify(body))
+            reference_size = len(minify({"$ref": f"#/{key[0]}/{key[1]}"}))
+            kept_size = body_size + len(minify(key[1])) + 1 + (count *
+                                                               reference_size)
+            if count * body_size <= kept_size:
+                inlined[key] = body
+
+        def substitute(subschema):
+            if not isinstance(subschema, dict):
+                return subschema
+            key = self.get_definition_key(subschema.get("$ref"))
+            if key in inlined:
+                body = substitute(inlined[key])
+                siblings = {
+                    name: value
+                    for name, value in subschema.items() if name != "$ref"
+                }
+                if not siblings:
+                    return body
+                if isinstance(body, dict) and not set(body) & set(siblings):
+                    return dict(body, **map_subschemas(siblings, substitute))
+                return dict(map_subschemas(siblings, substitute),
+                            allOf=[body])
+            return map_subschemas(subschema, substitute)
+
+        compacted = substitute({
+            key: value
+            for key, value in schema.items() if key not in DEFINITION_KEYWORDS
+        })
+        for container in DEFINITION_KEYWORDS:
+            kept = {
+                name: substitute(body)
+                for (owner, name), body in definitions.items()
+                if owner == container and (owner, name) not in inlined
+            }
+            if kept:
+                compacted[container] = kept
+        return compacted
+
+    def collapse_all_of(self, schema: Any) -> Any:
+        if not isinstance(schema, dict):
+            return schema
+        schema = map_subschemas(schema, self.collapse_all_of)
+        parts = schema.get("allOf")
+        if isinstance(parts, list) and len(parts) == 1 and isinstance(
+                parts[0], dict):
+            rest = {key: value for key, value in schema.items()
+                    if key != "allOf"}
+            if not set(rest) & set(parts[0]):
+                return dict(rest, **parts[0])
+        return schema
+
+
+schema_compactor = SchemaCompactor()
+
+
+def compact_schema(schema: Any) -> Any:
+    """ Returns the prompt-sized form of schema, see SchemaCompactor. """
+    return schema_compactor.compact(schema)
+
+
+def compact_schema_json(schema: Any) -> str:
+    return schema_compactor.to_json(schema)
+
+
+@lru_cache(maxsize=256)
+def model_format_instructions(model: Any) -> Tuple[str, CompactionReport]:
+    """
+    Format instructions for a Pydantic model like PydanticOutputParser's,
+    with the compacted schema, and the report comparing the two.
+    """
+    from langchain.output_parsers.format_instructions import (
+        PYDANTIC_FORMAT_INSTRUCTIONS)
+    schema = model.model_json_schema()
+    # PydanticOutputParser leaves these out as well
+    schema.pop("title", None)
+    schema.pop("type", None)
+    compacted = compact_schema_json(schema)
+    report = CompactionReport(json.dumps(schema), compacted)
+    return PYDANTIC_FORMAT_INSTRUCTIONS.format(schema=compacted), report
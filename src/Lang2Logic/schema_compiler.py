@@ -0,0 +1,280 @@
+import keyword
+import re
+from typing import Any, Dict, List, Literal, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ConfigDict, Field, create_model
+from typing_extensions import Annotated
+
+#custom imports
+from .canonicalize import canonical_json, normalize_schema
+
+JSON_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": float,
+    "boolean": bool,
+    "null": type(None),
+}
+
+# Draft-7 keywords mapped onto pydantic Field constraints
+STRING_CONSTRAINTS = {"minLength": "min_length", "maxLength": "max_length"}
+NUMBER_CONSTRAINTS = {
+    "minimum": "ge",
+    "maximum": "le",
+    "exclusiveMinimum": "gt",
+    "exclusiveMaximum": "lt",
+    "multipleOf": "multiple_of",
+}
+ARRAY_CONSTRAINTS = {"minItems": "min_length", "maxItems": "max_length"}
+
+
+class SchemaModelCompiler:
+    """
+    Compiles a Draft-7 JSON schema dictionary into Pydantic models in-process.
+
+    The root of the schema must describe an object (see
+    ResponseGenerator.wrap_root_in_object); the compiled top-level model is
+    returned directly by compile(). Object subschemas with the same normal
+    form, such as one address object inlined in several places, compile to
+    a single shared model.
+    """
+
+    def __init__(self, schema: Dict[str, Any], model_name: str = "Model"):
+        if not isinstance(schema, dict):
+            raise ValueError("Schema must be a dictionary.")
+        self.schema = schema
+        self.model_name = model_name
+        self.models: Dict[str, Type[BaseModel]] = {}
+        self._ref_models: Dict[str, Any] = {}
+        self._building_refs: Dict[str, str] = {}
+        self._pending_names = set()
+        # Models by the canonical JSON of their subschema's normal form
+        self._interned: Dict[str, Type[BaseModel]] = {}
+
+    def compile(self) -> Type[BaseModel]:
+        """ Builds every model reachable from the root and returns the root model. """
+        root = self._build(self.schema, self.model_name, force_model=True)
+        if not (isinstance(root, type) and issubclass(root, BaseModel)):
+            raise ValueError("The root of the schema must describe an object.")
+        # Resolve forward references left behind by recursive $refs
+        for model in self.models.values():
+            model.model_rebuild(_types_namespace=dict(self.models))
+        return root
+
+    def _build(self, schema: Any, name_hint: str, force_model: bool = False) -> Any:
+        if schema is True or schema is None or schema == {}:
+            return Any
+        if schema is False:
+            raise ValueError("Schema 'false' cannot be compiled to a model.")
+        if not isinstance(schema, dict):
+            raise ValueError(f"Invalid subschema: {schema}")
+
+        if "$ref" in schema:
+            return self._build_ref(schema["$ref"])
+        if "const" in schema:
+            return self._literal([schema["const"]])
+        if schema.get("enum"):
+            return self._literal(schema["enum"])
+        if schema.get("allOf"):
+            return self._build(self._merge_all_of(schema), name_hint, force_model)
+        for combinator in ("anyOf", "oneOf"):
+            if schema.get(combinator):
+                options = [
+                    self._build(option, f"{name_hint}{index}")
+                    for index, option in enumerate(schema[combinator])
+                ]
+                return self._union(options)
+
+        schema_type = schema.get("type")
+        if isinstance(schema_type, list):
+            options = [
+                self._build(dict(schema, type=single_type), name_hint,
+                            force_model)
+                for single_type in schema_type
+            ]
+            return self._union(options)
+
+        if schema_type == "object" or (schema_type is None
+                                       and schema.get("properties")):
+            return self._build_object(schema, name_hint, force_model)
+        if schema_type == "array":
+            return self._build_array(schema, name_hint)
+        if schema_type in JSON_TYPES:
+            return self._build_primitive(schema, schema_type)
+        return Any
+
+    def _build_ref(self, reference: str) -> Any:
+        if reference in self._ref_models:
+            return self._ref_models[reference]
+        if reference in self._building_refs:
+            # Recursive reference, resolved by model_rebuild once compiled
+            return self._building_refs[reference]
+        target = self._resolve_reference(reference)
+        name = self._unique_name(self._camel_case(reference.split("/")[-1]
+                                                  or self.model_name))
+        self._building_refs[reference] = name
+        self._pending_names.add(name)
+        try:
+            built = self._build(target, name)
+        finally:
+            self._building_refs.pop(reference, None)
+            self._pending_names.discard(name)
+        self._ref_models[reference] = built
+        return built
+
+    def _resolve_reference(self, reference: str) -> Dict[str, Any]:
+        if not reference.startswith("#"):
+            raise ValueError(f"Only local references are supported: {reference}")
+        target = self.schema
+        for part in reference.lstrip("#").strip("/").split("/"):
+            if not part:
+                continue
+            part = part.replace("~1", "/").replace("~0", "~")
+            if not isinstance(target, dict) or part not in target:
+                raise ValueError(f"Unresolvable reference: {reference}")
+            target = target[part]
+        return target
+
+    def _build_object(self, schema: Dict[str, Any], name_hint: str,
+                      force_model: bool) -> Any:
+        properties = schema.get("properties") or {}
+        additional = schema.get("additionalProperties", True)
+        if not properties and not force_model:
+            if isinstance(additional, dict):
+                return Dict[str, self._build(additional, f"{name_hint}Value")]
+            return Dict[str, Any]
+
+        intern_key = canonical_json(normalize_schema(schema))
+        if intern_key in self._interned:
+            return self._interned[intern_key]
+
+        if name_hint in self._pending_names and name_hint not in self.models:
+            # Name reserved by a $ref so recursive references can find it
+            name = name_hint
+        else:
+            name = self._unique_name(
+                self._camel_case(schema.get("title") or name_hint))
+        required = set(schema.get("required") or [])
+        fields: Dict[str, Tuple[Any, Any]] = {}
+        used_names = set()
+        for property_name, property_schema in properties.items():
+            annotation = self._build(property_schema,
+                                     f"{name}{self._camel_case(property_name)}")
+            field_name = self._field_name(property_name, used_names)
+            used_names.add(field_name)
+            field_kwargs: Dict[str, Any] = {}
+            if field_name != property_name:
+                field_kwargs["alias"] = property_name
+            if isinstance(property_schema, dict) and property_schema.get(
+                    "description"):
+                field_kwargs["description"] = property_schema["description"]
+            if property_name in required:
+                fields[field_name] = (annotation, Field(..., **field_kwargs))
+            else:
+                fields[field_name] = (Optional[annotation],
+                                      Field(None, **field_kwargs))
+
+        config = ConfigDict(populate_by_name=True, protected_namespaces=())
+        if additional is False:
+            config["extra"] = "forbid"
+        model = create_model(name, __config__=config, **fields)
+        if schema.get("description"):
+            model.__doc__ = schema["description"]
+        self.models[name] = model
+        self._interned[intern_key] = model
+        return model
+
+    def _build_array(self, schema: Dict[str, Any], name_hint: str) -> Any:
+        items = schema.get("items")
+        if isinstance(items, list):
+            item_type = self._union([
+                self._build(item, f"{name_hint}Item{index}")
+                for index, item in enumerate(items)
+            ]) if items else Any
+        else:
+            item_type = self._build(items, f"{name_hint}Item")
+        return self._constrained(List[item_type], schema, ARRAY_CONSTRAINTS)
+
+    def _build_primitive(self, schema: Dict[str, Any], schema_type: str) -> Any:
+        python_type = JSON_TYPES[schema_type]
+        if schema_type == "string":
+            return self._constrained(python_type, schema, STRING_CONSTRAINTS)
+        if schema_type in ("integer", "number"):
+            return self._constrained(python_type, schema, NUMBER_CONSTRAINTS)
+        return python_type
+
+    def _constrained(self, python_type: Any, schema: Dict[str, Any],
+                     constraints: Dict[str, str]) -> Any:
+        field_kwargs = {
+            argument: schema[keyword_name]
+            for keyword_name, argument in constraints.items()
+            if isinstance(schema.get(keyword_name), (int, float))
+            and not isinstance(schema.get(keyword_name), bool)
+        }
+        if not field_kwargs:
+            return python_type
+        return Annotated[python_type, Field(**field_kwargs)]
+
+    def _merge_all_of(self, schema: Dict[str, Any]) -> Dict[str, Any]:
+        merged = {key: value for key, value in schema.items() if key != "allOf"}
+        for part in schema["allOf"]:
+            if isinstance(part, dict) and "$ref" in part:
+                part = self._resolve_reference(part["$ref"])
+            if not isinstance(part, dict):
+                continue
+            for key, value in part.items():
+                if key == "properties":
+                    merged["properties"] = dict(merged.get("properties") or {},
+                                                **value)
+                elif key == "required":
+                    merged["required"] = list(
+                        dict.fromkeys((merged.get("required") or []) + value))
+                else:
+                    merged.setdefault(key, value)
+        return merged
+
+    def _literal(self, values: List[Any]) -> Any:
+        try:
+            return Literal[tuple(dict.fromkeys(values))]
+        except TypeError:
+            # Unhashable enum members (objects, arrays) cannot form a Literal
+            return Any
+
+    def _union(self, options: List[Any]) -> Any:
+        options = list(dict.fromkeys(options))
+        if Any in options:
+            return Any
+        if len(options) == 1:
+            return options[0]
+        return Union[tuple(options)]
+
+    def _field_name(self, property_name: str, used_names: set) -> str:
+        field_name = re.sub(r"\W", "_", property_name)
+        if not field_name or field_name[0].isdigit() or field_name[0] == "_":
+            field_name = f"field_{field_name}"
+        if keyword.iskeyword(field_name) or hasattr(BaseModel, field_name):
+            field_name = f"{field_name}_"
+        while field_name in used_names:
+            field_name = f"{field_name}_"
+        return field_name
+
+    def _camel_case(self, value: str) -> str:
+        parts = re.split(r"[^0-9a-zA-Z]+", str(value))
+        name = "".join(part[:1].upper() + part[1:] for part in parts if part)
+        if not name or name[0].isdigit():
+            name = f"Model{name}"
+        return name
+
+    def _unique_name(self, name: str) -> str:
+        unique = name
+        index = 1
+        while unique in self.models or unique in self._pending_names:
+            unique = f"{name}{index}"
+            index += 1
+        return unique
+
+
+def compile_schema_to_model(schema: Dict[str, Any],
+                            model_name: str = "Model") -> Type[BaseModel]:
+    """ Compiles a Draft-7 object schema into its top-level Pydantic model. """
+    return SchemaModelCompiler(schema, model_name=model_name).compile()
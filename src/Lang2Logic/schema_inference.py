@@ -0,0 +1,143 @@
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+DRAFT_7 = "http://json-schema.org/draft-07/schema#"
+
+
+def _json_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, int):
+        return "integer"
+    if isinstance(value, float):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, (list, tuple)):
+        return "array"
+    if isinstance(value, dict):
+        return "object"
+    raise TypeError(f"{type(value).__name__} is not a JSON value")
+
+
+class _Observations:
+    """ Everything seen at one position of the example documents. """
+
+    def __init__(self):
+        self.types = set()
+        self.strings: List[str] = []
+        self.objects = 0
+        self.key_counts: Counter = Counter()
+        self.properties: Dict[str, "_Observations"] = {}
+        self.array_lengths: List[int] = []
+        self.items: Optional["_Observations"] = None
+
+    def add(self, value: Any) -> None:
+        value_type = _json_type(value)
+        self.types.add(value_type)
+        if value_type == "string":
+            self.strings.append(value)
+        elif value_type == "object":
+            self.objects += 1
+            for key, member in value.items():
+                if not isinstance(key, str):
+                    raise TypeError("Object keys must be strings")
+                self.key_counts[key] += 1
+                self.properties.setdefault(key, _Observations()).add(member)
+        elif value_type == "array":
+            self.array_lengths.append(len(value))
+            for item in value:
+                if self.items is None:
+                    self.items = _Observations()
+                self.items.add(item)
+
+
+class SchemaInferrer:
+    """
+    Infers a Draft-7 schema from example documents without calling a model.
+
+    Types seen at the same position are merged (integer and number become
+    number), object keys present in every example are required, strings with
+    few distinct values that mostly repeat become enums, and arrays get an item
+    schema plus the smallest length seen as minItems. The largest length
+    seen only becomes maxItems with max_items=True, since a few short
+    examples would otherwise reject every longer answer.
+    """
+
+    def __init__(self,
+                 enum_max_values: int = 5,
+                 enum_min_samples: int = 3,
+                 array_bounds: bool = True,
+                 max_items: bool = False):
+        self.enum_max_values = enum_max_values
+        self.enum_min_samples = enum_min_samples
+        self.array_bounds = array_bounds
+        self.max_items = max_items
+
+    def infer(self, *docs: Any) -> Dict[str, Any]:
+        if not docs:
+            raise ValueError("At least one example is required")
+        observations = _Observations()
+        for doc in docs:
+            observations.add(doc)
+        schema = {"$schema": DRAFT_7}
+        schema.update(self.build(observations))
+        return schema
+
+    def build(self, observations: _Observations) -> Dict[str, Any]:
+        types = set(observations.types)
+        if {"integer", "number"} <= types:
+            types.discard("integer")
+        if not types:
+            # Only reached for the items of arrays that were always empty
+            return {}
+        schema: Dict[str, Any] = {}
+        ordered = sorted(types)
+        schema["type"] = ordered[0] if len(ordered) == 1 else ordered
+
+        if "string" in types:
+            enum = self.build_enum(observations.strings)
+            if enum is not None:
+                if types == {"string"}:
+                    schema["enum"] = enum
+                elif types == {"string", "null"}:
+                    schema["enum"] = enum + [None]
+        if "object" in types:
+            schema["properties"] = {
+                key: self.build(member)
+                for key, member in observations.properties.items()
+            }
+            required = [
+                key for key, count in observations.key_counts.items()
+                if count == observations.objects
+            ]
+            if required:
+                schema["required"] = required
+        if "array" in types:
+            if observations.items is not None:
+                schema["items"] = self.build(observations.items)
+            if self.array_bounds:
+                shortest = min(observations.array_lengths)
+                if shortest:
+                    schema["minItems"] = shortest
+                if self.max_items:
+                    schema["maxItems"] = max(observations.array_lengths)
+        return schema
+
+    def build_enum(self, values: List[str]) -> Optional[List[str]]:
+        counts = Counter(values)
+        if (len(values) < self.enum_min_samples
+                or len(counts) > self.enum_max_values):
+            return None
+        # Free text rarely repeats, so most values of a real enum recur
+        seen_once = sum(1 for count in counts.values() if count == 1)
+        if seen_once * 2 > len(counts):
+            return None
+        return list(counts)
+
+
+def infer_schema(*docs: Any, **options: Any) -> Dict[str, Any]:
+    """ Infers a Draft-7 schema from example documents, see SchemaInferrer. """
+    return SchemaInferrer(**options).infer(*docs)
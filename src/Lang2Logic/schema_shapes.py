@@ -0,0 +1,202 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+#custom imports
+from .json_utils import extract_json_payload
+from .response_schema import ResponseSchema
+from .schema_compaction import compact_schema_json
+
+PRIMITIVE_TYPES = {"string", "integer", "number", "boolean", "null"}
+
+# Keywords that only describe the document, never the value
+ROOT_ANNOTATIONS = {"$schema", "$id", "$comment", "title", "description"}
+PRIMITIVE_KEYWORDS = {
+    "type", "enum", "const", "format", "default", "examples", "title",
+    "description", "$comment", "minimum", "maximum", "exclusiveMinimum",
+    "exclusiveMaximum", "multipleOf", "minLength", "maxLength", "pattern"
+}
+LIST_KEYWORDS = {"type", "items", "minItems", "maxItems", "uniqueItems"}
+OBJECT_KEYWORDS = {
+    "type", "properties", "required", "additionalProperties",
+    "minProperties", "maxProperties"
+}
+
+SCALAR = "scalar"
+ENUM = "enum"
+LIST = "list"
+FLAT_OBJECT = "flat_object"
+COMPLEX = "complex"
+
+_FENCE = re.compile(r"^```[a-zA-Z]*\s*|\s*```$")
+
+
+def is_primitive_schema(schema: Any) -> bool:
+    """ True for a schema of a single string, number, boolean or null value. """
+    if not isinstance(schema, dict) or not set(schema) <= PRIMITIVE_KEYWORDS:
+        return False
+    schema_type = schema.get("type")
+    if schema_type is None:
+        return "enum" in schema or "const" in schema
+    types = schema_type if isinstance(schema_type, list) else [schema_type]
+    return bool(types) and all(t in PRIMITIVE_TYPES for t in types)
+
+
+def classify_schema(schema: Dict[str, Any]) -> str:
+    """
+    Sorts a Draft-7 schema into one of the shapes the lean path handles:
+    scalar, enum, list (of primitives), flat_object (of primitives), or
+    complex for everything else.
+    """
+    if not isinstance(schema, dict):
+        return COMPLEX
+    root = {
+        key: value
+        for key, value in schema.items() if key not in ROOT_ANNOTATIONS
+    }
+    if is_primitive_schema(root):
+        return ENUM if "enum" in root or "const" in root else SCALAR
+    schema_type = root.get("type")
+    if schema_type == "array" and set(root) <= LIST_KEYWORDS:
+        if is_primitive_schema(root.get("items")):
+            return LIST
+    if schema_type == "object" and set(root) <= OBJECT_KEYWORDS:
+        properties = root.get("properties")
+        if (isinstance(properties, dict) and properties
+                and isinstance(root.get("additionalProperties", False), bool)
+                and all(is_primitive_schema(value)
+                        for value in properties.values())):
+            return FLAT_OBJECT
+    return COMPLEX
+
+
+class LeanResponsePlan:
+    """
+    Everything needed to answer a simple schema without a Pydantic model: a
+    short prompt, JSON or literal extraction, and the shared Draft-7
+    validator. parse returns the same value the model path hands to the
+    unwrapper, or raises ValueError so the caller can fall back to it.
+    """
+
+    def __init__(self, schema: Any, shape: str):
+        self.schema = ResponseSchema(schema)
+        self.shape = shape
+        self.schema_dict = self.schema.to_dict()
+        self.validator = self.schema.validator
+        self.schema_json = compact_schema_json(self.schema_dict)
+
+    @classmethod
+    def for_schema(cls, schema: Any) -> Optional["LeanResponsePlan"]:
+        """ Returns a plan for simple valid schemas, otherwise None. """
+        schema = ResponseSchema(schema)
+        if not schema.is_valid_schema:
+            return None
+        shape = classify_schema(schema.to_dict())
+        if shape == COMPLEX:
+            return None
+        return cls(schema, shape)
+
+    def construct_prompt(self, query: str) -> str:
+        return ("Return the desired value for this query as JSON that is "
+                "valid against this JSON Schema. Only return the JSON value."
+                f"\n{self.schema_json}\n{query}\n")
+
+    def candidates(self, output: str):
+        """ Values the output could stand for, most literal first. """
+        try:
+            payload = extract_json_payload(output)
+        except ValueError:
+            # Bare answers such as red or Yes are only read for single values
+            if self.shape in (SCALAR, ENUM):
+                yield from self.literal_candidates(output)
+            return
+        yield payload
+        if isinstance(payload, dict) and list(payload) == ["root"]:
+            # The wrapped root object the model path asks for
+            yield payload["root"]
+
+    def literal_candidates(self, output: str):
+        text = _FENCE.sub("", output.strip()).strip()
+        quoted = len(text) >= 2 and text[0] == text[-1] and text[0] in "\"'`"
+        if quoted:
+            yield from self.literal_values(text[1:-1], quoted)
+            return
+        yield from self.literal_values(text, quoted)
+        if text.endswith("."):
+            # "Green." may end a sentence, but "U.S.A." is the answer itself
+            yield from self.literal_values(text[:-1], quoted)
+
+    def literal_values(self, text: str, quoted: bool):
+        lowered = text.lower()
+        if lowered in ("true", "false"):
+            yield lowered == "true"
+        if lowered in ("null", "none"):
+            yield None
+        try:
+            yield int(text)
+        except ValueError:
+            pass
+        if not text.endswith("."):
+            try:
+                yield float(text)
+            except ValueError:
+                pass
+        if self.shape == ENUM:
+            # Accept a case-insensitive match when it is unambiguous
+            matches = [
+                value for value in self.schema_dict.get("enum", [])
+                if isinstance(value, str) and value.lower() == lowered
+            ]
+            if len(matches) == 1:
+                yield matches[0]
+        # Prose such as "The answer is Paris." is left to the parsers
+        if quoted or not any(char.isspace() for char in text):
+            yield text
+
+    def parse(self, output: str) -> Any:
+        for value in self.candidates(output):
+            if self.validator.is_valid(value):
+                return self.normalize(value)
+        raise ValueError("Output does not match the schema")
+
+    def normalize(self, value: Any) -> Any:
+        if self.shape == FLAT_OBJECT:
+            # Like a model dump: every declared property in order, no extras
+            return {
+                key: value.get(key)
+                for key in self.schema_dict["properties"]
+            }
+        return value
+
+
+class LeanPlanCache:
+    """
+    Process-wide memo of LeanResponsePlan.for_schema keyed by schema
+    fingerprint, None included, bounded to the most recent max_size schemas.
+    """
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._plans: "OrderedDict[str, Optional[LeanResponsePlan]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, schema: Any) -> Optional[LeanResponsePlan]:
+        schema = ResponseSchema(schema)
+        with self._lock:
+            if schema.fingerprint in self._plans:
+                self._plans.move_to_end(schema.fingerprint)
+                return self._plans[schema.fingerprint]
+        plan = LeanResponsePlan.for_schema(schema)
+        with self._lock:
+            self._plans[schema.fingerprint] = plan
+            while len(self._plans) > self.max_size:
+                self._plans.popitem(last=False)
+        return plan
+
+    def clear(self) -> None:
+        with self._lock:
+            self._plans.clear()
+
+
+lean_plans = LeanPlanCache()
@@ -0,0 +1,123 @@
+import copy
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+#custom imports
+from .deadline import DeadlineExceeded, get_deadline
+from .metrics import Metrics
+
+
+class _Call:
+    """ One in-flight call that identical callers wait on. """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is running,
+    later callers with the same key wait for it and share its result or its
+    error instead of making their own.
+
+    Followers get a deep copy of the leader's result, so nobody can mutate
+    another caller's value. A leader that fails with DeadlineExceeded ran
+    out of its own time budget, so its followers do not share that error;
+    they run the call again under their own deadlines. Counters: leaders (calls that ran) and coalesced
+    (calls that shared one).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._tasks: Dict[Any, Any] = {}
+        self.metrics = Metrics("leaders", "coalesced")
+
+    def do(self, key: Hashable, func: Callable[..., Any], *args: Any,
+           **kwargs: Any) -> Any:
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+            if leader:
+                break
+            self.metrics.increment("coalesced")
+            deadline = get_deadline()
+            if not call.done.wait(
+                    None if deadline is None else deadline.remaining()):
+                raise DeadlineExceeded(
+                    "Deadline exceeded waiting for a coalesced call",
+                    "coalesced call")
+            if isinstance(call.error, DeadlineExceeded):
+                # The leader ran out of its own budget, not ours: run again
+                continue
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+
+        self.metrics.increment("leaders")
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def ado(self, key: Hashable, func: Callable[..., Any], *args: Any,
+                  **kwargs: Any) -> Any:
+        """
+        Coroutine version of do. The shared call runs as its own task, so a
+        cancelled caller does not cancel it for the others.
+        """
+        import asyncio
+        loop = asyncio.get_running_loop()
+        task_key = (loop, key)
+        while True:
+            with self._lock:
+                task = self._tasks.get(task_key)
+                leader = task is None or task.done()
+                if leader:
+                    task = loop.create_task(func(*args, **kwargs))
+                    self._tasks[task_key] = task
+                    task.add_done_callback(
+                        lambda done: self._forget_task(task_key, done))
+            self.metrics.increment("leaders" if leader else "coalesced")
+            deadline = get_deadline()
+            try:
+                if deadline is None:
+                    result = await asyncio.shield(task)
+                else:
+                    result = await asyncio.wait_for(asyncio.shield(task),
+                                                    deadline.remaining())
+            except asyncio.TimeoutError as e:
+                # DeadlineExceeded is a TimeoutError as well
+                if not task.done():
+                    raise DeadlineExceeded(
+                        "Deadline exceeded waiting for a coalesced call",
+                        "coalesced call") from e
+                if leader or not isinstance(e, DeadlineExceeded):
+                    raise
+                # The leader ran out of its own budget, not ours: run again
+                continue
+            return result if leader else copy.deepcopy(result)
+
+    def _forget_task(self, task_key: Any, task: Any) -> None:
+        with self._lock:
+            if self._tasks.get(task_key) is task:
+                del self._tasks[task_key]
+        if not task.cancelled():
+            # Mark the error as retrieved even if every caller went away
+            task.exception()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls) + len(self._tasks)
@@ -0,0 +1,40 @@
+import asyncio
+import time
+from langchain_community.chat_models.fake import FakeListChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+class SlowChatModel(FakeListChatModel):
+    """
+    Takes `delay` seconds per completion, or delays[i] for the i-th one, and
+    records the timeouts it got. Async completions sleep on the event loop so
+    they can be cancelled.
+    """
+    delay: float = 0.0
+    delays: list = []
+    timeouts: list = []
+
+    def next_delay(self, kwargs):
+        self.timeouts.append(kwargs.get("timeout"))
+        index = len(self.timeouts) - 1
+        return self.delays[index] if index < len(self.delays) else self.delay
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.next_delay(kwargs))
+        return super()._call(*args, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None,
+                         **kwargs):
+        await asyncio.sleep(self.next_delay(kwargs))
+        content = super()._call(messages, stop=stop, **kwargs)
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=content))])
@@ -0,0 +1,67 @@
+import asyncio
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from fakes import SlowChatModel, list_schema
+from Lang2Logic.generator import Generator
+
+
+class TestAsyncGeneration(unittest.TestCase):
+
+    def test_agenerate_with_schema(self):
+        chat_model = FakeListChatModel(responses=['{"root": [1, 2, 3]}'])
+        test_gen = Generator(None, chat_model=chat_model)
+        result = asyncio.run(test_gen.agenerate("return 1-3", list_schema))
+        self.assertEqual(result, [1, 2, 3])
+
+    def test_agenerate_infers_schema(self):
+        chat_model = FakeListChatModel(responses=[
+            '{"type": "array", "items": {"type": "integer"}}',
+            '{"root": [4, 5]}'
+        ])
+        test_gen = Generator(None, chat_model=chat_model)
+        result = asyncio.run(test_gen.agenerate("return 4 and 5"))
+        self.assertEqual(result, [4, 5])
+
+    def test_agenerate_escalates_to_llm_fixer(self):
+        chat_model = FakeListChatModel(
+            responses=['{"root": ["one"]}', '{"root": [1]}'])
+        test_gen = Generator(None, chat_model=chat_model)
+        result = asyncio.run(test_gen.agenerate("return one", list_schema))
+        self.assertEqual(result, [1])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["llm_fixes"], 1)
+
+    def test_agenerate_retries_with_error(self):
+        chat_model = FakeListChatModel(responses=[
+            '{"root": ["one"]}', '{"root": ["still one"]}', '{"root": [1]}'
+        ])
+        test_gen = Generator(None, chat_model=chat_model)
+        result = asyncio.run(test_gen.agenerate("return one", list_schema))
+        self.assertEqual(result, [1])
+
+    def test_agenerate_schema(self):
+        chat_model = FakeListChatModel(
+            responses=['{"type": "array", "items": {"type": "string"}}'])
+        test_gen = Generator(None, chat_model=chat_model)
+        schema = asyncio.run(test_gen.agenerate_schema("return colors"))
+        self.assertEqual(schema.to_dict()["items"]["type"], "string")
+
+    def test_cancellation(self):
+        chat_model = SlowChatModel(responses=['{"root": [1]}'], delay=5)
+        test_gen = Generator(None, chat_model=chat_model)
+
+        async def cancel_generation():
+            task = asyncio.create_task(
+                test_gen.agenerate("return 1", list_schema))
+            await asyncio.sleep(0.2)
+            task.cancel()
+            await task
+
+        with self.assertRaises(asyncio.CancelledError):
+            asyncio.run(cancel_generation())
+
+
+if __name__ == '__main__':
+    unittest.main()
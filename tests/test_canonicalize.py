@@ -0,0 +1,106 @@
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.canonicalize import normal_fingerprint, normalize_schema
+from Lang2Logic.generator import Generator
+from Lang2Logic.response_schema import ResponseSchema
+from Lang2Logic.schema_compiler import SchemaModelCompiler
+
+address_schema = {
+    "type": "object",
+    "properties": {
+        "street": {
+            "type": "string"
+        },
+        "city": {
+            "type": "string"
+        }
+    },
+    "required": ["street", "city"]
+}
+person_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string"
+        },
+        "age": {
+            "type": "integer"
+        }
+    },
+    "required": ["name"]
+}
+person_variant = {
+    "type": "object",
+    "$comment": "same schema, spelled differently",
+    "required": ["name"],
+    "additionalProperties": True,
+    "properties": {
+        "age": {
+            "type": ["integer"],
+            "examples": [42]
+        },
+        "name": {
+            "type": "string",
+            "default": ""
+        }
+    }
+}
+
+
+class TestNormalizeSchema(unittest.TestCase):
+
+    def test_variants_share_normal_form(self):
+        self.assertEqual(normalize_schema(person_variant),
+                         normalize_schema(person_schema))
+        self.assertEqual(ResponseSchema(person_variant),
+                         ResponseSchema(person_schema))
+
+    def test_meaningful_differences_are_kept(self):
+        described = dict(person_schema, description="A customer")
+        self.assertNotEqual(normal_fingerprint(described),
+                            normal_fingerprint(person_schema))
+        # Property names and data values are not keywords
+        data = {"enum": [{"$comment": 1}], "properties": {"default": {}}}
+        self.assertEqual(normalize_schema(data), data)
+
+    def test_invalid_schemas_keep_exact_fingerprint(self):
+        invalid = dict(person_schema, **{"$comment": 5})
+        self.assertFalse(ResponseSchema(invalid).is_valid_schema)
+        self.assertNotEqual(ResponseSchema(invalid),
+                            ResponseSchema(person_schema))
+
+
+class TestSubschemaInterning(unittest.TestCase):
+
+    def test_repeated_object_compiles_to_one_model(self):
+        compiler = SchemaModelCompiler({
+            "type": "object",
+            "properties": {
+                "home": address_schema,
+                "work": dict(address_schema, **{"$comment": "office"}),
+                "previous": {
+                    "type": "array",
+                    "items": address_schema
+                }
+            }
+        })
+        model = compiler.compile()
+        self.assertEqual(len(compiler.models), 2)
+        fields = model.model_fields
+        self.assertIs(fields["home"].annotation, fields["work"].annotation)
+
+    def test_variants_share_compiled_model(self):
+        chat_model = FakeListChatModel(
+            responses=['{"name": "Ada"}', '{"name": "Alan"}', "unused"])
+        test_gen = Generator(None, chat_model=chat_model, lean_path=False)
+        test_gen.generate("first", person_schema)
+        test_gen.generate("second", person_variant)
+        stats = test_gen.ResponseGenerator.model_cache.stats()
+        self.assertEqual((stats["misses"], stats["hits"]), (1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
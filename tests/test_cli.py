@@ -0,0 +1,158 @@
+import importlib
+import json
+import os
+import sys
+import tempfile
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.cli import main
+from Lang2Logic.generator import Generator
+
+DRAFT_7 = "http://json-schema.org/draft-07/schema#"
+
+tree_schema = {
+    "$schema": DRAFT_7,
+    "type": "object",
+    "definitions": {
+        "node": {
+            "type": "object",
+            "properties": {
+                "name": {
+                    "type": "string",
+                    "minLength": 1
+                },
+                "children": {
+                    "type": "array",
+                    "items": {
+                        "$ref": "#/definitions/node"
+                    }
+                }
+            },
+            "required": ["name"]
+        }
+    },
+    "properties": {
+        "tree": {
+            "$ref": "#/definitions/node"
+        },
+        "class": {
+            "enum": ["a", "b"]
+        }
+    },
+    "required": ["tree"]
+}
+colors_schema = {
+    "$schema": DRAFT_7,
+    "type": "array",
+    "items": {
+        "type": "string"
+    },
+    "minItems": 1
+}
+person_schema = {
+    "$schema": DRAFT_7,
+    "type": "object",
+    "definitions": {
+        "name": {
+            "type": "string"
+        }
+    },
+    "properties": {
+        "name": {
+            "$ref": "#/definitions/name"
+        },
+        "friends": {
+            "type": "array",
+            "items": {
+                "$ref": "#"
+            }
+        }
+    },
+    "required": ["name"]
+}
+tree_output = '{"tree": {"name": "a", "children": [{"name": "b"}]}, "class": "b"}'
+
+
+class TestCompileCommand(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        schemas = os.path.join(self.directory.name, "schemas")
+        os.makedirs(schemas)
+        for name, schema in (("tree", tree_schema),
+                             ("colors", colors_schema)):
+            with open(os.path.join(schemas, f"{name}.json"), "w") as f:
+                json.dump(schema, f)
+        self.schemas = schemas
+        self.output = os.path.join(self.directory.name, "precompiled_models")
+
+    def import_package(self):
+        self.assertEqual(main(["compile", self.schemas, "-o", self.output]),
+                         0)
+        sys.path.insert(0, self.directory.name)
+        self.addCleanup(sys.path.remove, self.directory.name)
+        for name in [name for name in sys.modules
+                     if name.startswith("precompiled_models")]:
+            del sys.modules[name]
+        return importlib.import_module("precompiled_models")
+
+    def test_package_exposes_handles(self):
+        package = self.import_package()
+        self.assertEqual(sorted(package.SCHEMAS), ["colors", "tree"])
+        self.assertEqual(package.tree.to_dict()["required"], ["tree"])
+
+    def test_generate_does_not_compile_at_runtime(self):
+        package = self.import_package()
+        chat_model = FakeListChatModel(
+            responses=[tree_output, '["red"]', tree_output, "unused"])
+        test_gen = Generator(None, chat_model=chat_model)
+        expected = {
+            "class": "b",
+            "tree": {
+                "children": [{
+                    "children": None,
+                    "name": "b"
+                }],
+                "name": "a"
+            }
+        }
+        self.assertEqual(test_gen.generate("tree", package.tree), expected)
+        self.assertEqual(test_gen.generate("colors", package.colors), ["red"])
+        self.assertEqual(test_gen.ResponseGenerator.model_cache.metrics.get(
+            "misses"), 0)
+        # Same answer as compiling the schema at runtime
+        self.assertEqual(test_gen.generate("tree", tree_schema), expected)
+
+    def test_recursive_schema_and_validator(self):
+        with open(os.path.join(self.schemas, "person.json"), "w") as f:
+            json.dump(person_schema, f)
+        package = self.import_package()
+        self.assertTrue(package.person.validator.is_valid({"name": "a"}))
+        self.assertFalse(package.person.validator.is_valid({"name": 1}))
+
+        chat_model = FakeListChatModel(
+            responses=['{"name": "a", "friends": [{"name": "b"}]}'])
+        test_gen = Generator(None, chat_model=chat_model)
+        self.assertEqual(test_gen.generate("people", package.person), {
+            "name": "a",
+            "friends": [{
+                "name": "b",
+                "friends": None
+            }]
+        })
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["fast_path_hits"], 1)
+
+    def test_invalid_schema_fails(self):
+        with open(os.path.join(self.schemas, "bad.json"), "w") as f:
+            json.dump({"type": "object", "properties": 5}, f)
+        self.assertEqual(main(["compile", self.schemas, "-o", self.output]),
+                         1)
+        self.assertFalse(os.path.exists(self.output))
+
+
+if __name__ == '__main__':
+    unittest.main()
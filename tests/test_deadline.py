@@ -0,0 +1,152 @@
+import asyncio
+import time
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from fakes import SlowChatModel, list_schema
+from Lang2Logic.deadline import DeadlineExceeded, deadline_scope, get_deadline
+from Lang2Logic.generator import Generator
+from Lang2Logic.llm_scheduler import LLMScheduler
+from Lang2Logic.rate_limiter import AdaptiveConcurrency
+
+
+class ThrottledError(Exception):
+    status_code = 429
+    retry_after = 10
+
+
+class AlwaysThrottledChatModel(FakeListChatModel):
+
+    def _call(self, *args, **kwargs):
+        raise ThrottledError("rate limited")
+
+
+class TestDeadlineScope(unittest.TestCase):
+
+    def test_nested_scopes_only_shorten(self):
+        self.assertIsNone(get_deadline())
+        with deadline_scope(1.0) as outer:
+            with deadline_scope(10.0) as inner:
+                self.assertIs(inner, outer)
+            with deadline_scope(0.5) as inner:
+                self.assertLess(inner.remaining(), outer.remaining())
+            with deadline_scope(None) as inner:
+                self.assertIs(inner, outer)
+        self.assertIsNone(get_deadline())
+
+
+class TestGenerateTimeout(unittest.TestCase):
+
+    def make_generator(self, responses, delay, delays=(), **kwargs):
+        chat_model = SlowChatModel(responses=responses + ["unused"],
+                                   delay=delay,
+                                   delays=list(delays),
+                                   timeouts=[])
+        test_gen = Generator(None, chat_model=chat_model, **kwargs)
+        # Compile the response model up front so only the calls are timed
+        test_gen.prepare_batch_schema(list_schema)
+        return test_gen, chat_model
+
+    def test_model_gets_the_remaining_budget(self):
+        test_gen, chat_model = self.make_generator(['{"root": [1]}'], 0)
+        self.assertEqual(test_gen.generate("one", list_schema, timeout=5),
+                         [1])
+        self.assertTrue(0 < chat_model.timeouts[0] <= 5)
+        self.assertEqual(test_gen.generate("one", list_schema), [1])
+        self.assertIsNone(chat_model.timeouts[1])
+
+    def test_slow_call_raises_with_partial_result(self):
+        test_gen, chat_model = self.make_generator(['{"root": [1, 2'], 0.3)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            test_gen.generate("count", list_schema, timeout=0.1)
+        self.assertEqual(raised.exception.stage, "response generation")
+        self.assertEqual(raised.exception.partial, {"root": [1, 2]})
+
+    def test_llm_repair_is_skipped_without_time(self):
+        test_gen, chat_model = self.make_generator(['{"root": ["one"]}'],
+                                                   0.3)
+        with self.assertRaises(DeadlineExceeded) as raised:
+            test_gen.generate("one", list_schema, timeout=0.5)
+        self.assertEqual(raised.exception.stage, "response repair")
+        self.assertEqual(raised.exception.partial, {"root": ["one"]})
+        # The fixer never ran
+        self.assertEqual(chat_model.i, 1)
+
+    def test_fixer_gets_the_remaining_budget(self):
+        test_gen, chat_model = self.make_generator(
+            ['{"root": ["one"]}', '{"root": [1]}'], 0)
+        self.assertEqual(test_gen.generate("one", list_schema, timeout=5),
+                         [1])
+        self.assertEqual(len(chat_model.timeouts), 2)
+        self.assertTrue(0 < chat_model.timeouts[1] <= chat_model.timeouts[0])
+
+    def test_async_fixer_is_cancelled(self):
+        test_gen, chat_model = self.make_generator(
+            ['{"root": ["one"]}', '{"root": [1]}'], 0, delays=[0.1, 2.0])
+
+        async def run():
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                await test_gen.agenerate("one", list_schema, timeout=0.6)
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(run()), 1.2)
+
+    def test_async_call_is_cancelled(self):
+        test_gen, chat_model = self.make_generator(['{"root": [1]}'], 1.0)
+
+        async def run():
+            start = time.monotonic()
+            with self.assertRaises(DeadlineExceeded):
+                await test_gen.agenerate("one", list_schema, timeout=0.2)
+            return time.monotonic() - start
+
+        self.assertLess(asyncio.run(run()), 0.8)
+
+    def test_scheduler_does_not_wait_past_the_deadline(self):
+        scheduler = LLMScheduler()
+        test_gen = Generator(
+            None,
+            chat_model=AlwaysThrottledChatModel(responses=["unused"]),
+            scheduler=scheduler)
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded) as raised:
+            test_gen.generate("one", list_schema, timeout=1)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(raised.exception.stage, "throttling backoff")
+
+    def test_concurrency_wait_is_bounded(self):
+        concurrency = AdaptiveConcurrency(initial=1, max_limit=1)
+        self.assertTrue(concurrency.acquire())
+        self.assertFalse(concurrency.acquire(timeout=0.05))
+        self.assertFalse(asyncio.run(concurrency.aacquire(timeout=0.05)))
+
+        scheduler = LLMScheduler(concurrency=concurrency)
+        test_gen = Generator(None,
+                             chat_model=SlowChatModel(responses=["unused"]),
+                             scheduler=scheduler)
+        start = time.monotonic()
+        with self.assertRaises(DeadlineExceeded) as raised:
+            test_gen.generate("one", list_schema, timeout=0.2)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(raised.exception.stage, "concurrency limit")
+
+        async def run():
+            with self.assertRaises(DeadlineExceeded):
+                await test_gen.agenerate("one", list_schema, timeout=0.2)
+
+        start = time.monotonic()
+        asyncio.run(run())
+        self.assertLess(time.monotonic() - start, 1)
+        concurrency.release()
+        self.assertEqual(concurrency.in_flight, 0)
+
+    def test_invalid_timeout(self):
+        test_gen, chat_model = self.make_generator([], 0)
+        with self.assertRaises(Exception):
+            test_gen.generate("one", list_schema, timeout=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.json_utils import extract_json_payload
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+class TestExtractJsonPayload(unittest.TestCase):
+
+    def test_plain_json(self):
+        self.assertEqual(extract_json_payload(' {"root": [1]} '), {"root": [1]})
+
+    def test_skips_prose_and_fences(self):
+        output = 'Sure! Here it is:\n```json\n{"root": [1, 2]}\n```\nThanks.'
+        self.assertEqual(extract_json_payload(output), {"root": [1, 2]})
+
+    def test_skips_unbalanced_braces_in_prose(self):
+        output = 'Use {curly braces} like this: {"root": [3]}'
+        self.assertEqual(extract_json_payload(output), {"root": [3]})
+
+    def test_no_payload(self):
+        with self.assertRaises(ValueError):
+            extract_json_payload("no json here")
+
+
+class TestFastParse(unittest.TestCase):
+
+    def make_generator(self, responses):
+        chat_model = FakeListChatModel(responses=responses)
+        # The list schema would otherwise be answered by the lean path
+        return Generator(None, chat_model=chat_model,
+                         lean_path=False), chat_model
+
+    def test_valid_output_skips_langchain_parsers(self):
+        test_gen, chat_model = self.make_generator(
+            ['Here you go:\n```json\n{"root": [1, 2, 3]}\n```', "unused"])
+        self.assertEqual(test_gen.generate("count to three", list_schema),
+                         [1, 2, 3])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["fast_path_hits"], 1)
+        self.assertEqual(metrics["fast_path_misses"], 0)
+        self.assertEqual(chat_model.i, 1)
+
+    def test_invalid_output_falls_back_to_fixer(self):
+        test_gen, chat_model = self.make_generator(
+            ["I can count to two.", '{"root": [1, 2]}'])
+        self.assertEqual(test_gen.generate("count to two", list_schema),
+                         [1, 2])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["fast_path_hits"], 0)
+        self.assertEqual(metrics["fast_path_misses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.schema_cache import SchemaCache
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+def combined_output(response):
+    return "```json\n" + json.dumps({
+        "schema": list_schema,
+        "response": response
+    }) + "\n```"
+
+
+class TestCombinedGeneration(unittest.TestCase):
+
+    def make_generator(self, responses, **kwargs):
+        chat_model = FakeListChatModel(responses=responses + ["unused"])
+        return Generator(None, chat_model=chat_model, **kwargs), chat_model
+
+    def test_schema_and_response_in_one_call(self):
+        test_gen, chat_model = self.make_generator([combined_output([1, 2])],
+                                                   schema_cache=SchemaCache())
+        self.assertEqual(test_gen.generate("count to two", combined=True),
+                         [1, 2])
+        self.assertEqual(chat_model.i, 1)
+        self.assertEqual(test_gen.combined_generator.metrics.get("successes"),
+                         1)
+        # The schema is cached like one from the two-step flow
+        self.assertEqual(test_gen.generate_schema("count to two").to_dict(),
+                         list_schema)
+
+    def test_invalid_answer_reuses_the_schema(self):
+        test_gen, chat_model = self.make_generator(
+            [combined_output(["one"]), '{"root": [1]}'])
+        self.assertEqual(test_gen.generate("return one", combined=True), [1])
+        self.assertEqual(chat_model.i, 2)
+        self.assertEqual(
+            test_gen.combined_generator.metrics.get("invalid_responses"), 1)
+
+    def test_invalid_schema_falls_back_to_two_steps(self):
+        test_gen, chat_model = self.make_generator(
+            ["I cannot do that", json.dumps(list_schema), '{"root": [3]}'])
+        self.assertEqual(test_gen.generate("return three", combined=True),
+                         [3])
+        self.assertEqual(chat_model.i, 3)
+        self.assertEqual(
+            test_gen.combined_generator.metrics.get("invalid_schemas"), 1)
+
+    def test_async_combined_generation(self):
+        test_gen, chat_model = self.make_generator([combined_output([5])])
+        self.assertEqual(
+            asyncio.run(test_gen.agenerate("return five", combined=True)),
+            [5])
+        self.assertEqual(chat_model.i, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import re
+import threading
+import time
+import unittest
+from typing import Any
+from langchain_community.chat_models.fake import SimpleChatModel
+
+#custom imports
+from Lang2Logic.batch import BatchResult
+from Lang2Logic.generator import Generator
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+class CountingChatModel(SimpleChatModel):
+    """Answers with the number found in the prompt and tracks concurrency."""
+    delay: float = 0.05
+    active: int = 0
+    peak: int = 0
+    lock: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "counting"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            text = messages[-1].content
+            if "fail" in text:
+                raise RuntimeError("provider error")
+            number = re.findall(r"number (\d+)", text)[-1]
+            return f'{{"root": [{number}]}}'
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestGenerateMany(unittest.TestCase):
+
+    def setUp(self):
+        self.chat_model = CountingChatModel()
+        self.test_gen = Generator(None, chat_model=self.chat_model)
+
+    def test_results_keep_input_order(self):
+        prompts = [f"return the number {n}" for n in range(8)]
+        results = self.test_gen.generate_many(prompts,
+                                              list_schema,
+                                              max_concurrency=4)
+        self.assertEqual([result.value for result in results],
+                         [[n] for n in range(8)])
+        self.assertGreater(self.chat_model.peak, 1)
+        self.assertLessEqual(self.chat_model.peak, 4)
+
+    def test_failure_does_not_abort_batch(self):
+        prompts = ["return the number 1", "fail please", "return the number 3"]
+        results = self.test_gen.generate_many(prompts, list_schema)
+        self.assertEqual([result.ok for result in results],
+                         [True, False, True])
+        self.assertIsInstance(results[1], BatchResult)
+        with self.assertRaises(Exception):
+            results[1].unwrap()
+
+    def test_agenerate_many(self):
+        prompts = [f"return the number {n}" for n in range(5)]
+        results = asyncio.run(
+            self.test_gen.agenerate_many(prompts,
+                                         list_schema,
+                                         max_concurrency=2))
+        self.assertEqual([result.value for result in results],
+                         [[n] for n in range(5)])
+
+
+if __name__ == '__main__':
+    unittest.main()
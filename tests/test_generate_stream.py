@@ -0,0 +1,209 @@
+import unittest
+from typing import List
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.incremental_json import (IncrementalJSONParser,
+                                         PartialSchemaChecker, StreamDiverged)
+from Lang2Logic.response_schema import ResponseSchema
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+object_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string"
+        },
+        "tags": {
+            "type": "array",
+            "items": {
+                "type": "string"
+            }
+        }
+    },
+    "required": ["name", "tags"]
+}
+
+
+class TestIncrementalJSONParser(unittest.TestCase):
+
+    def test_values_are_reported_as_they_close(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('Sure:\n```json\n{"root": [1'), [])
+        self.assertEqual(parser.feed(', "a,]'), [(("root", 0), 1)])
+        self.assertEqual(parser.feed('", {"b": [2]}'), [(("root", 1), "a,]"),
+                                                        (("root", 2), {
+                                                            "b": [2]
+                                                        })])
+        events = parser.feed(']}\n``` trailing {')
+        self.assertEqual([path for path, _ in events], [("root", ), ()])
+        self.assertTrue(parser.done)
+
+    def test_scalars_wait_for_a_delimiter(self):
+        parser = IncrementalJSONParser()
+        self.assertEqual(parser.feed('[12'), [])
+        self.assertEqual(parser.feed('3, tr'), [((0, ), 123)])
+        self.assertEqual(parser.feed('ue]'), [((1, ), True), ((), [123, True])])
+
+    def test_malformed_input_stops_events(self):
+        parser = IncrementalJSONParser()
+        parser.feed('{"a": 1]')
+        self.assertTrue(parser.failed)
+        self.assertEqual(parser.feed('}'), [])
+
+
+class TestPartialSchemaChecker(unittest.TestCase):
+
+    def make_parser(self, schema):
+        checker = PartialSchemaChecker(schema,
+                                       ResponseSchema(schema).validator)
+        return IncrementalJSONParser(checker=checker)
+
+    def test_wrong_type_is_caught_when_the_value_starts(self):
+        parser = self.make_parser(object_schema)
+        parser.feed('{"name": 4')
+        self.assertIsNotNone(parser.violation)
+        self.assertEqual(parser.violation.path, ("name", ))
+
+    def test_enum_prefix(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "color": {
+                    "enum": ["red", "green"]
+                }
+            }
+        }
+        parser = self.make_parser(schema)
+        parser.feed('{"color": "gr')
+        self.assertIsNone(parser.violation)
+        parser.feed('ay')
+        self.assertIsNotNone(parser.violation)
+
+    def test_unknown_property_with_additional_properties_false(self):
+        schema = dict(object_schema, additionalProperties=False)
+        parser = self.make_parser(schema)
+        parser.feed('{"name": "Ada", "age"')
+        self.assertEqual(parser.violation.path, ("age", ))
+
+    def test_brackets_in_prose_are_skipped(self):
+        parser = self.make_parser(object_schema)
+        events = parser.feed('[Answer] As noted in [1], here it is: {"name": "Ada"')
+        self.assertIsNone(parser.violation)
+        self.assertFalse(parser.failed)
+        self.assertEqual(events, [(("name", ), "Ada")])
+
+    def test_violation_is_definite_at_a_line_start(self):
+        parser = self.make_parser(object_schema)
+        parser.feed('Here you go: {"name": 4} ')
+        self.assertIsNone(parser.violation)
+        parser.feed('\n```json\n{"name": 4')
+        self.assertEqual(parser.violation.path, ("name", ))
+
+    def test_bare_array_is_checked_against_the_wrapped_root(self):
+        wrapped = {
+            "type": "object",
+            "properties": {
+                "root": list_schema
+            },
+            "required": ["root"]
+        }
+        parser = self.make_parser(wrapped)
+        parser.feed('[1, 2.5,')
+        self.assertEqual(parser.violation.path, (1, ))
+
+
+class RecordingChatModel(FakeListChatModel):
+    """Records how much of the completion has been streamed so far."""
+    consumed: List[str] = []
+
+    def _stream(self, *args, **kwargs):
+        for chunk in super()._stream(*args, **kwargs):
+            self.consumed.append(chunk.message.content)
+            yield chunk
+
+
+class TestGenerateStream(unittest.TestCase):
+
+    def make_generator(self, responses):
+        chat_model = FakeListChatModel(responses=responses)
+        return Generator(None, chat_model=chat_model)
+
+    def test_items_are_yielded_before_the_completion_ends(self):
+        output = '{"root": [1, 2, 3]}'
+        chat_model = RecordingChatModel(responses=[output])
+        test_gen = Generator(None, chat_model=chat_model)
+        stream = test_gen.generate_stream("count to three", list_schema)
+        self.assertEqual(next(stream), 1)
+        self.assertLess(len("".join(chat_model.consumed)), len(output))
+        self.assertEqual(list(stream), [2, 3])
+
+    def test_object_properties_are_yielded_as_pairs(self):
+        test_gen = self.make_generator(
+            ['{"name": "Ada", "tags": ["math", "code"]}'])
+        self.assertEqual(
+            list(test_gen.generate_stream("describe Ada", object_schema)),
+            [("name", "Ada"), ("tags", ["math", "code"])])
+
+    def test_invalid_items_fall_back_to_the_full_parse(self):
+        test_gen = self.make_generator(
+            ['[1, 2, "three"]', '{"root": [1, 2, 3]}'])
+        self.assertEqual(
+            list(test_gen.generate_stream("count to three", list_schema)),
+            [1, 2, 3])
+
+    def test_schema_violation_aborts_the_stream(self):
+        output = '{"root": [1, "two", 3, 4, 5, 6, 7, 8, 9, 10]}'
+        chat_model = RecordingChatModel(responses=[output, '{"root": [1, 2, 3]}'])
+        test_gen = Generator(None, chat_model=chat_model)
+        self.assertEqual(
+            list(test_gen.generate_stream("count to three", list_schema)),
+            [1, 2, 3])
+        self.assertLess(len("".join(chat_model.consumed)), len(output))
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["stream_aborts"], 1)
+        self.assertEqual(metrics["llm_fixes"], 0)
+
+    def test_bracket_in_prose_does_not_abort_the_stream(self):
+        test_gen = self.make_generator(
+            ['See [1]: {"name": "Ada", "tags": ["math"]}', "unused"])
+        self.assertEqual(
+            list(test_gen.generate_stream("describe Ada", object_schema)),
+            [("name", "Ada"), ("tags", ["math"])])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["stream_aborts"], 0)
+        self.assertEqual(metrics["llm_fixes"], 0)
+
+    def test_retry_with_a_different_prefix_is_not_spliced(self):
+        test_gen = self.make_generator(
+            ['{"root": [5, 6, "x"]}', '{"root": [1, 2, 3, 4]}'])
+        stream = test_gen.generate_stream("count to four", list_schema)
+        streamed = []
+        with self.assertRaises(StreamDiverged) as raised:
+            for item in stream:
+                streamed.append(item)
+        self.assertEqual(streamed, [5, 6])
+        self.assertEqual(raised.exception.partial, [5, 6])
+        self.assertEqual(raised.exception.response, [1, 2, 3, 4])
+
+    def test_retried_object_is_not_mixed_with_streamed_keys(self):
+        test_gen = self.make_generator([
+            '{"name": "Ada", "tags": [1]}',
+            '{"name": "Bob", "tags": ["art"]}'
+        ])
+        with self.assertRaises(StreamDiverged) as raised:
+            list(test_gen.generate_stream("describe someone", object_schema))
+        self.assertEqual(raised.exception.partial, [("name", "Ada")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from fakes import SlowChatModel, list_schema
+from Lang2Logic.generator import Generator
+from Lang2Logic.hedging import HedgeBudget, HedgePolicy, LatencyTracker
+
+
+def warmed_up_policy(**kwargs):
+    policy = HedgePolicy(min_samples=5, **kwargs)
+    for _ in range(5):
+        policy.tracker.record(0.01)
+    return policy
+
+
+class TestHedgingParts(unittest.TestCase):
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker(window=4)
+        self.assertIsNone(tracker.percentile(95))
+        for latency in [5.0, 1.0, 2.0, 3.0, 4.0]:
+            tracker.record(latency)
+        self.assertEqual(len(tracker), 4)
+        self.assertEqual(tracker.percentile(50), 2.0)
+        self.assertEqual(tracker.percentile(100), 4.0)
+
+    def test_budget_caps_extra_calls(self):
+        budget = HedgeBudget(ratio=0.5)
+        budget.record_call()
+        self.assertFalse(budget.try_spend())
+        budget.record_call()
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+    def test_no_hedging_while_warming_up(self):
+        policy = HedgePolicy(min_samples=2)
+        self.assertIsNone(policy.hedge_delay())
+        self.assertEqual(policy.call(lambda: 1), 1)
+        self.assertEqual(len(policy.tracker), 1)
+
+
+class TestHedgedGeneration(unittest.TestCase):
+
+    def make_generator(self, delays, policy):
+        chat_model = SlowChatModel(responses=['{"root": [1]}'], delays=delays)
+        return Generator(None, chat_model=chat_model, hedging=policy)
+
+    def test_slow_call_is_hedged(self):
+        policy = warmed_up_policy(budget_ratio=1.0)
+        test_gen = self.make_generator([1.0], policy)
+        start = time.monotonic()
+        self.assertEqual(test_gen.generate("return one", list_schema), [1])
+        self.assertLess(time.monotonic() - start, 0.9)
+        self.assertEqual(policy.metrics.snapshot(), {
+            "calls": 1,
+            "hedges": 1,
+            "hedge_wins": 1
+        })
+
+    def test_budget_stops_hedging(self):
+        policy = warmed_up_policy(budget_ratio=0.0)
+        test_gen = self.make_generator([0.2], policy)
+        self.assertEqual(test_gen.generate("return one", list_schema), [1])
+        self.assertEqual(policy.metrics.get("hedges"), 0)
+
+    def test_async_slow_call_is_hedged(self):
+        policy = warmed_up_policy(budget_ratio=1.0)
+        test_gen = self.make_generator([1.0], policy)
+        self.assertEqual(
+            asyncio.run(test_gen.agenerate("return one", list_schema)), [1])
+        self.assertEqual(policy.metrics.get("hedge_wins"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
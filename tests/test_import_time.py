@@ -0,0 +1,35 @@
+import importlib.util
+import os
+import unittest
+
+BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "benchmarks", "import_time.py")
+
+# Generous compared to the ~25 ms measured locally, so slow CI machines
+# only fail when heavy imports creep back in
+IMPORT_BUDGET_MS = 300
+
+
+def load_benchmark():
+    spec = importlib.util.spec_from_file_location("import_time", BENCHMARK)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_generator_import_is_lazy_and_within_budget(self):
+        benchmark = load_benchmark()
+        rows, loaded = benchmark.measure_import("Lang2Logic.generator")
+        self.assertEqual(loaded, [])
+        self.assertLess(benchmark.module_cost_ms(rows, "Lang2Logic.generator"),
+                        IMPORT_BUDGET_MS)
+
+    def test_response_schema_import_is_lazy(self):
+        _, loaded = load_benchmark().measure_import("Lang2Logic.response_schema")
+        self.assertEqual(loaded, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.json_repair import repair_json
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+wrapped_list_schema = {
+    "type": "object",
+    "properties": {
+        "root": list_schema
+    },
+    "required": ["root"]
+}
+
+
+class TestRepairJson(unittest.TestCase):
+
+    def test_fences_and_trailing_commas(self):
+        output = 'Here it is:\n```json\n{"root": [1, 2,],}\n```'
+        self.assertEqual(repair_json(output), {"root": [1, 2]})
+
+    def test_single_quotes_and_python_literals(self):
+        output = "{'name': 'it\\'s', 'done': True, note: None}"
+        self.assertEqual(repair_json(output), {
+            "name": "it's",
+            "done": True,
+            "note": None
+        })
+
+    def test_truncated_output(self):
+        self.assertEqual(repair_json('{"a": [1, 2'), {"a": [1, 2]})
+        self.assertEqual(repair_json('{"a": 1, "b": '), {"a": 1})
+        self.assertEqual(repair_json('{"a": "unfinish'), {"a": "unfinish"})
+
+    def test_bare_value_is_wrapped_in_root(self):
+        self.assertEqual(repair_json("Sure: [1, 2, 3]", wrapped_list_schema),
+                         {"root": [1, 2, 3]})
+
+    def test_rejects_documents_that_do_not_fit_the_schema(self):
+        with self.assertRaises(ValueError):
+            repair_json('["one", "two"]', wrapped_list_schema)
+        with self.assertRaises(ValueError):
+            repair_json("no json here")
+
+
+class TestGeneratorRepair(unittest.TestCase):
+
+    def make_generator(self, responses):
+        chat_model = FakeListChatModel(responses=responses)
+        return Generator(None, chat_model=chat_model)
+
+    def test_truncated_response_is_repaired_without_llm_fixer(self):
+        test_gen = self.make_generator(["[4, 5, 6,", '{"root": [0]}'])
+        self.assertEqual(test_gen.generate("count from four", list_schema),
+                         [4, 5, 6])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["local_repairs"], 1)
+        self.assertEqual(metrics["llm_fixes"], 0)
+
+    def test_type_errors_escalate_to_llm_fixer(self):
+        test_gen = self.make_generator(['{"root": ["one"]}', '{"root": [1]}'])
+        self.assertEqual(test_gen.generate("return one", list_schema), [1])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["local_repairs"], 0)
+        self.assertEqual(metrics["llm_fixes"], 1)
+
+    def test_schema_generation_is_repaired_locally(self):
+        test_gen = self.make_generator(
+            ["```json\n{'type': 'array', 'items': {'type': 'integer'},}\n```"])
+        schema = test_gen.generate_schema("return a list of numbers")
+        self.assertEqual(schema.to_dict()["type"], "array")
+        self.assertEqual(
+            test_gen.schema_generator.metrics.get("local_repairs"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.llm_scheduler import LLMScheduler, is_throttle_error
+from Lang2Logic.managed_chat_model import ManagedChatModel
+from Lang2Logic.rate_limiter import AdaptiveConcurrency, TokenBucket
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+class ThrottledError(Exception):
+    status_code = 429
+    retry_after = 0
+
+
+class ThrottlingChatModel(FakeListChatModel):
+    """Answers with 429 errors for the first `throttle` calls."""
+    throttle: int = 0
+    attempts: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.attempts += 1
+        if self.attempts <= self.throttle:
+            raise ThrottledError("rate limited")
+        return super()._call(*args, **kwargs)
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_token_bucket_reports_wait_and_refills(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, capacity=2, clock=clock)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 1.0)
+        clock.now = 3.0
+        self.assertAlmostEqual(bucket.available(), 2.0)
+        bucket.reserve(2)
+        bucket.refund(1)
+        self.assertAlmostEqual(bucket.available(), 1.0)
+
+    def test_adaptive_concurrency_is_aimd(self):
+        clock = FakeClock()
+        concurrency = AdaptiveConcurrency(initial=8, cooldown=1.0, clock=clock)
+        concurrency.on_throttle()
+        concurrency.on_throttle()
+        self.assertEqual(concurrency.limit, 4)
+        clock.now = 2.0
+        concurrency.on_throttle()
+        self.assertEqual(concurrency.limit, 2)
+        for _ in range(6):
+            concurrency.on_success()
+        self.assertEqual(concurrency.limit, 4)
+        self.assertTrue(concurrency.try_acquire())
+        self.assertEqual(concurrency.in_flight, 1)
+        concurrency.release()
+
+    def test_throttle_errors(self):
+        self.assertTrue(is_throttle_error(ThrottledError()))
+        self.assertTrue(is_throttle_error(TimeoutError()))
+        self.assertFalse(is_throttle_error(ValueError()))
+
+
+class TestLLMScheduler(unittest.TestCase):
+
+    def make_generator(self, responses, throttle, **kwargs):
+        chat_model = ThrottlingChatModel(responses=responses + ["unused"],
+                                         throttle=throttle)
+        scheduler = LLMScheduler(concurrency=AdaptiveConcurrency(initial=4),
+                                 **kwargs)
+        return Generator(None, chat_model=chat_model,
+                         scheduler=scheduler), chat_model, scheduler
+
+    def test_throttled_calls_are_retried(self):
+        test_gen, chat_model, scheduler = self.make_generator(
+            ['{"root": [1, 2]}'], throttle=2)
+        self.assertIsInstance(test_gen.chat_model, ManagedChatModel)
+        self.assertEqual(test_gen.generate("count to two", list_schema),
+                         [1, 2])
+        self.assertEqual(chat_model.attempts, 3)
+        self.assertEqual(scheduler.metrics.snapshot(), {
+            "calls": 1,
+            "throttled": 2,
+            "retries": 2,
+            "rate_limited": 0
+        })
+        self.assertEqual(scheduler.concurrency.limit, 2)
+
+    def test_gives_up_after_max_retries(self):
+        test_gen, chat_model, scheduler = self.make_generator(
+            ['{"root": [1]}'], throttle=5, max_retries=1)
+        with self.assertRaises(Exception):
+            test_gen.generate("return one", list_schema)
+        self.assertEqual(chat_model.attempts, 2)
+        self.assertEqual(scheduler.metrics.get("calls"), 0)
+
+    def test_async_calls_are_scheduled(self):
+        test_gen, chat_model, scheduler = self.make_generator(
+            ['{"root": [3]}'], throttle=1)
+        self.assertEqual(
+            asyncio.run(test_gen.agenerate("return three", list_schema)), [3])
+        self.assertEqual(scheduler.metrics.get("retries"), 1)
+        self.assertEqual(scheduler.concurrency.in_flight, 0)
+
+    def test_streams_are_scheduled(self):
+        test_gen, chat_model, scheduler = self.make_generator(
+            ['{"root": [4, 5]}'], throttle=0)
+        self.assertEqual(
+            list(test_gen.generate_stream("four and five", list_schema)),
+            [4, 5])
+        self.assertEqual(scheduler.metrics.get("calls"), 1)
+
+    def test_request_bucket_limits_the_rate(self):
+        scheduler = LLMScheduler(requests_per_minute=1)
+        self.assertEqual(scheduler.reserve(0), 0)
+        self.assertAlmostEqual(scheduler.reserve(0), 60, delta=1)
+        self.assertEqual(scheduler.metrics.get("rate_limited"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+import asyncio
+import datetime
+import json
+import re
+import threading
+import time
+import unittest
+from typing import Any
+from langchain_community.chat_models.fake import SimpleChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.map_reduce import SchemaReducer, TextChunker
+
+COLORS = ("red", "green", "blue", "yellow")
+
+report_schema = {
+    "type": "object",
+    "properties": {
+        "colors": {
+            "type": "array",
+            "items": {
+                "type": "string"
+            }
+        },
+        "mood": {
+            "type": "string",
+            "enum": ["calm", "angry"]
+        },
+        "finished": {
+            "type": "boolean"
+        }
+    }
+}
+
+
+class ChunkChatModel(SimpleChatModel):
+    """Reports the colors mentioned in the prompt and tracks concurrency."""
+    delay: float = 0.05
+    active: int = 0
+    peak: int = 0
+    lock: Any = None
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lock = threading.Lock()
+
+    @property
+    def _llm_type(self):
+        return "chunk"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+            text = messages[-1].content.split("answer for this part only:")[-1]
+            if "broken" in text:
+                raise RuntimeError("provider error")
+            colors = [word for word in re.findall(r"\w+", text)
+                      if word in COLORS]
+            return json.dumps({
+                "colors": colors,
+                "mood": "angry" if "shout" in text else "calm",
+                "finished": "The end" in text
+            })
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class VisitChatModel(SimpleChatModel):
+    """Reports visit dates and never fills the optional city."""
+
+    @property
+    def _llm_type(self):
+        return "visits"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        text = messages[-1].content.split("answer for this part only:")[-1]
+        days = re.findall(r"2024-01-\d\d", text)
+        return json.dumps({"first": "2024-01-01", "days": days})
+
+
+visit_schema = {
+    "type": "object",
+    "properties": {
+        "city": {
+            "type": "string"
+        },
+        "first": {
+            "type": "string",
+            "format": "date"
+        },
+        "days": {
+            "type": "array",
+            "items": {
+                "type": "string",
+                "format": "date"
+            },
+            "uniqueItems": True
+        }
+    }
+}
+
+
+def make_document(count):
+    return "\n\n".join(f"Paragraph {n} mentions {COLORS[n % len(COLORS)]}."
+                       for n in range(count))
+
+
+class TestTextChunker(unittest.TestCase):
+
+    def test_splits_on_paragraphs_within_limit(self):
+        document = make_document(20)
+        chunks = TextChunker(max_chars=100).split(document)
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= 100 for chunk in chunks))
+        self.assertTrue(all(chunk.endswith(".") for chunk in chunks))
+        self.assertEqual("\n\n".join(chunks), document)
+
+    def test_falls_back_to_sentences_and_words(self):
+        text = "One sentence here. " * 10
+        chunks = TextChunker(max_chars=50).split(text)
+        self.assertTrue(all(chunk.endswith("here.") for chunk in chunks))
+        words = TextChunker(max_chars=12).split("alpha beta gamma delta")
+        self.assertEqual(words, ["alpha beta", "gamma delta"])
+
+    def test_rejects_bad_limits(self):
+        with self.assertRaises(ValueError):
+            TextChunker(max_chars=0)
+        with self.assertRaises(ValueError):
+            TextChunker(max_chars=10, overlap=10)
+
+
+class TestSchemaReducer(unittest.TestCase):
+
+    def test_merges_by_schema(self):
+        reducer = SchemaReducer(report_schema)
+        merged = reducer.reduce([
+            {"colors": ["red"], "mood": "calm", "finished": False},
+            {"colors": ["blue"], "mood": "angry", "finished": False},
+            {"colors": [], "mood": "angry", "finished": True},
+        ])
+        self.assertEqual(merged, {
+            "colors": ["red", "blue"],
+            "mood": "angry",
+            "finished": False
+        })
+
+    def test_unique_items_and_refs(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "tags": {
+                    "$ref": "#/definitions/Tags"
+                }
+            },
+            "definitions": {
+                "Tags": {
+                    "type": "array",
+                    "items": {"type": "string"},
+                    "uniqueItems": True
+                }
+            }
+        }
+        merged = SchemaReducer(schema).reduce([{"tags": ["a", "b"]},
+                                               {"tags": ["b", "c"]}, None])
+        self.assertEqual(merged, {"tags": ["a", "b", "c"]})
+
+    def test_user_reducers(self):
+        total = SchemaReducer({"type": "integer"},
+                              lambda values, schema: sum(values))
+        self.assertEqual(total.reduce([1, 2, 3]), 6)
+        longest = SchemaReducer(report_schema, {
+            "mood": lambda values, schema: schema["enum"][0]
+        })
+        self.assertEqual(
+            longest.reduce([{"mood": "angry"}, {"mood": "angry"}]),
+            {"mood": "calm"})
+        with self.assertRaises(ValueError):
+            SchemaReducer(report_schema, "sum")
+
+
+class TestGenerateLong(unittest.TestCase):
+
+    def setUp(self):
+        self.chat_model = ChunkChatModel()
+        self.test_gen = Generator(None, chat_model=self.chat_model)
+
+    def test_chunks_run_in_parallel_and_merge(self):
+        document = make_document(12) + "\n\nshout. The end."
+        result = self.test_gen.generate_long("Which colors are mentioned?",
+                                             document,
+                                             report_schema,
+                                             max_chunk_chars=80,
+                                             max_concurrency=8)
+        expected = [COLORS[n % len(COLORS)] for n in range(12)]
+        self.assertEqual(result["colors"], expected)
+        self.assertFalse(result["finished"])
+        self.assertGreater(self.chat_model.peak, 1)
+
+    def test_short_document_is_one_call(self):
+        result = self.test_gen.generate_long("Which colors?",
+                                             "Only red here. The end.",
+                                             report_schema)
+        self.assertEqual(result, {
+            "colors": ["red"],
+            "mood": "calm",
+            "finished": True
+        })
+        self.assertEqual(self.chat_model.peak, 1)
+
+    def test_failed_chunk_raises(self):
+        document = make_document(4) + "\n\nThis part is broken."
+        with self.assertRaisesRegex(Exception, "provider error"):
+            self.test_gen.generate_long("Which colors?",
+                                        document,
+                                        report_schema,
+                                        max_chunk_chars=60)
+
+    def test_merged_answer_must_match_the_schema(self):
+        schema = dict(report_schema,
+                      properties=dict(report_schema["properties"],
+                                      colors={
+                                          "type": "array",
+                                          "items": {"type": "string"},
+                                          "maxItems": 2
+                                      }))
+        with self.assertRaisesRegex(Exception, "does not match its schema"):
+            self.test_gen.generate_long("Which colors?",
+                                        make_document(6),
+                                        schema,
+                                        max_chunk_chars=60)
+
+    def generate_visits(self, schema):
+        test_gen = Generator(None, chat_model=VisitChatModel())
+        document = "\n\n".join(f"Visited on 2024-01-0{n % 3 + 1}."
+                                 for n in range(6))
+        return test_gen.generate_long("When were the visits?",
+                                      document,
+                                      schema,
+                                      max_chunk_chars=40)
+
+    def test_unset_optional_property_merges_to_none(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string"},
+                "days": {"type": "array", "items": {"type": "string"}}
+            }
+        }
+        result = self.generate_visits(schema)
+        self.assertIsNone(result["city"])
+        self.assertEqual(len(result["days"]), 6)
+
+    def test_format_values_merge(self):
+        result = self.generate_visits(visit_schema)
+        self.assertEqual(result["first"], datetime.date(2024, 1, 1))
+        self.assertEqual(result["days"],
+                         [datetime.date(2024, 1, n) for n in (1, 2, 3)])
+
+    def test_agenerate_long(self):
+        result = asyncio.run(
+            self.test_gen.agenerate_long("Which colors?",
+                                         make_document(8),
+                                         report_schema,
+                                         max_chunk_chars=80,
+                                         max_concurrency=4))
+        self.assertEqual(result["colors"],
+                         [COLORS[n % len(COLORS)] for n in range(8)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,137 @@
+import asyncio
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+
+decision_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "decision": {
+            "type": "boolean"
+        }
+    },
+    "required": ["decision"]
+}
+
+
+def decisions(*values):
+    return "[" + ", ".join('{"decision": %s}' % value for value in values) + "]"
+
+
+def decision(value):
+    return {"decision": value}
+
+person_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string"
+        },
+        "outdoors": {
+            "type": "boolean"
+        }
+    },
+    "required": ["name", "outdoors"]
+}
+
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def make_generator(self, responses):
+        chat_model = FakeListChatModel(responses=responses + ["unused"])
+        return Generator(None, chat_model=chat_model), chat_model
+
+    def test_full_batch_is_one_call(self):
+        test_gen, chat_model = self.make_generator(
+            ["```json\n" + decisions("true", "false", "true") + "\n```"])
+        with test_gen.micro_batcher(decision_schema,
+                                    max_batch_size=3) as batcher:
+            futures = [
+                batcher.submit(f"Is bio {index} outdoorsy?")
+                for index in range(3)
+            ]
+            results = [future.result(timeout=5) for future in futures]
+        self.assertEqual(results,
+                         [decision(True),
+                          decision(False),
+                          decision(True)])
+        self.assertEqual(chat_model.i, 1)
+        self.assertEqual(batcher.metrics.snapshot(), {
+            "batches": 1,
+            "batched_items": 3,
+            "fallbacks": 0
+        })
+
+    def test_invalid_item_falls_back_to_a_single_request(self):
+        test_gen, chat_model = self.make_generator(
+            [decisions("true", '"maybe"'), '{"decision": false}'])
+        with test_gen.micro_batcher(decision_schema,
+                                    max_batch_size=2) as batcher:
+            first = batcher.submit("Enjoys mountaineering")
+            second = batcher.submit("Prefers video games")
+            self.assertEqual(first.result(timeout=5), decision(True))
+            self.assertEqual(second.result(timeout=5), decision(False))
+        self.assertEqual(chat_model.i, 2)
+        self.assertEqual(batcher.metrics.get("fallbacks"), 1)
+
+    def test_missing_answer_fails_the_whole_batch(self):
+        # Answers cannot be matched to prompts once one has been dropped
+        test_gen, chat_model = self.make_generator([
+            decisions("true", "false"), '{"decision": false}',
+            '{"decision": true}', '{"decision": false}'
+        ])
+        with test_gen.micro_batcher(decision_schema,
+                                    max_batch_size=3) as batcher:
+            futures = [
+                batcher.submit(f"Is bio {index} outdoorsy?")
+                for index in range(3)
+            ]
+            results = [future.result(timeout=5) for future in futures]
+        self.assertEqual(sorted(result["decision"] for result in results),
+                         [False, False, True])
+        self.assertEqual(chat_model.i, 4)
+        self.assertEqual(batcher.metrics.get("batched_items"), 0)
+        self.assertEqual(batcher.metrics.get("fallbacks"), 3)
+
+    def test_max_wait_sends_a_partial_batch(self):
+        test_gen, chat_model = self.make_generator([
+            '{"answers": [{"name": "Ada", "outdoors": true}, '
+            '{"name": "Alan", "outdoors": false}]}'
+        ])
+        batcher = test_gen.micro_batcher(person_schema,
+                                         max_batch_size=10,
+                                         max_wait=0.01)
+        first = batcher.submit("Ada likes hiking")
+        second = batcher.submit("Alan likes chess")
+        self.assertEqual(second.result(timeout=5), {
+            "name": "Alan",
+            "outdoors": False
+        })
+        self.assertEqual(first.result(timeout=5)["name"], "Ada")
+        batcher.close()
+        self.assertEqual(batcher.metrics.get("batches"), 1)
+
+    def test_async_generate(self):
+        test_gen, chat_model = self.make_generator([decisions("false", "true")])
+        batcher = test_gen.micro_batcher(decision_schema, max_batch_size=2)
+
+        async def run():
+            return await asyncio.gather(batcher.agenerate("Reads books"),
+                                        batcher.agenerate("Climbs rocks"))
+
+        self.assertEqual(asyncio.run(run()),
+                         [decision(False), decision(True)])
+        batcher.close()
+
+    def test_requires_a_schema(self):
+        test_gen, chat_model = self.make_generator([])
+        with self.assertRaises(Exception):
+            test_gen.micro_batcher(None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generate_response import ResponseGenerator
+from Lang2Logic.model_cache import CompiledResponseModel, ResponseModelCache
+from Lang2Logic.canonicalize import normal_fingerprint
+
+
+def make_schema(name):
+    return {
+        "type": "object",
+        "properties": {
+            name: {
+                "type": "string"
+            }
+        },
+        "required": [name]
+    }
+
+
+class TestResponseModelCache(unittest.TestCase):
+
+    def setUp(self):
+        self.builds = []
+
+    def build(self, fingerprint, wrapped_schema, stored=None):
+        self.builds.append(fingerprint)
+        return CompiledResponseModel(
+            fingerprint=fingerprint,
+            wrapped_schema=wrapped_schema,
+            model=None,
+            parser=None,
+            fixer=None,
+            retry_parser=None,
+            format_instructions="instructions")
+
+    def test_hits_and_misses(self):
+        cache = ResponseModelCache(max_size=4)
+        first = cache.get_or_create(make_schema("a"), self.build)
+        second = cache.get_or_create(make_schema("a"), self.build)
+        self.assertIs(first, second)
+        self.assertEqual(len(self.builds), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_key_ignores_dict_order(self):
+        reordered = {
+            "required": ["a"],
+            "properties": {
+                "a": {
+                    "type": "string"
+                }
+            },
+            "type": "object"
+        }
+        self.assertEqual(normal_fingerprint(make_schema("a")),
+                         normal_fingerprint(reordered))
+
+    def test_lru_eviction(self):
+        cache = ResponseModelCache(max_size=2)
+        cache.get_or_create(make_schema("a"), self.build)
+        cache.get_or_create(make_schema("b"), self.build)
+        cache.get_or_create(make_schema("a"), self.build)
+        cache.get_or_create(make_schema("c"), self.build)
+        self.assertIn(normal_fingerprint(make_schema("a")), cache)
+        self.assertNotIn(normal_fingerprint(make_schema("b")), cache)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_different_schemas_build_in_parallel(self):
+        cache = ResponseModelCache()
+        both_building = threading.Barrier(2, timeout=5)
+
+        def build(fingerprint, wrapped_schema, stored=None):
+            both_building.wait()
+            return self.build(fingerprint, wrapped_schema)
+
+        threads = [
+            threading.Thread(target=cache.get_or_create,
+                             args=(make_schema(name), build))
+            for name in "ab"
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertFalse(both_building.broken)
+        self.assertEqual(len(cache), 2)
+
+    def test_same_schema_builds_once(self):
+        cache = ResponseModelCache()
+        started = threading.Event()
+        release = threading.Event()
+
+        def build(fingerprint, wrapped_schema, stored=None):
+            started.set()
+            release.wait(5)
+            return self.build(fingerprint, wrapped_schema)
+
+        threads = [
+            threading.Thread(target=cache.get_or_create,
+                             args=(make_schema("a"), build))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        started.wait(5)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(cache.stats()["hits"], 3)
+
+
+class TestModelCacheDiskTier(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.schema = {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+                "child": {
+                    "type": "object",
+                    "properties": {"age": {"type": "integer", "minimum": 0}}
+                }
+            },
+            "required": ["name"]
+        }
+
+    def make_generator(self):
+        cache = ResponseModelCache(cache_dir=self.directory.name)
+        chat_model = FakeListChatModel(responses=["unused"])
+        return ResponseGenerator(None, chat_model, model_cache=cache)
+
+    def test_restarted_worker_imports_instead_of_compiling(self):
+        first = self.make_generator().get_compiled_model(self.schema)
+        self.assertEqual(len(os.listdir(self.directory.name)), 1)
+
+        restarted = self.make_generator()
+        with patch("Lang2Logic.generate_response.SchemaModelCompiler"
+                   ) as compiler:
+            loaded = restarted.get_compiled_model(self.schema)
+        compiler.assert_not_called()
+        self.assertEqual(restarted.model_cache.stats()["disk_hits"], 1)
+        self.assertEqual(loaded.format_instructions,
+                         first.format_instructions)
+        self.assertEqual(loaded.model.model_json_schema(),
+                         first.model.model_json_schema())
+        answer = {"name": "Ann", "child": {"age": 3}}
+        self.assertEqual(
+            loaded.model.model_validate(answer).model_dump(exclude_none=True),
+            first.model.model_validate(answer).model_dump(exclude_none=True))
+
+    def test_unusable_file_is_compiled_again(self):
+        self.make_generator().get_compiled_model(self.schema)
+        path = os.path.join(self.directory.name,
+                            os.listdir(self.directory.name)[0])
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        stored["model_source"] = "raise ImportError('stale')"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(stored, f)
+
+        restarted = self.make_generator()
+        compiled = restarted.get_compiled_model(self.schema)
+        self.assertEqual(restarted.model_cache.stats()["disk_hits"], 0)
+        self.assertIsNotNone(compiled.model.model_validate({"name": "Ann"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import re
+import unittest
+from langchain_community.chat_models.fake import SimpleChatModel
+
+#custom imports
+from Lang2Logic.data_manager import DataManagement
+from Lang2Logic.generator import Generator
+from Lang2Logic.request_context import RequestContext
+
+
+class SchemaPerPromptChatModel(SimpleChatModel):
+    """Infers a one-item schema from the prompt, then answers it."""
+
+    @property
+    def _llm_type(self):
+        return "schema-per-prompt"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        text = messages[-1].content
+        number = re.findall(r"number (\d+)", text)[0]
+        if "Draft-07" in text:
+            return ('{"type": "array", "items": {"type": "integer", '
+                    f'"enum": [{number}]}}}}')
+        return f'{{"root": [{number}]}}'
+
+    async def _acall(self, messages, stop=None, run_manager=None, **kwargs):
+        # Yield so concurrent requests interleave between the two stages
+        await asyncio.sleep(0.01)
+        return self._call(messages, stop, run_manager, **kwargs)
+
+
+class TestRequestContext(unittest.TestCase):
+
+    def test_contexts_are_independent(self):
+        first = RequestContext("first prompt")
+        second = RequestContext("second prompt")
+        self.assertEqual(first.get_prompt(), "first prompt")
+        self.assertEqual(second.get_prompt(), "second prompt")
+        self.assertIsNot(first, DataManagement())
+        first.add_try_response_generation()
+        self.assertEqual(
+            second.data["response_process"]["response_generation"]["tries"],
+            0)
+
+    def test_concurrent_requests_do_not_share_state(self):
+        test_gen = Generator(None, chat_model=SchemaPerPromptChatModel())
+        prompts = [f"return the number {n}" for n in range(10)]
+        results = test_gen.generate_many(prompts, max_concurrency=5)
+        self.assertEqual([result.value for result in results],
+                         [[n] for n in range(10)])
+
+    def test_concurrent_async_requests_do_not_share_state(self):
+        test_gen = Generator(None, chat_model=SchemaPerPromptChatModel())
+        prompts = [f"return the number {n}" for n in range(10)]
+        results = asyncio.run(
+            test_gen.agenerate_many(prompts, max_concurrency=10))
+        self.assertEqual([result.value for result in results],
+                         [[n] for n in range(10)])
+
+    def test_caller_supplied_context_records_the_request(self):
+        test_gen = Generator(None, chat_model=SchemaPerPromptChatModel())
+        context = RequestContext()
+        test_gen.generate("return the number 3", context=context)
+        self.assertEqual(context.get_prompt(), "return the number 3")
+        self.assertEqual(
+            context.data["response_process"]["response_generation"]
+            ["Response"], [3])
+
+    def test_requests_do_not_log_to_the_shared_data_manager(self):
+        shared = DataManagement()
+        shared.log_message("logs", "kept")
+        before = json.dumps(shared.data)
+        test_gen = Generator(None, chat_model=SchemaPerPromptChatModel())
+        context = RequestContext()
+        test_gen.generate("return the number 4", context=context)
+        test_gen.generate("return the number 5")
+        asyncio.run(test_gen.agenerate("return the number 6"))
+        self.assertEqual(json.dumps(shared.data), before)
+        # The model built for this request logged to its context
+        self.assertTrue(
+            any("Format instructions" in entry["message"]
+                for entry in context.data["logs"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+#custom imports
+from Lang2Logic.cache_backends import SQLiteCacheBackend
+from Lang2Logic.generator import Generator
+from Lang2Logic.response_cache import ResponseCache
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_key_includes_prompt_schema_and_model(self):
+        cache = ResponseCache()
+        cache.set("return 1-3", list_schema, "gpt-4", [1, 2, 3])
+        self.assertEqual(cache.get("return 1-3", list_schema, "gpt-4"),
+                         [1, 2, 3])
+        self.assertIsNone(cache.get("return 1-3", list_schema, "gpt-3.5"))
+        self.assertIsNone(cache.get("return 1-4", list_schema, "gpt-4"))
+
+    def test_results_are_copied(self):
+        cache = ResponseCache()
+        cache.set("prompt", list_schema, "gpt-4", [1, 2])
+        cache.get("prompt", list_schema, "gpt-4").append(3)
+        self.assertEqual(cache.get("prompt", list_schema, "gpt-4"), [1, 2])
+
+    def test_sqlite_backend_is_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "responses.sqlite3")
+            writer = SQLiteCacheBackend(path)
+            reader = SQLiteCacheBackend(path)
+            ResponseCache(writer).set("prompt", list_schema, "gpt-4", [1])
+            self.assertEqual(
+                ResponseCache(reader).get("prompt", list_schema, "gpt-4"),
+                [1])
+            writer.close()
+            reader.close()
+
+
+class TestGeneratorResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.test_gen = Generator("sk-test", response_cache=ResponseCache())
+
+    def test_hit_skips_response_generation(self):
+        with patch.object(self.test_gen.ResponseGenerator,
+                          "generate",
+                          return_value=[1, 2, 3]) as generate:
+            first = self.test_gen.generate("return 1-3", list_schema)
+            second = self.test_gen.generate("return 1-3", list_schema)
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first, second)
+        self.assertEqual(self.test_gen.response_cache.stats()["hits"], 1)
+
+    def test_per_call_bypass(self):
+        with patch.object(self.test_gen.ResponseGenerator,
+                          "generate",
+                          return_value=[1, 2, 3]) as generate:
+            self.test_gen.generate("return 1-3", list_schema)
+            self.test_gen.generate("return 1-3", list_schema, use_cache=False)
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(self.test_gen.response_cache.stats()["bypasses"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import copy
+import pickle
+import unittest
+from unittest.mock import patch
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.response_schema import (ResponseSchema, SchemaRegistry,
+                                        schema_registry)
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "string"
+    }
+}
+
+
+class TestResponseSchema(unittest.TestCase):
+
+    def test_equal_schemas_share_hash_and_validator(self):
+        first = ResponseSchema(list_schema)
+        second = ResponseSchema('{"type": "array", "items": {"type": "string"},'
+                                ' "$schema": "http://json-schema.org/draft-07/schema#"}')
+        self.assertEqual(first, second)
+        self.assertEqual(len({first, second}), 1)
+        self.assertEqual(first.fingerprint, second.fingerprint)
+        self.assertIs(first.validator, second.validator)
+        self.assertTrue(first.is_valid_instance(["a", "b"]))
+        self.assertFalse(first.is_valid_instance([1]))
+
+    def test_property_order_is_kept(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "reasoning": {"type": "string"},
+                "answer": {"type": "string"}
+            }
+        }
+        reordered = {"properties": schema["properties"], "type": "object"}
+        self.assertEqual(list(ResponseSchema(schema).to_dict()["properties"]),
+                         ["reasoning", "answer"])
+        self.assertEqual(list(ResponseSchema(reordered).to_dict()),
+                         ["properties", "type"])
+        self.assertEqual(ResponseSchema(schema), ResponseSchema(reordered))
+
+        chat_model = FakeListChatModel(
+            responses=['{"answer": "4", "reasoning": "2 + 2"}'])
+        test_gen = Generator(None, chat_model=chat_model, lean_path=False)
+        result = test_gen.generate("what is 2 + 2?", schema)
+        self.assertEqual(list(result), ["reasoning", "answer"])
+
+    def test_immutable(self):
+        source = copy.deepcopy(list_schema)
+        schema = ResponseSchema(source)
+        source["type"] = "object"
+        schema.to_dict()["type"] = "object"
+        schema.schema["items"]["type"] = "integer"
+        self.assertEqual(schema.to_dict(), list_schema)
+        with self.assertRaises(AttributeError):
+            schema.is_valid_schema = False
+        self.assertIs(ResponseSchema(schema), schema)
+
+    def test_validity_is_checked_once(self):
+        schema = {"type": "object", "properties": {"unique_check": {}}}
+        with patch("jsonschema.Draft7Validator.check_schema"
+                   ) as check_schema:
+            for _ in range(3):
+                self.assertTrue(ResponseSchema(schema).validate_schema())
+        self.assertEqual(check_schema.call_count, 1)
+
+    def test_invalid_schema(self):
+        schema = ResponseSchema({"type": "not-a-type"})
+        self.assertFalse(schema.is_valid_schema)
+        with self.assertRaises(ValueError):
+            schema.validator
+
+    def test_pickle_round_trip(self):
+        schema = ResponseSchema(list_schema)
+        self.assertEqual(pickle.loads(pickle.dumps(schema)), schema)
+        self.assertEqual(copy.deepcopy(schema), schema)
+
+    def test_registry_is_bounded(self):
+        registry = SchemaRegistry(max_size=2)
+        for index in range(3):
+            registry.is_valid(str(index), {"type": "string"})
+        self.assertEqual(list(registry._entries), ["1", "2"])
+        self.assertIsInstance(schema_registry, SchemaRegistry)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import json
+import os
+import pickle
+import re
+import tempfile
+import unittest
+from datetime import date
+from unittest.mock import patch
+
+#custom imports
+from Lang2Logic.cache_backends import MemoryCacheBackend, SQLiteCacheBackend
+from Lang2Logic.generator import Generator
+from Lang2Logic.schema_cache import SchemaCache
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "string"
+    }
+}
+
+
+class BackendTests:
+
+    def make_backend(self, **kwargs):
+        raise NotImplementedError
+
+    def test_set_get_delete(self):
+        backend = self.make_backend()
+        backend.set("a", {"value": 1})
+        self.assertEqual(backend.get("a"), {"value": 1})
+        self.assertTrue(backend.delete("a"))
+        self.assertIsNone(backend.get("a"))
+
+    def test_ttl_expiry(self):
+        backend = self.make_backend(default_ttl=10)
+        with patch("Lang2Logic.cache_backends.time.time", return_value=100):
+            backend.set("a", 1)
+        with patch("Lang2Logic.cache_backends.time.time", return_value=105):
+            self.assertEqual(backend.get("a"), 1)
+        with patch("Lang2Logic.cache_backends.time.time", return_value=111):
+            self.assertIsNone(backend.get("a"))
+
+    def test_size_eviction_keeps_pinned(self):
+        backend = self.make_backend(max_entries=2)
+        backend.set("pinned", 0, pinned=True)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        self.assertEqual(len(backend), 2)
+        self.assertEqual(backend.get("pinned"), 0)
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(backend.get("b"), 2)
+
+
+class TestMemoryCacheBackend(BackendTests, unittest.TestCase):
+
+    def make_backend(self, **kwargs):
+        return MemoryCacheBackend(**kwargs)
+
+
+class TestSQLiteCacheBackend(BackendTests, unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def make_backend(self, **kwargs):
+        backend = SQLiteCacheBackend(
+            os.path.join(self.directory.name, "cache.sqlite3"), **kwargs)
+        self.addCleanup(backend.close)
+        return backend
+
+    def test_values_are_stored_as_json(self):
+        backend = self.make_backend()
+        value = {"born": date(1815, 12, 10), "pattern": re.compile("a+")}
+        backend.set("a", value)
+        row = backend._connect().execute(
+            "SELECT value FROM cache WHERE key = 'a'").fetchone()
+        self.assertIsInstance(json.loads(row[0]), dict)
+        self.assertEqual(backend.get("a"), value)
+
+    def test_pickled_values_are_never_loaded(self):
+        backend = self.make_backend()
+        with backend._connect() as connection:
+            connection.execute(
+                "INSERT INTO cache VALUES ('a', ?, NULL, 0, 0)",
+                (pickle.dumps({"value": 1}), ))
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(len(backend), 0)
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def test_key_normalizes_whitespace_and_tracks_instructions(self):
+        cache = SchemaCache()
+        cache.set("return  a list\nof colors", "v1", list_schema)
+        self.assertEqual(cache.get("return a list of colors", "v1"),
+                         list_schema)
+        self.assertIsNone(cache.get("return a list of colors", "v2"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertTrue(cache.invalidate("return a list of colors", "v1"))
+        self.assertIsNone(cache.get("return a list of colors", "v1"))
+
+    def test_generator_skips_schema_generation_on_hit(self):
+        test_gen = Generator("sk-test", schema_cache=SchemaCache())
+        with patch.object(test_gen.schema_generator,
+                          "generate_draft_7",
+                          side_effect=lambda context: context.
+                          set_draft_7_schema(list_schema)) as generate:
+            first = test_gen.generate_schema("return a list of colors")
+            second = test_gen.generate_schema("return a list of colors")
+        self.assertEqual(generate.call_count, 1)
+        self.assertEqual(first.to_dict(), second.to_dict())
+
+    def test_pinned_schema_is_used(self):
+        test_gen = Generator("sk-test", schema_cache=SchemaCache())
+        test_gen.pin_schema("return a list of colors", list_schema)
+        with patch.object(test_gen.schema_generator,
+                          "generate_draft_7") as generate:
+            schema = test_gen.generate_schema("return a list of colors")
+        generate.assert_not_called()
+        self.assertEqual(schema.to_dict(), list_schema)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import json
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.schema_compaction import (compact_schema, compact_schema_json,
+                                          schema_compactor)
+
+address = {
+    "type": "object",
+    "properties": {
+        "street": {
+            "type": "string"
+        },
+        "city": {
+            "type": "string"
+        }
+    }
+}
+
+
+class TestSchemaCompactor(unittest.TestCase):
+
+    def test_strips_annotations_but_not_property_names(self):
+        schema = {
+            "title": "Book",
+            "$comment": "internal",
+            "type": "object",
+            "properties": {
+                "title": {
+                    "title": "Title",
+                    "type": "string",
+                    "default": None
+                }
+            }
+        }
+        self.assertEqual(compact_schema(schema), {
+            "type": "object",
+            "properties": {
+                "title": {
+                    "type": "string"
+                }
+            }
+        })
+
+    def test_inlines_single_use_definitions(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "home": {
+                    "$ref": "#/$defs/Address"
+                }
+            },
+            "$defs": {
+                "Address": address
+            }
+        }
+        self.assertEqual(compact_schema(schema), {
+            "type": "object",
+            "properties": {
+                "home": address
+            }
+        })
+
+    def test_keeps_recursive_definitions(self):
+        node = {
+            "type": "object",
+            "properties": {
+                "children": {
+                    "type": "array",
+                    "items": {
+                        "$ref": "#/definitions/Node"
+                    }
+                }
+            }
+        }
+        schema = {"$ref": "#/definitions/Node", "definitions": {"Node": node}}
+        self.assertEqual(compact_schema(schema), schema)
+
+    def test_collapses_single_all_of(self):
+        schema = {
+            "description": "Where to ship",
+            "allOf": [{
+                "$ref": "#/$defs/Address"
+            }],
+            "$defs": {
+                "Address": address
+            }
+        }
+        self.assertEqual(compact_schema(schema),
+                         dict(address, description="Where to ship"))
+
+    def test_report_counts_fewer_tokens(self):
+        schema = {
+            "title": "Shipment",
+            "type": "object",
+            "properties": {
+                "home": {
+                    "$ref": "#/$defs/Address"
+                }
+            },
+            "$defs": {
+                "Address": dict(address, title="Address")
+            }
+        }
+        report = schema_compactor.report(schema)
+        self.assertLess(report.after_tokens, report.before_tokens)
+        self.assertEqual(report.after_chars, len(compact_schema_json(schema)))
+
+
+class TestCompactPrompts(unittest.TestCase):
+
+    def test_response_prompt_uses_compacted_schema(self):
+        schema = {
+            "type": "object",
+            "properties": {
+                "home": address,
+                "work": address
+            }
+        }
+        chat_model = FakeListChatModel(responses=["unused"])
+        test_gen = Generator(None, chat_model=chat_model, lean_path=False)
+        compiled = test_gen.ResponseGenerator.get_compiled_model(schema)
+        self.assertIsNotNone(compiled.compaction)
+        self.assertLess(compiled.compaction.after_tokens,
+                        compiled.compaction.before_tokens)
+        embedded = compiled.format_instructions.split("output schema:")[1]
+        self.assertNotIn('"title"', embedded)
+        self.assertNotIn(": ", embedded)
+
+    def test_lean_prompt_uses_compacted_schema(self):
+        schema = {"title": "Colors", "type": "array", "items": {"type": "string"}}
+        chat_model = FakeListChatModel(responses=['["red"]', "unused"])
+        test_gen = Generator(None, chat_model=chat_model)
+        self.assertEqual(test_gen.generate("one color", schema), ["red"])
+        plan = test_gen.ResponseGenerator.get_lean_plan(schema)
+        self.assertEqual(json.loads(plan.schema_json),
+                         {"type": "array", "items": {"type": "string"}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+from pydantic import BaseModel, ValidationError
+
+#custom imports
+from Lang2Logic.schema_compiler import compile_schema_to_model
+
+wrapped_list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "root": {
+            "type": "array",
+            "properties": None,
+            "items": {
+                "type": "integer"
+            }
+        }
+    },
+    "required": ["root"]
+}
+
+ref_schema = {
+    "type": "object",
+    "definitions": {
+        "Address": {
+            "type": "object",
+            "properties": {
+                "city": {"type": "string"},
+                "country": {"type": "string"}
+            },
+            "required": ["city"]
+        },
+        "Node": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "children": {
+                    "type": "array",
+                    "items": {"$ref": "#/definitions/Node"}
+                }
+            },
+            "required": ["name"]
+        }
+    },
+    "properties": {
+        "home": {"$ref": "#/definitions/Address"},
+        "work": {"$ref": "#/definitions/Address"},
+        "tree": {"$ref": "#/definitions/Node"},
+        "color": {"type": "string", "enum": ["red", "green"]}
+    },
+    "required": ["home"]
+}
+
+
+class TestSchemaModelCompiler(unittest.TestCase):
+
+    def test_wrapped_root_array(self):
+        model = compile_schema_to_model(wrapped_list_schema)
+        self.assertTrue(issubclass(model, BaseModel))
+        parsed = model.model_validate({"root": [1, 2, 3]})
+        self.assertEqual(parsed.model_dump(), {"root": [1, 2, 3]})
+        with self.assertRaises(ValidationError):
+            model.model_validate({})
+
+    def test_refs_are_shared_and_recursive(self):
+        model = compile_schema_to_model(ref_schema)
+        fields = model.model_fields
+        self.assertIs(fields["home"].annotation,
+                      fields["work"].annotation.__args__[0])
+        parsed = model.model_validate({
+            "home": {"city": "Paris"},
+            "tree": {"name": "a", "children": [{"name": "b"}]}
+        })
+        self.assertEqual(parsed.tree.children[0].name, "b")
+
+    def test_enum_rejects_unknown_value(self):
+        model = compile_schema_to_model(ref_schema)
+        with self.assertRaises(ValidationError):
+            model.model_validate({"home": {"city": "Paris"}, "color": "blue"})
+
+    def test_invalid_property_names_use_aliases(self):
+        model = compile_schema_to_model({
+            "type": "object",
+            "properties": {
+                "schema": {"type": "string"},
+                "first-name": {"type": "string"}
+            }
+        })
+        parsed = model.model_validate({"schema": "a", "first-name": "b"})
+        self.assertEqual(parsed.model_dump(by_alias=True), {
+            "schema": "a",
+            "first-name": "b"
+        })
+
+    def test_non_object_root_is_rejected(self):
+        with self.assertRaises(ValueError):
+            compile_schema_to_model({"type": "array", "items": {}})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import patch
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.response_schema import ResponseSchema
+from Lang2Logic.schema_inference import infer_schema
+
+users = [{
+    "name": "Ada",
+    "age": 36,
+    "plan": "pro",
+    "tags": ["math", "code"]
+}, {
+    "name": "Alan",
+    "age": 41.5,
+    "plan": "free",
+    "tags": ["code"],
+    "email": None
+}, {
+    "name": "Grace",
+    "age": 85,
+    "plan": "pro",
+    "tags": ["navy", "code", "cobol"],
+    "email": "grace@example.com"
+}]
+
+
+class TestSchemaInference(unittest.TestCase):
+
+    def test_merges_objects_across_examples(self):
+        schema = infer_schema(*users)
+        self.assertEqual(schema["$schema"],
+                         "http://json-schema.org/draft-07/schema#")
+        self.assertEqual(schema["type"], "object")
+        self.assertEqual(schema["required"], ["name", "age", "plan", "tags"])
+        properties = schema["properties"]
+        self.assertEqual(properties["age"], {"type": "number"})
+        self.assertEqual(properties["plan"], {
+            "type": "string",
+            "enum": ["pro", "free"]
+        })
+        self.assertEqual(properties["name"], {"type": "string"})
+        self.assertEqual(properties["email"], {"type": ["null", "string"]})
+        self.assertEqual(properties["tags"], {
+            "type": "array",
+            "items": {
+                "type": "string"
+            },
+            "minItems": 1
+        })
+
+    def test_options(self):
+        schema = infer_schema(["a", "b", "a"], [],
+                              enum_max_values=1,
+                              array_bounds=False)
+        self.assertEqual(schema["items"], {"type": "string"})
+        self.assertNotIn("maxItems", schema)
+        bounded = infer_schema(["a"], ["b", "c"], max_items=True)
+        self.assertEqual((bounded["minItems"], bounded["maxItems"]), (1, 2))
+
+    def test_rejects_non_json_values(self):
+        with self.assertRaises(TypeError):
+            infer_schema({"when": object()})
+        with self.assertRaises(ValueError):
+            infer_schema()
+
+    def test_response_schema_infer_from_examples(self):
+        schema = ResponseSchema.infer_from_examples(*users)
+        self.assertTrue(schema.is_valid_schema)
+        for user in users:
+            self.assertTrue(schema.is_valid_instance(user))
+        self.assertFalse(schema.is_valid_instance({"name": "Bob"}))
+
+    def test_generate_schema_uses_examples(self):
+        test_gen = Generator(None,
+                             chat_model=FakeListChatModel(responses=["{}"]))
+        with patch.object(test_gen.schema_generator,
+                          "generate_draft_7") as generate:
+            schema = test_gen.generate_schema("describe a user",
+                                              examples=users)
+        generate.assert_not_called()
+        self.assertEqual(schema, ResponseSchema.infer_from_examples(*users))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+import unittest
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.generator import Generator
+from Lang2Logic.schema_shapes import (COMPLEX, ENUM, FLAT_OBJECT, LIST,
+                                      SCALAR, LeanResponsePlan,
+                                      classify_schema)
+
+DRAFT_7 = "http://json-schema.org/draft-07/schema#"
+
+color_schema = {"$schema": DRAFT_7, "type": "string", "enum": ["red", "green"]}
+count_schema = {"$schema": DRAFT_7, "type": "integer"}
+city_schema = {"$schema": DRAFT_7, "type": "string"}
+number_list_schema = {
+    "$schema": DRAFT_7,
+    "type": "array",
+    "items": {
+        "type": "number"
+    }
+}
+person_schema = {
+    "$schema": DRAFT_7,
+    "type": "object",
+    "properties": {
+        "name": {
+            "type": "string"
+        },
+        "age": {
+            "type": "integer"
+        },
+        "born": {
+            "type": "string",
+            "format": "date"
+        }
+    },
+    "required": ["name"]
+}
+nested_schema = {
+    "$schema": DRAFT_7,
+    "type": "object",
+    "properties": {
+        "person": person_schema
+    }
+}
+
+
+class TestClassifySchema(unittest.TestCase):
+
+    def test_shapes(self):
+        self.assertEqual(classify_schema(count_schema), SCALAR)
+        self.assertEqual(classify_schema(color_schema), ENUM)
+        self.assertEqual(classify_schema(number_list_schema), LIST)
+        self.assertEqual(classify_schema(person_schema), FLAT_OBJECT)
+        self.assertEqual(classify_schema(nested_schema), COMPLEX)
+        self.assertIsNone(LeanResponsePlan.for_schema(nested_schema))
+
+
+class TestLeanResponsePlan(unittest.TestCase):
+
+    def test_literal_answers(self):
+        plan = LeanResponsePlan.for_schema(color_schema)
+        self.assertEqual(plan.parse("Green."), "green")
+        self.assertEqual(plan.parse('{"root": "red"}'), "red")
+        self.assertEqual(LeanResponsePlan.for_schema(count_schema).parse("4"),
+                         4)
+        with self.assertRaises(ValueError):
+            plan.parse("blue")
+
+    def test_trailing_period_is_only_a_fallback(self):
+        plan = LeanResponsePlan.for_schema(city_schema)
+        self.assertEqual(plan.parse("U.S.A."), "U.S.A.")
+        self.assertEqual(plan.parse("etc."), "etc.")
+        count = LeanResponsePlan.for_schema(count_schema)
+        self.assertEqual(count.parse("4."), 4)
+        self.assertIsInstance(count.parse("4."), int)
+
+    def test_only_the_root_wrapper_is_unwrapped(self):
+        plan = LeanResponsePlan.for_schema(city_schema)
+        self.assertEqual(plan.parse('{"root": "Paris"}'), "Paris")
+        for output in ('{"reason": "unknown"}', '{"error": "no answer"}'):
+            with self.assertRaises(ValueError):
+                plan.parse(output)
+
+    def test_flat_object_matches_model_dump(self):
+        plan = LeanResponsePlan.for_schema(person_schema)
+        self.assertEqual(plan.parse('{"extra": 1, "name": "Ada"}'), {
+            "name": "Ada",
+            "age": None,
+            "born": None
+        })
+
+
+class TestLeanPath(unittest.TestCase):
+
+    def generate(self, schema, output, lean_path=True, fixes=()):
+        chat_model = FakeListChatModel(
+            responses=[output, *fixes, "unused"])
+        test_gen = Generator(None, chat_model=chat_model, lean_path=lean_path)
+        return test_gen.generate("query", schema), test_gen
+
+    def test_same_result_as_model_path(self):
+        cases = [
+            (person_schema, '{"name": "Ada", "born": "1815-12-10"}', ()),
+            (number_list_schema, '{"root": [1, 2.5]}', ()),
+            (color_schema, '{"root": "red"}', ()),
+            (count_schema, '{"root": 4}', ()),
+            (city_schema, '"Paris"', ()),
+            # Prose is not an answer, the fixer's reply is used on both paths
+            (city_schema, "Sure! The answer is Paris.", ('{"root": "Paris"}', )),
+        ]
+        for schema, output, fixes in cases:
+            lean, test_gen = self.generate(schema, output, fixes=fixes)
+            self.assertEqual(
+                test_gen.ResponseGenerator.metrics.get("lean_hits"),
+                0 if fixes else 1)
+            full, _ = self.generate(schema,
+                                    output,
+                                    lean_path=False,
+                                    fixes=fixes)
+            self.assertEqual(lean, full)
+
+    def test_miss_falls_back_to_parsers(self):
+        chat_model = FakeListChatModel(
+            responses=["I can count to two.", '{"root": [1, 2]}', "unused"])
+        test_gen = Generator(None, chat_model=chat_model)
+        self.assertEqual(test_gen.generate("count", number_list_schema),
+                         [1.0, 2.0])
+        metrics = test_gen.ResponseGenerator.metrics.snapshot()
+        self.assertEqual(metrics["lean_misses"], 1)
+        self.assertEqual(metrics["llm_fixes"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,213 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from typing import Any
+from langchain_community.chat_models.fake import FakeListChatModel
+
+#custom imports
+from Lang2Logic.deadline import DeadlineExceeded
+from Lang2Logic.generator import Generator
+from Lang2Logic.single_flight import SingleFlight
+
+list_schema = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "array",
+    "items": {
+        "type": "integer"
+    }
+}
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+class GatedChatModel(FakeListChatModel):
+    """Holds each completion until `waiters` callers are coalesced onto it."""
+    flight: Any = None
+    waiters: int = 0
+    calls: int = 0
+
+    def _call(self, *args, **kwargs):
+        self.calls += 1
+        expected = self.waiters * self.calls
+        wait_for(lambda: self.flight.metrics.get("coalesced") >= expected)
+        return super()._call(*args, **kwargs)
+
+
+class DelayedChatModel(FakeListChatModel):
+    """Takes `delay` seconds for every completion."""
+    delay: float = 0.3
+
+    def _call(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+    async def _acall(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        return super()._call(*args, **kwargs)
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_errors_reach_every_waiter(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def fail():
+            release.wait(5)
+            raise ValueError("boom")
+
+        def call():
+            try:
+                flight.do("key", fail)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        wait_for(lambda: flight.metrics.get("coalesced") == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flight.metrics.get("leaders"), 1)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_followers_get_copies(self):
+        flight = SingleFlight()
+
+        async def leader_and_follower():
+            release = asyncio.Event()
+
+            async def build():
+                await release.wait()
+                return {"items": [1]}
+
+            first = asyncio.ensure_future(flight.ado("key", build))
+            second = asyncio.ensure_future(flight.ado("key", build))
+            await asyncio.sleep(0)
+            release.set()
+            return await asyncio.gather(first, second)
+
+        first, second = asyncio.run(leader_and_follower())
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(flight.metrics.snapshot(), {
+            "leaders": 1,
+            "coalesced": 1
+        })
+
+
+class TestGeneratorCoalescing(unittest.TestCase):
+
+    def make_generator(self, responses, waiters=0):
+        flight = SingleFlight()
+        chat_model = GatedChatModel(responses=responses + ["unused"],
+                                    flight=flight,
+                                    waiters=waiters)
+        return Generator(None, chat_model=chat_model,
+                         single_flight=flight), chat_model, flight
+
+    def test_identical_calls_share_schema_and_response(self):
+        test_gen, chat_model, flight = self.make_generator(
+            [json.dumps(list_schema), '{"root": [1, 2]}'], waiters=2)
+        results = []
+
+        def call():
+            results.append(test_gen.generate("count to two"))
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [[1, 2]] * 3)
+        self.assertEqual(chat_model.i, 2)
+        self.assertEqual(flight.metrics.get("leaders"), 2)
+
+    def test_async_calls_share_the_response(self):
+        test_gen, chat_model, flight = self.make_generator(['{"root": [7]}'],
+                                                           waiters=2)
+
+        async def run():
+            calls = [
+                asyncio.ensure_future(test_gen.agenerate("seven", list_schema))
+                for _ in range(3)
+            ]
+            return await asyncio.gather(*calls)
+
+        self.assertEqual(asyncio.run(run()), [[7]] * 3)
+        self.assertEqual(chat_model.i, 1)
+        self.assertEqual(flight.metrics.snapshot(), {
+            "leaders": 1,
+            "coalesced": 2
+        })
+
+    def test_different_prompts_are_not_coalesced(self):
+        test_gen, chat_model, flight = self.make_generator(
+            ['{"root": [1]}', '{"root": [2]}'])
+        self.assertEqual(test_gen.generate("one", list_schema), [1])
+        self.assertEqual(test_gen.generate("two", list_schema), [2])
+        self.assertEqual(flight.metrics.get("coalesced"), 0)
+
+
+class TestMixedTimeouts(unittest.TestCase):
+
+    def make_generator(self):
+        flight = SingleFlight()
+        chat_model = DelayedChatModel(
+            responses=['{"root": [1]}', '{"root": [1]}', "unused"])
+        return Generator(None, chat_model=chat_model,
+                         single_flight=flight), chat_model, flight
+
+    def test_follower_outlives_a_leader_timeout(self):
+        test_gen, chat_model, flight = self.make_generator()
+        outcomes = {}
+
+        def call(name, timeout):
+            try:
+                outcomes[name] = test_gen.generate("one",
+                                                   list_schema,
+                                                   timeout=timeout)
+            except DeadlineExceeded as e:
+                outcomes[name] = e
+
+        leader = threading.Thread(target=call, args=("leader", 0.1))
+        leader.start()
+        wait_for(lambda: flight.in_flight() == 1)
+        follower = threading.Thread(target=call, args=("follower", None))
+        follower.start()
+        leader.join()
+        follower.join()
+        self.assertIsInstance(outcomes["leader"], DeadlineExceeded)
+        self.assertEqual(outcomes["follower"], [1])
+        self.assertEqual(flight.metrics.get("leaders"), 2)
+
+    def test_async_follower_outlives_a_leader_timeout(self):
+        test_gen, chat_model, flight = self.make_generator()
+
+        async def run():
+            leader = asyncio.ensure_future(
+                test_gen.agenerate("one", list_schema, timeout=0.1))
+            await asyncio.sleep(0.02)
+            follower = asyncio.ensure_future(
+                test_gen.agenerate("one", list_schema, timeout=2))
+            return await asyncio.gather(leader,
+                                        follower,
+                                        return_exceptions=True)
+
+        leader, follower = asyncio.run(run())
+        self.assertIsInstance(leader, DeadlineExceeded)
+        self.assertEqual(follower, [1])
+        self.assertEqual(flight.metrics.get("leaders"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()